@@ -0,0 +1,58 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Measures the throughput of the MPI protocol parser.
+
+The traffic is passed through the Telnet protocol first, and a remote editing message with a large body
+is inserted every 200 lines, so that both application data and MPI bodies are measured.
+
+Usage: python -m benchmarks.mpi [capture file] [chunk size] [body size]
+"""
+
+
+# Future Modules:
+from __future__ import annotations
+
+# Built-in Modules:
+import sys
+from timeit import default_timer
+
+# Mapper Modules:
+from mapper.protocols.mpi import MPI_INIT, MPIProtocol
+from mapper.protocols.telnet import TelnetProtocol
+from mapper.protocols.telnet_constants import LF
+
+from .traffic import loadTraffic, splitTraffic
+
+
+REPEATS = 5
+
+
+def main(path=None, chunkSize=4096, bodySize=2 ** 16):
+	appData = []
+	TelnetProtocol(lambda data: None, appData.append).on_dataReceived(loadTraffic(path))
+	body = b"x" * (int(bodySize) - 1) + LF
+	message = MPI_INIT + b"Z" + b"%d" % len(body) + LF + body
+	lines = b"".join(appData).split(LF)
+	data = b"".join(line + LF + (message if not i % 200 else b"") for i, line in enumerate(lines))
+	chunks = splitTraffic(data, int(chunkSize))
+	best = None
+	for _ in range(REPEATS):
+		protocol = MPIProtocol(lambda data: None, lambda data: None)
+		# Commands mapped to None are parsed without starting an editor or pager.
+		protocol.commandMap = {b"Z": None}
+		start = default_timer()
+		for chunk in chunks:
+			protocol.on_dataReceived(chunk)
+		elapsed = default_timer() - start
+		best = elapsed if best is None else min(best, elapsed)
+	print(
+		f"{len(data)} bytes in {len(chunks)} chunks: "
+		+ f"{best * 1000:.1f} ms, {len(data) / best / 2 ** 20:.1f} MB/s."
+	)
+
+
+if __name__ == "__main__":
+	main(*sys.argv[1:])
@@ -0,0 +1,108 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Times path finding on a large synthetic map.
+
+Usage: python -m benchmarks.pathfind [width] [height] [queries] [area size]
+
+If an area size is given, the map is divided into square areas of that size,
+which are only linked to each other by a single road on each side.
+"""
+
+
+# Future Modules:
+from __future__ import annotations
+
+# Built-in Modules:
+import random
+import sys
+from timeit import default_timer
+
+# Mapper Modules:
+from mapper.roomdata.objects import TERRAIN_COSTS, Exit, Room
+from mapper.world import DIRECTION_COORDINATES, World
+
+
+SEED = 4242
+TERRAINS = sorted(set(TERRAIN_COSTS) - {"deathtrap", "undefined"})
+
+
+class SyntheticWorld(World):
+	def loadRooms(self):
+		pass
+
+	def loadLabels(self):
+		pass
+
+	def output(self, text):
+		pass
+
+
+def buildWorld(width, height, levels=2, areaSize=0):
+	"""Creates a grid of rooms with random terrain, doors, climbs, and missing or one-way exits."""
+	rng = random.Random(SEED)
+	world = SyntheticWorld()
+	coordinates = {}
+	for z in range(levels):
+		for y in range(height):
+			for x in range(width):
+				vnum = str(len(world.rooms))
+				room = Room(vnum)
+				room.terrain = rng.choice(TERRAINS)
+				room.x, room.y, room.z = x, y, z
+				room.calculateCost()
+				world.rooms[vnum] = room
+				coordinates[(x, y, z)] = room
+	for (x, y, z), room in coordinates.items():
+		for direction, (dx, dy, dz) in DIRECTION_COORDINATES.items():
+			neighbor = coordinates.get((x + dx, y + dy, z + dz))
+			if neighbor is None or dz and rng.random() < 0.9 or rng.random() < 0.1:
+				continue
+			elif areaSize and (x // areaSize, y // areaSize) != (neighbor.x // areaSize, neighbor.y // areaSize):
+				# Areas are linked by a road through the middle of each side.
+				if (y if dx else x) % areaSize != areaSize // 2:
+					continue
+			exitObj = Exit()
+			exitObj.direction = direction
+			exitObj.vnum = room.vnum
+			exitObj.to = neighbor.vnum
+			roll = rng.random()
+			if roll < 0.05:
+				exitObj.exitFlags.add("door")
+				exitObj.door = "door"
+			elif roll < 0.08:
+				exitObj.exitFlags.add("climb")
+			elif roll < 0.09:
+				exitObj.exitFlags.add("avoid")
+			room.exits[direction] = exitObj
+	world.currentRoom = world.rooms["0"]
+	if hasattr(world, "mapChanged"):
+		world.mapChanged()
+	return world
+
+
+def main(width=150, height=100, queries=50, areaSize=0):
+	start = default_timer()
+	world = buildWorld(width, height, areaSize=areaSize)
+	print(f"Built {len(world.rooms)} rooms in {default_timer() - start:.2f} seconds.")
+	rng = random.Random(SEED)
+	vnums = list(world.rooms)
+	pairs = [(world.rooms[rng.choice(vnums)], rng.choice(vnums)) for _ in range(queries)]
+	# The default costs are searched twice, to show the effect of the data cached by the first search.
+	for flags in (None, None, ["noroad", "nowater"]):
+		found = 0
+		start = default_timer()
+		for origin, destination in pairs:
+			if world.pathFind(origin=origin, destination=destination, flags=flags) is not None:
+				found += 1
+		elapsed = default_timer() - start
+		print(
+			f"flags={flags}: {queries} queries, {found} routes, "
+			+ f"{elapsed:.3f} seconds total, {elapsed / queries * 1000:.1f} ms per query."
+		)
+
+
+if __name__ == "__main__":
+	main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,68 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Compares the throughput of the layered and fused game protocol pipelines.
+
+Usage: python -m benchmarks.pipeline [capture file] [chunk size] [output format]
+"""
+
+
+# Future Modules:
+from __future__ import annotations
+
+# Built-in Modules:
+import sys
+from timeit import default_timer
+
+# Mapper Modules:
+from mapper.protocols.fused import FusedTelnetProtocol
+from mapper.protocols.manager import Manager
+from mapper.protocols.mpi import MPIProtocol
+from mapper.protocols.telnet import TelnetProtocol
+from mapper.protocols.xml import XMLProtocol
+
+from .traffic import loadTraffic, splitTraffic
+
+
+REPEATS = 5
+
+
+def layered(outputFormat):
+	manager = Manager(lambda data: None, lambda data: None)
+	manager.connect()
+	manager.register(TelnetProtocol)
+	manager.register(MPIProtocol, outputFormat=outputFormat)
+	manager.register(XMLProtocol, outputFormat=outputFormat)
+	return manager
+
+
+def fused(outputFormat):
+	manager = Manager(lambda data: None, lambda data: None)
+	manager.connect()
+	manager.register(FusedTelnetProtocol, outputFormat=outputFormat)
+	return manager
+
+
+def main(path=None, chunkSize=4096, outputFormat="normal"):
+	data = loadTraffic(path)
+	chunks = splitTraffic(data, int(chunkSize))
+	for name, pipeline in (("Layered", layered), ("Fused", fused)):
+		best = None
+		for _ in range(REPEATS):
+			manager = pipeline(outputFormat)
+			start = default_timer()
+			for chunk in chunks:
+				manager.parse(chunk)
+			elapsed = default_timer() - start
+			best = elapsed if best is None else min(best, elapsed)
+			manager.disconnect()
+		print(
+			f"{name}: {len(data)} bytes in {len(chunks)} chunks: "
+			+ f"{best * 1000:.1f} ms, {len(data) / best / 2 ** 20:.1f} MB/s."
+		)
+
+
+if __name__ == "__main__":
+	main(*sys.argv[1:])
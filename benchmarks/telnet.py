@@ -0,0 +1,46 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Measures the throughput of the Telnet protocol parser.
+
+Usage: python -m benchmarks.telnet [capture file] [chunk size]
+"""
+
+
+# Future Modules:
+from __future__ import annotations
+
+# Built-in Modules:
+import sys
+from timeit import default_timer
+
+# Mapper Modules:
+from mapper.protocols.telnet import TelnetProtocol
+
+from .traffic import loadTraffic, splitTraffic
+
+
+REPEATS = 5
+
+
+def main(path=None, chunkSize=4096):
+	data = loadTraffic(path)
+	chunks = splitTraffic(data, int(chunkSize))
+	best = None
+	for _ in range(REPEATS):
+		protocol = TelnetProtocol(lambda data: None, lambda data: None)
+		start = default_timer()
+		for chunk in chunks:
+			protocol.on_dataReceived(chunk)
+		elapsed = default_timer() - start
+		best = elapsed if best is None else min(best, elapsed)
+	print(
+		f"{len(data)} bytes in {len(chunks)} chunks: "
+		+ f"{best * 1000:.1f} ms, {len(data) / best / 2 ** 20:.1f} MB/s."
+	)
+
+
+if __name__ == "__main__":
+	main(*sys.argv[1:])
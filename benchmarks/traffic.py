@@ -0,0 +1,86 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Game traffic for the protocol benchmarks.
+
+The traffic is read from a capture of the raw bytes received from Mume if one is given,
+otherwise a synthetic session is generated which mixes the same kinds of data:
+XML tagged rooms and prompts, Telnet negotiations, subnegotiations and GA, and plain text lines.
+"""
+
+
+# Future Modules:
+from __future__ import annotations
+
+# Built-in Modules:
+import random
+
+# Mapper Modules:
+from mapper.protocols.telnet_constants import CR_LF, DO, ECHO, GA, IAC, SB, SE, WILL
+
+
+SEED = 4242
+WORDS = (
+	b"the",
+	b"a",
+	b"path",
+	b"leads",
+	b"north",
+	b"through",
+	b"trees",
+	b"old",
+	b"stone",
+	b"road",
+	b"river",
+	b"hill",
+	b"&lt;dark&gt;",
+	b"orc",
+	b"elf",
+)
+
+
+def _sentence(rng):
+	return b" ".join(rng.choice(WORDS) for _ in range(rng.randrange(4, 14))).capitalize() + b"."
+
+
+def generateTraffic(size=2 ** 20, seed=SEED):
+	"""Generates at least `size` bytes of synthetic game traffic."""
+	rng = random.Random(seed)
+	chunks = []
+	total = 0
+	while total < size:
+		roll = rng.random()
+		if roll < 0.5:
+			direction = rng.choice((b"north", b"south", b"east", b"west"))
+			lines = b"".join(_sentence(rng) + CR_LF for _ in range(rng.randrange(1, 6)))
+			chunk = (
+				b"<movement dir=" + direction + b"/><room><name>" + _sentence(rng)[:30] + b"</name>" + CR_LF
+				+ b"<gratuitous><description>" + lines + b"</description></gratuitous>"
+				+ b"A wolf is here." + CR_LF
+				+ b"<exits>Exits: north, [east], south.</exits>" + CR_LF + b"</room>"
+			)
+		elif roll < 0.8:
+			chunk = b"".join(_sentence(rng) + CR_LF for _ in range(rng.randrange(1, 4)))
+		elif roll < 0.95:
+			chunk = b"<tell>Someone tells you '" + _sentence(rng) + b"'</tell>" + CR_LF
+		else:
+			chunk = IAC + rng.choice((WILL, DO)) + ECHO + IAC + SB + b"\xc9Core.Hello {}" + IAC + SE
+		chunk += b"<prompt>*%&gt;</prompt>" + IAC + GA
+		chunks.append(chunk)
+		total += len(chunk)
+	return b"".join(chunks)
+
+
+def loadTraffic(path=None, size=2 ** 20):
+	"""Reads captured traffic from a file, or generates it if no file is given."""
+	if path is None:
+		return generateTraffic(size)
+	with open(path, "rb") as fileObj:
+		return fileObj.read()
+
+
+def splitTraffic(data, chunkSize=4096):
+	"""Splits traffic into the chunks which would be read from the socket."""
+	return [data[i : i + chunkSize] for i in range(0, len(data), chunkSize)]
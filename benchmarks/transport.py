@@ -0,0 +1,249 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Compares the latency and CPU usage of the threaded, asyncio, and selector proxy transports,
+under a replayed session.
+
+The session is split into turns at each Go Ahead. For each turn, the player sends a command through the proxy,
+and the game answers with the turn once the command arrives. The latency is the time from sending the command
+until the prompt terminator reaches the player. The CPU time is that of the whole process, including the
+replaying game and player, which do the same work for every transport.
+
+Usage: python -m benchmarks.transport [capture file] [turns]
+"""
+
+
+# Future Modules:
+from __future__ import annotations
+
+# Built-in Modules:
+import asyncio
+import socket
+import statistics
+import sys
+import threading
+import time
+from queue import SimpleQueue
+from types import SimpleNamespace
+
+# Third-party Modules:
+from boltons.socketutils import BufferedSocket
+
+# Mapper Modules:
+from mapper.main import (
+	BufferedVectorSocket,
+	EventQueue,
+	Game,
+	Player,
+	ProxyProtocol,
+	SelectorConnection,
+	SelectorLoop,
+	callSoon,
+)
+from mapper.protocols.proxy import ProxyHandler
+from mapper.protocols.telnet_constants import GA, IAC
+
+from .traffic import loadTraffic
+
+
+COMMAND = b"look"
+
+
+def splitTurns(data):
+	"""Splits traffic into the turns which end with a Go Ahead."""
+	turns = [turn + IAC + GA for turn in data.split(IAC + GA)]
+	turns[-1] = turns[-1][: -len(IAC + GA)]
+	return [turn for turn in turns if turn]
+
+
+def listen():
+	listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+	listener.bind(("127.0.0.1", 0))
+	listener.listen(1)
+	return listener
+
+
+def serveTurns(connection, turns):
+	"""Sends the next turn each time the command is received, as the game would."""
+	received = b""
+	try:
+		for turn in turns:
+			while COMMAND not in received:
+				data = connection.recv(4096)
+				if not data:
+					return None
+				received += data
+			received = received[received.index(COMMAND) + len(COMMAND) :]
+			connection.sendall(turn)
+	finally:
+		connection.close()
+
+
+def proxyHandler(playerSocket, gameSocket, eventCaller, **kwargs):
+	proxy = ProxyHandler(
+		playerSocket,
+		gameSocket,
+		outputFormat="normal",
+		promptTerminator=None,
+		isEmulatingOffline=False,
+		mapperCommands=[],
+		eventCaller=eventCaller,
+		**kwargs,
+	)
+	proxy.connect()
+	return proxy
+
+
+def threads(playerSocket, gameSocket):
+	"""Runs the proxy with a thread for each socket, and a thread which consumes events."""
+	playerSocket = BufferedVectorSocket(playerSocket, timeout=1.0)
+	gameSocket = BufferedSocket(gameSocket, timeout=None)
+	queue = SimpleQueue()
+	mapper = SimpleNamespace(interface="text", isEmulatingOffline=False, queue=queue)
+	mapper.proxy = proxyHandler(playerSocket, gameSocket, queue.put)
+
+	def consume():
+		while queue.get() != (None, None):
+			if queue.empty():
+				mapper.proxy.player.flush()
+
+	workers = [threading.Thread(target=consume), Player(playerSocket, mapper), Game(gameSocket, mapper)]
+	for worker in workers:
+		worker.start()
+
+	def stop():
+		workers[2].join()
+		queue.put((None, None))
+		workers[1].close()
+		for worker in workers:
+			worker.join()
+		mapper.proxy.close()
+
+	return stop
+
+
+def asyncio_(playerSocket, gameSocket):
+	"""Runs the proxy and a task which consumes events on an event loop."""
+	loop = asyncio.new_event_loop()
+	queue = EventQueue(loop)
+
+	async def serve():
+		playerTransport, player = await loop.connect_accepted_socket(lambda: ProxyProtocol(loop), playerSocket)
+		gameTransport, game = await loop.connect_accepted_socket(lambda: ProxyProtocol(loop), gameSocket)
+		proxy = proxyHandler(
+			player,
+			game,
+			queue.put,
+			flushTimer=lambda delay, callback: callSoon(loop, loop.call_later, delay, callback),
+		)
+		player.start(proxy.player)
+		game.start(proxy.game)
+
+		async def consume():
+			while await queue.get() != (None, None):
+				if queue.empty():
+					proxy.player.flush()
+
+		consumer = asyncio.ensure_future(consume())
+		await game.closed
+		queue.put((None, None))
+		await consumer
+		player.close()
+		await player.closed
+		proxy.close()
+
+	thread = threading.Thread(target=loop.run_until_complete, args=(serve(),))
+	thread.start()
+
+	def stop():
+		thread.join()
+		loop.close()
+
+	return stop
+
+
+def selectors_(playerSocket, gameSocket):
+	"""Runs the proxy on a selector loop, and a thread which consumes events."""
+	loop = SelectorLoop()
+	player = SelectorConnection(loop, playerSocket)
+	game = SelectorConnection(loop, gameSocket)
+	queue = SimpleQueue()
+	proxy = proxyHandler(player, game, queue.put)
+
+	def consume():
+		while queue.get() != (None, None):
+			if queue.empty():
+				proxy.player.flush()
+
+	consumer = threading.Thread(target=consume)
+	consumer.start()
+	player.start(proxy.player)
+	game.start(proxy.game)
+	loop.add(player)
+	loop.add(game)
+	thread = threading.Thread(target=loop.run, args=(lambda: game.closed,))
+	thread.start()
+
+	def stop():
+		thread.join()
+		queue.put((None, None))
+		consumer.join()
+		proxy.close()
+		loop.close()
+		playerSocket.close()
+		gameSocket.close()
+
+	return stop
+
+
+def replay(transport, turns):
+	"""Replays the turns through a proxy transport, and returns the latency of each turn and the CPU time."""
+	gameListener = listen()
+	proxyListener = listen()
+	client = socket.create_connection(proxyListener.getsockname())
+	playerSocket, address = proxyListener.accept()
+	gameSocket = socket.create_connection(gameListener.getsockname())
+	gameConnection, address = gameListener.accept()
+	for sock in (client, playerSocket, gameSocket, gameConnection):
+		sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+	gameListener.close()
+	proxyListener.close()
+	game = threading.Thread(target=serveTurns, args=(gameConnection, turns))
+	game.start()
+	stop = transport(playerSocket, gameSocket)
+	latencies = []
+	startCPU = time.process_time()
+	for _ in turns:
+		start = time.perf_counter()
+		client.sendall(COMMAND + b"\r\n")
+		received = b""
+		while not received.endswith(IAC + GA):
+			data = client.recv(65536)
+			if not data:
+				raise AssertionError("The proxy disconnected the player.")
+			received += data
+		latencies.append(time.perf_counter() - start)
+	cpu = time.process_time() - startCPU
+	game.join()
+	client.close()
+	stop()
+	return latencies, cpu
+
+
+def main(path=None, turns=2000):
+	turns = splitTurns(loadTraffic(path))[: int(turns)]
+	for name, transport in (("Threads", threads), ("Asyncio", asyncio_), ("Selectors", selectors_)):
+		latencies, cpu = replay(transport, turns)
+		latencies.sort()
+		print(
+			f"{name}: {len(turns)} turns: "
+			+ f"median {statistics.median(latencies) * 1000:.3f} ms, "
+			+ f"99th percentile {latencies[len(latencies) * 99 // 100] * 1000:.3f} ms, "
+			+ f"CPU {cpu * 1000:.0f} ms."
+		)
+
+
+if __name__ == "__main__":
+	main(*sys.argv[1:])
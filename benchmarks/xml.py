@@ -0,0 +1,51 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Measures the throughput of the XML protocol parser.
+
+The traffic is passed through the Telnet protocol first, so that the XML parser only sees application data.
+
+Usage: python -m benchmarks.xml [capture file] [chunk size] [output format]
+"""
+
+
+# Future Modules:
+from __future__ import annotations
+
+# Built-in Modules:
+import sys
+from timeit import default_timer
+
+# Mapper Modules:
+from mapper.protocols.telnet import TelnetProtocol
+from mapper.protocols.xml import XMLProtocol
+
+from .traffic import loadTraffic, splitTraffic
+
+
+REPEATS = 5
+
+
+def main(path=None, chunkSize=4096, outputFormat="normal"):
+	appData = []
+	TelnetProtocol(lambda data: None, appData.append).on_dataReceived(loadTraffic(path))
+	data = b"".join(appData)
+	chunks = splitTraffic(data, int(chunkSize))
+	best = None
+	for _ in range(REPEATS):
+		protocol = XMLProtocol(lambda data: None, lambda data: None, outputFormat=outputFormat)
+		start = default_timer()
+		for chunk in chunks:
+			protocol.on_dataReceived(chunk)
+		elapsed = default_timer() - start
+		best = elapsed if best is None else min(best, elapsed)
+	print(
+		f"{len(data)} bytes in {len(chunks)} chunks: "
+		+ f"{best * 1000:.1f} ms, {len(data) / best / 2 ** 20:.1f} MB/s."
+	)
+
+
+if __name__ == "__main__":
+	main(*sys.argv[1:])
@@ -15,8 +15,12 @@ from .config import Config
 
 INTERFACES = ("text", "hc", "sighted")
 OUTPUT_FORMATS = ("normal", "raw", "tintin")
+TRANSPORTS = ("threads", "asyncio", "selectors")
+VIEWER_POLICIES = ("disconnect", "drop")
+QUEUE_POLICIES = ("block", "drop")
 USER_DATA = 0
 MUD_DATA = 1
+MAPPER_DATA = 2
 
 
 cfg = Config()
@@ -495,6 +495,11 @@ class Clock(object):
 		cfg.save()
 		del cfg
 
+	@property
+	def mumeTime(self) -> MumeTime:
+		"""The current Mume time."""
+		return MumeTime(int(time.time()) - self.epoch)
+
 	def setTime(self, year: int, month: int, day: int, hour: int, minutes: int) -> None:
 		"""
 		Sets the Mume epoch from the current Mume time.
@@ -522,7 +527,7 @@ class Clock(object):
 		Returns:
 			The requested output.
 		"""
-		mt = MumeTime(int(time.time()) - self.epoch)
+		mt = self.mumeTime
 		if action == "pull":
 			return f"pull lever {mt.day}\npull lever {mt.monthWestron}"
 		elif action is not None:
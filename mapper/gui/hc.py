@@ -59,6 +59,7 @@ TERRAIN_COLORS = {
 	"indoors": (186, 85, 211, 255),
 	"mountains": (165, 42, 42, 255),
 	"rapids": (32, 64, 192, 255),
+	"reach": (255, 215, 0, 255),
 	"road": (255, 255, 255, 255),
 	"shallow": (218, 120, 245, 255),
 	"tunnel": (153, 50, 204, 255),
@@ -157,6 +158,7 @@ class Window(pyglet.window.Window):
 		self.blinkers = {}
 		self.center_mark = []
 		self.highlight = None
+		self.reachable_rooms = frozenset()
 		self.current_room = None
 		super(Window, self).__init__(
 			caption="MPM", resizable=True, vsync=False, fullscreen=self._cfg["fullscreen"]
@@ -359,6 +361,16 @@ class Window(pyglet.window.Window):
 		self.current_room = currentRoom
 		self.redraw()
 
+	def on_reach(self, vnums):
+		"""
+		This event is fired with the rooms found by the reach command,
+		which are tinted until the event is fired again.
+		"""
+		logger.debug(f"Tinting {len(vnums)} reachable rooms.")
+		self.reachable_rooms = vnums
+		if self.current_room is not None:
+			self.on_gui_refresh()
+
 	def on_gui_refresh(self):
 		"""
 		This event is fired when the mapper needs to signal the GUI to clear the
@@ -607,6 +619,9 @@ class Window(pyglet.window.Window):
 			color = Color(*self.terrain_colors.get("highlight", "undefined"))
 		else:
 			color = Color(*self.terrain_colors.get(room.terrain, "undefined"))
+			if room.vnum in self.reachable_rooms:
+				tint = self.terrain_colors.get("reach", TERRAIN_COLORS["reach"])
+				color = Color(*((a + b) // 2 for a, b in zip(color, tint)))
 		vertices = self.square_vertices(cp, self.size / 2.0)
 		if group is None:
 			group = self.groups[0]
@@ -915,3 +930,4 @@ class Window(pyglet.window.Window):
 
 Window.register_event_type("on_map_sync")
 Window.register_event_type("on_gui_refresh")
+Window.register_event_type("on_reach")
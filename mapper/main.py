@@ -7,22 +7,29 @@
 from __future__ import annotations
 
 # Built-in Modules:
+import asyncio
 import importlib
 import logging
 import os
 import select
+import selectors
 import socket
 import ssl
 import threading
 import time
+from collections import deque
+from itertools import islice
+from queue import Empty
 from types import ModuleType
 from typing import Union
 
 # Third-party Modules:
-from boltons.socketutils import _UNSET, DEFAULT_MAXSIZE, BufferedSocket
+from boltons.socketutils import _UNSET, DEFAULT_MAXSIZE, BufferedSocket, Timeout
 
 # Local Modules:
+from . import MUD_DATA, QUEUE_POLICIES, TRANSPORTS, VIEWER_POLICIES
 from .mapper import Mapper
+from .queues import EVENT_QUEUE_SIZE, BoundedEventQueue
 from .utils import getDirectoryPath, removeFile, touch
 
 
@@ -39,11 +46,206 @@ except ImportError:
 
 
 LISTENING_STATUS_FILE = os.path.join(getDirectoryPath("."), "mapper_ready.ignore")
+SENDMSG_MAX_BUFFERS = 1024  # The smallest IOV_MAX of the supported platforms.
+RECV_SIZE = 65536  # The size of the buffer which selector loop connections receive into.
+VIEWER_BUFFER_SIZE = 2 ** 20  # The number of bytes which may wait to be sent to a viewer.
 
 
 logger = logging.getLogger(__name__)
 
 
+class BufferedVectorSocket(BufferedSocket):
+	def sendmsgall(self, buffers):
+		"""
+		Sends a list of buffers without joining them first.
+
+		The buffers are sent with the sendmsg system call if the socket supports it,
+		otherwise they are joined and sent with `sendall`.
+
+		Args:
+			buffers: The buffers to send.
+		"""
+		sock = self.sock
+		if not hasattr(sock, "sendmsg") or isinstance(sock, ssl.SSLSocket):
+			self.sendall(b"".join(buffers))
+			return None
+		with self._send_lock:
+			if self.sbuf:
+				# Send any data left over from a previous timeout first.
+				self.send(b"")
+			views = [memoryview(data) for data in buffers if data]
+			sock.settimeout(self.timeout)
+			try:
+				while views:
+					sent = sock.sendmsg(views[:SENDMSG_MAX_BUFFERS])
+					# Discard the buffers which were sent completely, and the sent part of the next one.
+					while sent and sent >= len(views[0]):
+						sent -= len(views.pop(0))
+					if sent:
+						views[0] = views[0][sent:]
+			except socket.timeout:
+				unsent = b"".join(views)
+				self.sbuf[:] = [unsent]
+				raise Timeout(self.timeout, f"{len(unsent)} bytes unsent")
+		return None
+
+
+class ClientFanOut(object):
+	"""
+	Sends the output for the player to every connected client.
+
+	The primary client is the command source, and is written to as a single player would be.
+	Viewers only receive output. Each viewer has its own buffer and backpressure policy,
+	so that a slow viewer never stalls the primary client or the game reader.
+	The object is given to the proxy handler in place of the player's socket.
+	"""
+
+	def __init__(self, primary):
+		self.primary = primary
+		self.viewers = []
+		self._lock = threading.Lock()
+
+	def addViewer(self, viewer, maxViewers):
+		"""
+		Adds a viewer, if there is room for it.
+
+		Args:
+			viewer: The viewer's connection.
+			maxViewers: The maximum number of viewers.
+
+		Returns:
+			True if the viewer was added, False otherwise.
+		"""
+		with self._lock:
+			viewers = [item for item in self.viewers if not item.isClosed]
+			if len(viewers) >= maxViewers:
+				return False
+			# The list is replaced rather than modified, so that it can be iterated without the lock.
+			self.viewers = viewers + [viewer]
+		return True
+
+	def close(self):
+		for viewer in self.viewers:
+			viewer.close()
+
+	def sendall(self, data):
+		self.primary.sendall(data)
+		for viewer in self.viewers:
+			viewer.sendmsgall((data,))
+
+	def sendmsgall(self, buffers):
+		sendmsgall = getattr(self.primary, "sendmsgall", None)
+		if sendmsgall is None:
+			self.primary.sendall(b"".join(buffers))
+		else:
+			sendmsgall(buffers)
+		for viewer in self.viewers:
+			viewer.sendmsgall(buffers)
+
+
+class Viewer(threading.Thread):
+	"""Sends output to a viewer from its own buffer, on a thread of its own."""
+
+	def __init__(self, sock, policy, bufferSize=VIEWER_BUFFER_SIZE):
+		threading.Thread.__init__(self)
+		self.name = "Viewer"
+		self.daemon = True
+		self.sock = sock
+		self.policy = policy
+		self.bufferSize = bufferSize
+		self.isClosed = False
+		self._buffers = []
+		self._size = 0
+		self._condition = threading.Condition()
+
+	def close(self):
+		"""Closes the connection once any buffered output is sent."""
+		with self._condition:
+			self.isClosed = True
+			self._condition.notify()
+
+	def disconnect(self):
+		"""Closes the connection, discarding any buffered output."""
+		with self._condition:
+			self.isClosed = True
+			self._buffers.clear()
+			self._condition.notify()
+		try:
+			# Interrupt a send which is blocked.
+			self.sock.shutdown(socket.SHUT_RDWR)
+		except EnvironmentError:
+			pass
+
+	def sendmsgall(self, buffers):
+		size = sum(len(data) for data in buffers)
+		with self._condition:
+			if self.isClosed:
+				return None
+			elif self._size + size <= self.bufferSize:
+				self._buffers.extend(buffers)
+				self._size += size
+				self._condition.notify()
+				return None
+		# The buffer is full, so the output is dropped.
+		if self.policy == "disconnect":
+			logger.debug("Disconnecting a viewer which is not keeping up with output.")
+			self.disconnect()
+
+	def run(self):
+		while True:
+			with self._condition:
+				while not self._buffers and not self.isClosed:
+					self._condition.wait()
+				if not self._buffers:
+					break
+				buffers = self._buffers
+				self._buffers = []
+				self._size = 0
+			try:
+				self.sock.sendall(b"".join(buffers))
+			except EnvironmentError:
+				self.disconnect()
+				break
+		try:
+			self.sock.shutdown(socket.SHUT_RDWR)
+		except EnvironmentError:
+			pass
+		self.sock.close()
+
+
+class ViewerAcceptor(threading.Thread):
+	"""Accepts viewers on the listening socket, after the primary client."""
+
+	def __init__(self, proxySocket, fanOut, maxViewers, policy):
+		threading.Thread.__init__(self)
+		self.name = "ViewerAcceptor"
+		self.daemon = True
+		self.proxySocket = proxySocket
+		self.fanOut = fanOut
+		self.maxViewers = maxViewers
+		self.policy = policy
+		self.finished = threading.Event()
+
+	def close(self):
+		self.finished.set()
+
+	def run(self):
+		self.proxySocket.settimeout(1.0)
+		while not self.finished.is_set():
+			try:
+				viewerSocket, viewerAddress = self.proxySocket.accept()
+			except socket.timeout:
+				continue
+			except EnvironmentError:
+				break
+			viewerSocket.settimeout(None)
+			viewer = Viewer(viewerSocket, self.policy)
+			if self.fanOut.addViewer(viewer, self.maxViewers):
+				viewer.start()
+			else:
+				viewerSocket.close()
+
+
 class BufferedSSLSocket(BufferedSocket):
 	def __init__(
 		self, sock, timeout=_UNSET, maxsize=DEFAULT_MAXSIZE, recvsize=_UNSET, insecure=False, **sslKWArgs
@@ -194,6 +396,712 @@ class MockedSocket(object):
 		raise MockedSocketEmpty()
 
 
+class SelectorLoop(object):
+	"""
+	Multiplexes the listening socket, and the player and game connections, on a single thread.
+
+	Connections are written from other threads, so the loop can be woken to wait for new events.
+	"""
+
+	def __init__(self):
+		self.selector = selectors.DefaultSelector()
+		self.connections = []
+		self._events = {}
+		self._wakeReader, self._wakeWriter = socket.socketpair()
+		self._wakeReader.setblocking(False)
+		self._wakeWriter.setblocking(False)
+		self.selector.register(self._wakeReader, selectors.EVENT_READ, self._on_wake)
+		self.threadId = None
+
+	def add(self, connection):
+		self.connections.append(connection)
+		self.wake()
+
+	def addListener(self, sock, onAccept=None):
+		"""
+		Accepts further connections to a listening socket.
+
+		Args:
+			sock: The listening socket, which has already accepted the player.
+			onAccept: A function which is called with each accepted socket, and returns True if it was kept.
+				Connections are refused if it is not given or returns False.
+		"""
+		sock.setblocking(False)
+		self.selector.register(sock, selectors.EVENT_READ, lambda mask: self._on_accept(sock, onAccept))
+
+	def close(self):
+		for connection in self.connections:
+			connection.sock.close()
+		self.selector.close()
+		self._wakeReader.close()
+		self._wakeWriter.close()
+
+	def run(self, isFinished):
+		"""
+		Runs the loop.
+
+		Args:
+			isFinished: A function which returns True when the loop should stop.
+		"""
+		self.threadId = threading.get_ident()
+		try:
+			while not isFinished():
+				self._update()
+				for key, mask in self.selector.select():
+					key.data(mask)
+		finally:
+			self.threadId = None
+
+	def wake(self):
+		if self.threadId is not None and self.threadId != threading.get_ident():
+			try:
+				self._wakeWriter.send(b"\0")
+			except (BlockingIOError, InterruptedError):
+				pass  # The loop hasn't read the previous wake up yet.
+
+	def _on_accept(self, sock, onAccept):
+		try:
+			connection, address = sock.accept()
+		except (BlockingIOError, InterruptedError):
+			return None
+		if onAccept is None or not onAccept(connection):
+			logger.debug(f"Refusing connection from {address}.")
+			connection.close()
+
+	def _on_wake(self, mask):
+		try:
+			while self._wakeReader.recv(4096):
+				pass
+		except (BlockingIOError, InterruptedError):
+			pass
+
+	def _update(self):
+		"""Registers the events each connection is waiting for with the selector."""
+		for connection in list(self.connections):
+			events = 0 if connection.closed else connection.events
+			registered = self._events.get(connection, 0)
+			if events != registered:
+				if not registered:
+					self.selector.register(connection.sock, events, connection.on_events)
+				elif not events:
+					self.selector.unregister(connection.sock)
+				else:
+					self.selector.modify(connection.sock, events, connection.on_events)
+				self._events[connection] = events
+			if connection.closed:
+				self.connections.remove(connection)
+				self._events.pop(connection, None)
+				connection.sock.close()
+
+
+class SelectorConnection(object):
+	"""
+	A non-blocking connection, which is read and written by a selector loop.
+
+	The object is given to the proxy handler in place of a socket.
+	Data may be written from any thread. It is sent immediately where possible,
+	and the rest is sent by the loop once the socket is writable.
+	SSL connections are only written from the loop thread, and are handshaken by the loop.
+	If `bufferSize` is given, output which doesn't fit in the buffer is dropped,
+	and the connection is closed if `policy` is 'disconnect'.
+	"""
+
+	def __init__(self, loop, sock, recvSize=RECV_SIZE, bufferSize=None, policy=None):
+		sock.setblocking(False)
+		self.loop = loop
+		self.sock = sock
+		self.manager = None
+		self.closed = False
+		self.bufferSize = bufferSize
+		self.policy = policy
+		self.isSSL = isinstance(sock, ssl.SSLSocket)
+		self.isHandshaking = self.isSSL
+		self._handshakeEvents = selectors.EVENT_READ | selectors.EVENT_WRITE
+		self._readWantsWrite = False
+		self._writeWantsRead = False
+		self._recvBuffer = bytearray(recvSize)
+		self._recvView = memoryview(self._recvBuffer)
+		self._sendBuffers = deque()
+		self._sendSize = 0
+		self._sendLock = threading.RLock()
+
+	@property
+	def events(self):
+		"""The selector events which the connection is waiting for."""
+		if self.isHandshaking:
+			return self._handshakeEvents
+		events = 0
+		if self.manager is not None or self._writeWantsRead:
+			events |= selectors.EVENT_READ
+		if self._sendBuffers or self._readWantsWrite:
+			events |= selectors.EVENT_WRITE
+		return events
+
+	@property
+	def isClosed(self):
+		return self.closed
+
+	@property
+	def isSending(self):
+		"""True if there is data waiting to be sent."""
+		return bool(self._sendBuffers)
+
+	def start(self, manager):
+		self.manager = manager
+		self.loop.wake()
+
+	def close(self):
+		self.closed = True
+		self.loop.wake()
+
+	def sendall(self, data):
+		self.sendmsgall((data,))
+
+	def sendmsgall(self, buffers):
+		with self._sendLock:
+			if self.closed:
+				return None
+			size = sum(len(data) for data in buffers)
+			if self.bufferSize is not None and self._sendSize + size > self.bufferSize:
+				# The buffer is full, so the output is dropped.
+				if self.policy == "disconnect":
+					logger.debug("Disconnecting a viewer which is not keeping up with output.")
+					self._sendBuffers.clear()
+					self._sendSize = 0
+					self.close()
+				return None
+			wasSending = bool(self._sendBuffers)
+			self._sendBuffers.extend(memoryview(data) for data in buffers if data)
+			self._sendSize += size
+			if wasSending or not self._sendBuffers:
+				return None
+			if not self.isHandshaking and (not self.isSSL or self.loop.threadId == threading.get_ident()):
+				self._write()
+			if self._sendBuffers:
+				self.loop.wake()
+
+	def on_events(self, mask):
+		if self.isHandshaking:
+			self._handshake()
+			if self.isHandshaking:
+				return None
+		if self.manager is not None and (mask & selectors.EVENT_READ or self._readWantsWrite):
+			self._read()
+		if self._sendBuffers and (mask & selectors.EVENT_WRITE or self._writeWantsRead):
+			with self._sendLock:
+				self._write()
+
+	def _handshake(self):
+		try:
+			self.sock.do_handshake()
+		except ssl.SSLWantReadError:
+			self._handshakeEvents = selectors.EVENT_READ
+		except ssl.SSLWantWriteError:
+			self._handshakeEvents = selectors.EVENT_WRITE
+		except EnvironmentError:
+			logger.exception("SSL handshake failed.")
+			self.close()
+		else:
+			self.isHandshaking = False
+
+	def _read(self):
+		while not self.closed:
+			try:
+				count = self.sock.recv_into(self._recvBuffer)
+			except ssl.SSLWantWriteError:
+				self._readWantsWrite = True
+				return None
+			except (ssl.SSLWantReadError, BlockingIOError, InterruptedError):
+				self._readWantsWrite = False
+				return None
+			except EnvironmentError:
+				self.close()
+				return None
+			self._readWantsWrite = False
+			if not count:
+				self.close()
+				return None
+			self.manager.parse(bytes(self._recvView[:count]))
+			if not self.isSSL or not self.sock.pending():
+				# SSL connections can hold decrypted data which doesn't make the socket readable.
+				return None
+
+	def _write(self):
+		buffers = self._sendBuffers
+		while buffers and not self.closed:
+			try:
+				if len(buffers) > 1 and not self.isSSL and hasattr(self.sock, "sendmsg"):
+					sent = self.sock.sendmsg(list(islice(buffers, SENDMSG_MAX_BUFFERS)))
+				else:
+					sent = self.sock.send(buffers[0])
+			except ssl.SSLWantReadError:
+				self._writeWantsRead = True
+				return None
+			except (ssl.SSLWantWriteError, BlockingIOError, InterruptedError):
+				self._writeWantsRead = False
+				return None
+			except EnvironmentError:
+				buffers.clear()
+				self._sendSize = 0
+				self.close()
+				return None
+			self._writeWantsRead = False
+			self._sendSize -= sent
+			# Discard the buffers which were sent completely, and the sent part of the next one.
+			while sent and sent >= len(buffers[0]):
+				sent -= len(buffers.popleft())
+			if sent:
+				buffers[0] = buffers[0][sent:]
+
+
+class MockedConnection(object):
+	"""Stands in for the game connection when emulating offline in a selector loop."""
+
+	def __init__(self, loop):
+		self.loop = loop
+		self.closed = False
+
+	def start(self, manager):
+		pass
+
+	def close(self):
+		self.closed = True
+		self.loop.wake()
+
+	def sendall(self, data):
+		if data == b"quit":
+			self.close()
+
+
+def callSoon(loop, callback, *args):
+	"""
+	Calls a function on the thread running an event loop.
+
+	The function is called immediately if called from that thread, otherwise it is scheduled with the loop.
+
+	Args:
+		loop: The event loop.
+		callback: The function to call.
+		*args: The positional arguments to pass to the function.
+	"""
+	try:
+		isLoopThread = asyncio.get_running_loop() is loop
+	except RuntimeError:
+		isLoopThread = False
+	if isLoopThread:
+		callback(*args)
+	else:
+		loop.call_soon_threadsafe(callback, *args)
+
+
+class EventQueue(BoundedEventQueue):
+	"""
+	A queue of mapper events, which is consumed by a task on an event loop.
+
+	The loop can't wait for the task which consumes the queue, so under the 'block' policy,
+	reading from the `reader` connection is paused while the queue is full, and resumed once it is half empty.
+	"""
+
+	def __init__(self, loop, maxSize=EVENT_QUEUE_SIZE, policy=QUEUE_POLICIES[0], reader=None):
+		super().__init__(maxSize, policy)
+		self.loop = loop
+		self.reader = reader
+		self._isReaderPaused = False
+		self._waiter = None
+
+	def put(self, event):
+		# Events may be put from any thread, but mud events are only put by the reader on the loop thread.
+		if not self._admit(event):
+			return None
+		self._append(event)
+		if (
+			self.policy == "block"
+			and event[0] == MUD_DATA
+			and self.reader is not None
+			and self.isFull
+			and not self._isReaderPaused
+		):
+			self.waits += 1
+			self._isReaderPaused = True
+			self.reader.transport.pause_reading()
+		callSoon(self.loop, self._wake)
+
+	def _wake(self):
+		if self._waiter is not None and not self._waiter.done():
+			self._waiter.set_result(None)
+
+	async def get(self, timeout=None):
+		while not self._events:
+			self._waiter = self.loop.create_future()
+			try:
+				await asyncio.wait_for(self._waiter, timeout)
+			except asyncio.TimeoutError:
+				raise Empty
+			finally:
+				self._waiter = None
+		event = self._events.popleft()
+		if self._isReaderPaused and len(self._events) <= self.maxSize // 2:
+			self._isReaderPaused = False
+			self.reader.transport.resume_reading()
+		return event
+
+
+class ProxyProtocol(asyncio.Protocol):
+	"""
+	Passes data between a connection and a protocol manager on an event loop.
+
+	The object is given to the proxy handler in place of a socket.
+	If `bufferSize` is given, output which doesn't fit in the transport's buffer is dropped,
+	and the connection is closed if `policy` is 'disconnect'.
+	"""
+
+	def __init__(self, loop, bufferSize=None, policy=None):
+		self.loop = loop
+		self.transport = None
+		self.manager = None
+		self.closed = loop.create_future()
+		self.bufferSize = bufferSize
+		self.policy = policy
+
+	@property
+	def isClosed(self):
+		return self.closed.done()
+
+	def connection_made(self, transport):
+		sock = transport.get_extra_info("socket")
+		if sock is not None:
+			sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+		# Data isn't read until there is a manager to parse it.
+		transport.pause_reading()
+		self.transport = transport
+
+	def connection_lost(self, exc):
+		if not self.closed.done():
+			self.closed.set_result(None)
+
+	def data_received(self, data):
+		self.manager.parse(data)
+
+	def start(self, manager):
+		self.manager = manager
+		self.transport.resume_reading()
+
+	def close(self):
+		callSoon(self.loop, self.transport.close)
+
+	def sendall(self, data):
+		self.sendmsgall((data,))
+
+	def sendmsgall(self, buffers):
+		callSoon(self.loop, self._write, buffers)
+
+	def _write(self, buffers):
+		transport = self.transport
+		if transport.is_closing():
+			return None
+		elif self.bufferSize is not None and (
+			transport.get_write_buffer_size() + sum(len(data) for data in buffers) > self.bufferSize
+		):
+			# The buffer is full, so the output is dropped.
+			if self.policy == "disconnect":
+				logger.debug("Disconnecting a viewer which is not keeping up with output.")
+				transport.abort()
+		elif len(buffers) == 1:
+			transport.write(buffers[0])
+		else:
+			transport.writelines(buffers)
+
+
+class MockedProtocol(object):
+	"""Stands in for the game connection when emulating offline on an event loop."""
+
+	def __init__(self, loop):
+		self.loop = loop
+		self.closed = loop.create_future()
+
+	def start(self, manager):
+		pass
+
+	def close(self):
+		callSoon(self.loop, self._close)
+
+	def _close(self):
+		if not self.closed.done():
+			self.closed.set_result(None)
+
+	def sendall(self, data):
+		if data == b"quit":
+			self.close()
+
+
+async def connectAsync(loop, localHost, localPort, remoteHost, remotePort, noSsl, isEmulatingOffline):
+	# initialise client connection
+	proxySocket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+	proxySocket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+	proxySocket.setblocking(False)
+	proxySocket.bind((localHost, localPort))
+	proxySocket.listen(1)
+	touch(LISTENING_STATUS_FILE)
+	try:
+		playerSocket, playerAddress = await loop.sock_accept(proxySocket)
+	except BaseException:
+		proxySocket.close()
+		raise
+	playerTransport, player = await loop.connect_accepted_socket(lambda: ProxyProtocol(loop), playerSocket)
+	# initialise server connection
+	if isEmulatingOffline:
+		return proxySocket, player, MockedProtocol(loop)
+	context = None
+	if not noSsl:
+		if certifi:
+			context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+			context.load_verify_locations(certifi.where())
+		else:
+			print("Error: cannot encrypt connection. Certifi not found.")
+	try:
+		gameTransport, game = await loop.create_connection(
+			lambda: ProxyProtocol(loop),
+			remoteHost,
+			remotePort,
+			ssl=context,
+			server_hostname=None if context is None else remoteHost,
+		)
+	except TimeoutError:
+		player.sendall(b"\r\nError: server connection timed out!\r\n")
+		player.sendall(b"\r\n")
+		player.close()
+		await player.closed
+		return proxySocket, player, None
+	return proxySocket, player, game
+
+
+async def acceptViewersAsync(loop, proxySocket, fanOut, maxViewers, viewerPolicy):
+	while True:
+		viewerSocket, viewerAddress = await loop.sock_accept(proxySocket)
+		viewerTransport, viewer = await loop.connect_accepted_socket(
+			lambda: ProxyProtocol(loop, bufferSize=VIEWER_BUFFER_SIZE, policy=viewerPolicy), viewerSocket
+		)
+		if not fanOut.addViewer(viewer, maxViewers):
+			viewer.close()
+
+
+async def serveAsync(mapper, player, game, viewerAcceptor=None):
+	player.start(mapper.proxy.player)
+	game.start(mapper.proxy.game)
+	mapperTask = asyncio.ensure_future(mapper.runAsync())
+	viewerTask = None if viewerAcceptor is None else asyncio.ensure_future(viewerAcceptor)
+	await asyncio.wait((player.closed, game.closed), return_when=asyncio.FIRST_COMPLETED)
+	if not game.closed.done():
+		# The player disconnected.
+		if mapper.isEmulatingOffline:
+			mapper.proxy.game.write(b"quit")
+		else:
+			game.close()
+		await game.closed
+	if mapper.interface != "text":
+		# Shutdown the gui
+		mapper._gui_queue.put(None)
+	mapper.queue.put((None, None))
+	await mapperTask
+	player.sendall(b"\r\n")
+	player.close()
+	await player.closed
+	mapper.proxy.close()
+	if viewerTask is not None:
+		viewerTask.cancel()
+
+
+def asyncMain(
+	outputFormat,
+	interface,
+	isEmulatingOffline,
+	promptTerminator,
+	gagPrompts,
+	findFormat,
+	localHost,
+	localPort,
+	remoteHost,
+	remotePort,
+	noSsl,
+	fusedParser=False,
+	maxViewers=0,
+	viewerPolicy=VIEWER_POLICIES[0],
+	mapServer=None,
+	queuePolicy=QUEUE_POLICIES[0],
+):
+	"""
+	Runs the proxy and the mapper's event handling on an asyncio event loop.
+
+	If a GUI is used, the loop runs on a separate thread, because the GUI must run on the main thread.
+	"""
+	loop = asyncio.new_event_loop()
+	proxySocket = None
+	try:
+		proxySocket, player, game = loop.run_until_complete(
+			connectAsync(loop, localHost, localPort, remoteHost, remotePort, noSsl, isEmulatingOffline)
+		)
+		if game is None:
+			return
+		fanOut = ClientFanOut(player)
+		viewerAcceptor = None
+		if maxViewers:
+			viewerAcceptor = acceptViewersAsync(loop, proxySocket, fanOut, maxViewers, viewerPolicy)
+		mapper = Mapper(
+			playerSocket=fanOut,
+			gameSocket=game,
+			outputFormat=outputFormat,
+			interface=interface,
+			promptTerminator=promptTerminator,
+			gagPrompts=gagPrompts,
+			findFormat=findFormat,
+			isEmulatingOffline=isEmulatingOffline,
+			isFusedParser=fusedParser,
+			eventQueue=EventQueue(loop, policy=queuePolicy, reader=game),
+			flushTimer=lambda delay, callback: callSoon(loop, loop.call_later, delay, callback),
+			mapServer=mapServer,
+		)
+		serve = serveAsync(mapper, player, game, viewerAcceptor)
+		if interface == "text":
+			loop.run_until_complete(serve)
+		else:
+			proxyThread = threading.Thread(target=loop.run_until_complete, args=(serve,), name="Proxy")
+			proxyThread.start()
+			pyglet.app.run()
+			proxyThread.join()
+		fanOut.close()
+	finally:
+		if proxySocket is not None:
+			proxySocket.close()
+		loop.close()
+		removeFile(LISTENING_STATUS_FILE)
+
+
+def runSelectorLoop(loop, mapperThread, player, game):
+	loop.run(lambda: player.closed or game.closed)
+	if not game.closed:
+		# The player disconnected.
+		if mapperThread.isEmulatingOffline:
+			mapperThread.proxy.game.write(b"quit")
+		else:
+			game.close()
+	if mapperThread.interface != "text":
+		# Shutdown the gui
+		mapperThread._gui_queue.put(None)
+	mapperThread.queue.put((None, None))
+	mapperThread.join()
+	player.sendall(b"\r\n")
+	loop.run(lambda: player.closed or not player.isSending)
+
+
+def selectorsMain(
+	outputFormat,
+	interface,
+	isEmulatingOffline,
+	promptTerminator,
+	gagPrompts,
+	findFormat,
+	localHost,
+	localPort,
+	remoteHost,
+	remotePort,
+	noSsl,
+	fusedParser=False,
+	maxViewers=0,
+	viewerPolicy=VIEWER_POLICIES[0],
+	mapServer=None,
+	queuePolicy=QUEUE_POLICIES[0],
+):
+	"""
+	Runs the proxy on a single selector loop, while the mapper handles events on its own thread.
+
+	If a GUI is used, the loop runs on a separate thread, because the GUI must run on the main thread.
+	"""
+	# initialise client connection
+	proxySocket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+	proxySocket.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+	proxySocket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+	proxySocket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+	proxySocket.bind((localHost, localPort))
+	proxySocket.listen(1 + maxViewers)
+	touch(LISTENING_STATUS_FILE)
+	playerSocket, playerAddress = proxySocket.accept()
+	sockets = [playerSocket, proxySocket]
+	loop = SelectorLoop()
+	player = SelectorConnection(loop, playerSocket)
+	loop.add(player)
+	fanOut = ClientFanOut(player)
+
+	def acceptViewer(viewerSocket):
+		viewer = SelectorConnection(loop, viewerSocket, bufferSize=VIEWER_BUFFER_SIZE, policy=viewerPolicy)
+		if not fanOut.addViewer(viewer, maxViewers):
+			return False
+		loop.add(viewer)
+		return True
+
+	loop.addListener(proxySocket, acceptViewer if maxViewers else None)
+	# initialise server connection
+	if isEmulatingOffline:
+		game = MockedConnection(loop)
+	else:
+		try:
+			gameSocket = socket.create_connection((remoteHost, remotePort))
+		except TimeoutError:
+			player.sendall(b"\r\nError: server connection timed out!\r\n")
+			player.sendall(b"\r\n")
+			loop.run(lambda: player.closed or not player.isSending)
+			loop.close()
+			for sock in sockets:
+				sock.close()
+			removeFile(LISTENING_STATUS_FILE)
+			return
+		gameSocket.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+		gameSocket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+		if not noSsl and certifi:
+			context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+			context.load_verify_locations(certifi.where())
+			gameSocket = context.wrap_socket(gameSocket, server_hostname=remoteHost, do_handshake_on_connect=False)
+		elif not noSsl:
+			print("Error: cannot encrypt connection. Certifi not found.")
+		sockets.append(gameSocket)
+		game = SelectorConnection(loop, gameSocket)
+		loop.add(game)
+	mapperThread = Mapper(
+		playerSocket=fanOut,
+		gameSocket=game,
+		outputFormat=outputFormat,
+		interface=interface,
+		promptTerminator=promptTerminator,
+		gagPrompts=gagPrompts,
+		findFormat=findFormat,
+		isEmulatingOffline=isEmulatingOffline,
+		isFusedParser=fusedParser,
+		mapServer=mapServer,
+		queuePolicy=queuePolicy,
+	)
+	player.start(mapperThread.proxy.player)
+	game.start(mapperThread.proxy.game)
+	mapperThread.start()
+	if interface == "text":
+		runSelectorLoop(loop, mapperThread, player, game)
+	else:
+		loopThread = threading.Thread(
+			target=runSelectorLoop, args=(loop, mapperThread, player, game), name="Proxy"
+		)
+		loopThread.start()
+		pyglet.app.run()
+		loopThread.join()
+	mapperThread.proxy.close()
+	for sock in sockets:
+		try:
+			sock.shutdown(socket.SHUT_RDWR)
+		except EnvironmentError:
+			pass
+		sock.close()
+	# Any viewers which are still connected are closed with the loop.
+	loop.close()
+	removeFile(LISTENING_STATUS_FILE)
+
+
 def main(
 	outputFormat,
 	interface,
@@ -206,17 +1114,44 @@ def main(
 	remoteHost,
 	remotePort,
 	noSsl,
+	fusedParser=False,
+	transport=TRANSPORTS[0],
+	maxViewers=0,
+	viewerPolicy=VIEWER_POLICIES[0],
+	mapServer=None,
+	queuePolicy=QUEUE_POLICIES[0],
 ):
+	if transport != "threads":
+		transportMain = asyncMain if transport == "asyncio" else selectorsMain
+		return transportMain(
+			outputFormat,
+			interface,
+			isEmulatingOffline,
+			promptTerminator,
+			gagPrompts,
+			findFormat,
+			localHost,
+			localPort,
+			remoteHost,
+			remotePort,
+			noSsl,
+			fusedParser,
+			maxViewers,
+			viewerPolicy,
+			mapServer,
+			queuePolicy,
+		)
 	# initialise client connection
 	proxySocket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
 	proxySocket.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
 	proxySocket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
 	proxySocket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
 	proxySocket.bind((localHost, localPort))
-	proxySocket.listen(1)
+	proxySocket.listen(1 + maxViewers)
 	touch(LISTENING_STATUS_FILE)
 	playerSocket, playerAddress = proxySocket.accept()
-	playerSocket = BufferedSocket(playerSocket, timeout=1.0)
+	playerSocket = BufferedVectorSocket(playerSocket, timeout=1.0)
+	fanOut = ClientFanOut(playerSocket)
 	# initialise server connection
 	try:
 		if isEmulatingOffline:
@@ -232,6 +1167,7 @@ def main(
 			pass
 		finally:
 			playerSocket.close()
+			proxySocket.close()
 			removeFile(LISTENING_STATUS_FILE)
 			return
 	else:
@@ -241,7 +1177,7 @@ def main(
 		gameSocket, timeout=None, insecure=noSsl or isEmulatingOffline, server_hostname=remoteHost
 	)
 	mapperThread = Mapper(
-		playerSocket=playerSocket,
+		playerSocket=fanOut,
 		gameSocket=gameSocket,
 		outputFormat=outputFormat,
 		interface=interface,
@@ -249,12 +1185,18 @@ def main(
 		gagPrompts=gagPrompts,
 		findFormat=findFormat,
 		isEmulatingOffline=isEmulatingOffline,
+		isFusedParser=fusedParser,
+		mapServer=mapServer,
+		queuePolicy=queuePolicy,
 	)
 	playerThread = Player(playerSocket, mapperThread)
 	gameThread = Game(gameSocket, mapperThread)
+	viewerAcceptor = ViewerAcceptor(proxySocket, fanOut, maxViewers, viewerPolicy)
 	gameThread.start()
 	playerThread.start()
 	mapperThread.start()
+	if maxViewers:
+		viewerAcceptor.start()
 	if interface != "text":
 		pyglet.app.run()
 	gameThread.join()
@@ -272,6 +1214,9 @@ def main(
 		pass
 	playerThread.join()
 	mapperThread.proxy.close()
+	viewerAcceptor.close()
+	fanOut.close()
 	gameSocket.close()
 	playerSocket.close()
+	proxySocket.close()
 	removeFile(LISTENING_STATUS_FILE)
@@ -7,20 +7,24 @@
 from __future__ import annotations
 
 # Built-in Modules:
+import asyncio
+import functools
 import logging
 import re
 import textwrap
 import threading
-from queue import SimpleQueue
+from queue import Empty
 from timeit import default_timer
 
 # Local Modules:
-from . import INTERFACES, MUD_DATA, OUTPUT_FORMATS, USER_DATA, roomdata
+from . import INTERFACES, MAPPER_DATA, MUD_DATA, OUTPUT_FORMATS, QUEUE_POLICIES, USER_DATA, roomdata
 from .cleanmap import ExitsCleaner
 from .clock import CLOCK_REGEX, DAWN_REGEX, DAY_REGEX, DUSK_REGEX, MONTHS, NIGHT_REGEX, TIME_REGEX, Clock
 from .config import Config
 from .delays import OneShot
+from .mapserver import FIND_COMMANDS, USER_COMMANDS, MapClient, RemoteRooms, roomFromDict
 from .protocols.proxy import ProxyHandler
+from .queues import ThreadEventQueue
 from .utils import decodeBytes, escapeIAC, escapeXML, formatDocString, regexFuzzy, simplified, stripAnsi
 from .world import (
 	DIRECTIONS,
@@ -28,14 +32,44 @@ from .world import (
 	REVERSE_DIRECTIONS,
 	RUN_DESTINATION_REGEX,
 	TERRAIN_SYMBOLS,
+	PathSearch,
 	World,
 )
 
 
+BATCH_UNSAFE_EXIT_FLAGS = frozenset(
+	("avoid", "climb", "damage", "door", "fall", "guarded", "random", "special")
+)
 EXIT_TAGS_REGEX = re.compile(
 	r"(?P<door>[\(\[\#]?)(?P<road>[=-]?)(?P<climb>[/\\]?)(?P<portal>[\{]?)"
 	+ fr"(?P<direction>{'|'.join(DIRECTIONS)})"
 )
+MOVEMENT_BLOCKED_REGEX = re.compile(  # Movement prevented by the exit itself, rather than the player's state.
+	"^(?:{lines})$".format(
+		lines="|".join(
+			[
+				r"The \w+ seem[s]? to be closed\.",
+				r"It seems to be locked\.",
+				r"You cannot ride there\.",
+				r"Your boat cannot enter this place\.",
+				r"A guard steps in front of you\.",
+				r"The clerk bars your way\.",
+				r"You cannot go that way\.\.\.",
+				r"Alas\, you cannot go that way\.\.\.",
+				r"You need to swim to go there\.",
+				r"Your mount cannot climb the tree\!",
+				r"You can\'t go into deep water\!",
+				r"Oops\! You cannot go there riding\!",
+				r"You need to climb to go there\.",
+				r"You cannot climb there\.",
+				(
+					r".+ (?:prevents|keeps) you from going "
+					+ r"(?:north|south|east|west|up|down|upstairs|downstairs|past (?:him|her|it))\."
+				),
+			]
+		)
+	)
+)
 MOVEMENT_FORCED_REGEX = re.compile(
 	"|".join(
 		[
@@ -116,15 +150,57 @@ MOVEMENT_PREVENTED_REGEX = re.compile(
 		)
 	)
 )
+PREFETCH_IDLE_DELAY = 0.5  # Seconds without events before routes are prefetched.
 PROMPT_REGEX = re.compile(
 	r"^(?P<light>[@*!\)o]?)(?P<terrain>[\#\(\[\+\.%fO~UW:=<]?)"
 	+ r"(?P<weather>[*'\"~=-]{0,2})\s*(?P<movementFlags>[RrSsCcW]{0,4})[^\>]*\>$"
 )
+RIDABLE_LINES = frozenset(("It's too difficult to ride here.", "You are already riding."))
+RUN_WINDOW_MAXIMUM = 10
+SYNC_LINES = {  # Lines after which the player is known to be in a room, by vnum.
+	(
+		"Wet, cold and filled with mud you drop down into a dark "
+		"and moist cave, while you notice the mud above you moving "
+		"to close the hole you left in the cave ceiling."
+	): "17189",
+	(
+		"The gravel below your feet loosens, shifting slightly.. "
+		"Suddenly, you lose your balance and crash to the cave floor below."
+	): "15324",
+}
+TIME_REGEXES = (CLOCK_REGEX, DAWN_REGEX, DAY_REGEX, DUSK_REGEX, NIGHT_REGEX, TIME_REGEX)
+
+
+def isMapperLine(data):
+	"""
+	Returns True if the mapper acts on a line of output from the game, as in Mapper.mud_event_line.
+	Such lines are never dropped when the mapper falls behind.
+	"""
+	return (
+		data.startswith("You quietly scout ")
+		or data == "A huge clock is standing here."
+		or data in SYNC_LINES
+		or data in RIDABLE_LINES
+		or any(regex.match(data) for regex in TIME_REGEXES)
+		or MOVEMENT_BLOCKED_REGEX.search(data) is not None
+		or MOVEMENT_FORCED_REGEX.search(data) is not None
+		or MOVEMENT_PREVENTED_REGEX.search(data) is not None
+	)
 
 
 logger = logging.getLogger(__name__)
 
 
+class QueueActivity(object):
+	"""Acts as a cancellation event for idle work, which is set while events are waiting in a queue."""
+
+	def __init__(self, queue):
+		self.queue = queue
+
+	def is_set(self):
+		return not self.queue.empty()
+
+
 class Mapper(threading.Thread, World):
 	def __init__(
 		self,
@@ -136,6 +212,11 @@ class Mapper(threading.Thread, World):
 		gagPrompts,
 		findFormat,
 		isEmulatingOffline,
+		isFusedParser=False,
+		eventQueue=None,
+		flushTimer=None,
+		mapServer=None,
+		queuePolicy=QUEUE_POLICIES[0],
 	):
 		threading.Thread.__init__(self)
 		self.name = "Mapper"
@@ -146,15 +227,30 @@ class Mapper(threading.Thread, World):
 		self.gagPrompts = gagPrompts
 		self.findFormat = findFormat
 		self.isEmulatingOffline = isEmulatingOffline
-		self.queue = SimpleQueue()
+		self.queue = (
+			ThreadEventQueue(policy=queuePolicy, isKeptLine=isMapperLine) if eventQueue is None else eventQueue
+		)
 		cfg = Config()
 		self._autoUpdateRooms = cfg.get("autoUpdateRooms", False)
+		self._runWindow = cfg.get("runWindow", 1)
 		del cfg
 		self.autoMapping = False
 		self.autoMerging = True
 		self.autoLinking = True
 		self.autoWalk = False
 		self.autoWalkDirections = []
+		self.autoWalkDirection = None
+		self.autoWalkPending = []
+		self.autoWalkRoute = None
+		self.autoReplanning = False
+		self.runBatching = False
+		self.prefetching = True
+		self.timeCosts = True
+		self.prefetchedFrom = None
+		self.isReplanning = False
+		self.queuedRun = None  # A run which waits for the movements of the previous run to be answered.
+		self.activeSearch = None
+		self.isRefreshingLabelDistances = False
 		self.userCommands = [
 			func[len("user_command_") :]
 			for func in dir(self)
@@ -207,11 +303,21 @@ class Mapper(threading.Thread, World):
 			outputFormat=outputFormat,
 			promptTerminator=promptTerminator,
 			isEmulatingOffline=isEmulatingOffline,
+			isFusedParser=isFusedParser,
+			flushTimer=flushTimer,
 			mapperCommands=[func.encode("us-ascii") for func in self.userCommands],
 			eventCaller=self.queue.put,
 		)
 		self.proxy.connect()
-		World.__init__(self, interface=self.interface)
+		if mapServer is None:
+			self.mapClient = None
+			World.__init__(self, interface=self.interface)
+		else:
+			# The map is owned by the map server, and only the rooms in use are fetched from it.
+			self.mapClient = MapClient(mapServer, onMapChanged=self.onMapChanged)
+			World.__init__(self, interface=self.interface, rooms=RemoteRooms(self.mapClient))
+			self.currentRoom = self.emulationRoom = self.rooms.get("0")
+			self.lastEmulatedJump = None
 
 	@property
 	def outputFormat(self):
@@ -249,10 +355,28 @@ class Mapper(threading.Thread, World):
 		cfg.save()
 		del cfg
 
+	@property
+	def runWindow(self):
+		return self._runWindow
+
+	@runWindow.setter
+	def runWindow(self, value):
+		self._runWindow = min(max(int(value), 1), RUN_WINDOW_MAXIMUM)
+		cfg = Config()
+		cfg["runWindow"] = self._runWindow
+		cfg.save()
+		del cfg
+
 	def output(self, *args, **kwargs):
 		# Override World.output.
 		return self.sendPlayer(*args, **kwargs)
 
+	def costPeriod(self):
+		# Override World.costPeriod.
+		if not self.timeCosts or not self.timeSynchronized:
+			return "DAY"
+		return self.clock.mumeTime.dawnDuskState[0]
+
 	def sendPlayer(self, msg, showPrompt=True):
 		msg = msg.replace("\r\n", "\n").replace("\r", "\r\0").replace("\n", "\r\n")
 		if self.outputFormat == "raw":
@@ -376,10 +500,11 @@ class Mapper(threading.Thread, World):
 		if direction not in self.emulationRoom.exits:
 			self.output("Alas, you cannot go that way...")
 			return
-		room = self.emulationRoom.exits[direction].to
-		if "death" == room:
+		exitObj = self.emulationRoom.exits[direction]
+		room = self.exitTarget(exitObj)
+		if "death" == exitObj.to:
 			self.output("deathtrap!")
-		elif "undefined" == room:
+		elif room is None:
 			self.output("undefined")
 		else:
 			self.emulation_command_go(room, isJump=False)
@@ -438,6 +563,8 @@ class Mapper(threading.Thread, World):
 		return self.sendGame(" ".join(item for item in (matchDict["action"], door, direction[0:1]) if item))
 
 	def user_command_automap(self, *args):
+		if self.mapClient is not None:
+			return self.sendPlayer("Auto mapping is not available while using a map server.")
 		if not args or not args[0] or not args[0].strip():
 			self.autoMapping = not self.autoMapping
 		else:
@@ -465,6 +592,53 @@ class Mapper(threading.Thread, World):
 			self.autoLinking = args[0].strip().lower() == "on"
 		self.sendPlayer(f"Auto Linking {'on' if self.autoLinking else 'off'}.")
 
+	def user_command_autoreplan(self, *args):
+		"""Toggles repairing the route of 'run' when the player is moved off course, instead of stopping."""
+		if not args or not args[0] or not args[0].strip():
+			self.autoReplanning = not self.autoReplanning
+		else:
+			self.autoReplanning = args[0].strip().lower() == "on"
+		self.sendPlayer(f"Auto replanning {'on' if self.autoReplanning else 'off'}.")
+
+	def user_command_prefetch(self, *args):
+		"""Toggles searching for the routes most likely to be run next while the mapper is idle."""
+		if not args or not args[0] or not args[0].strip():
+			self.prefetching = not self.prefetching
+		else:
+			self.prefetching = args[0].strip().lower() == "on"
+		self.sendPlayer(f"Route prefetching {'on' if self.prefetching else 'off'}.")
+
+	def user_command_timecosts(self, *args):
+		"""Toggles making dark and evil aligned rooms cost more to path through at night and twilight."""
+		if not args or not args[0] or not args[0].strip():
+			self.timeCosts = not self.timeCosts
+		else:
+			self.timeCosts = args[0].strip().lower() == "on"
+		self.sendPlayer(f"Time of day costs {'on' if self.timeCosts else 'off'}.")
+
+	def user_command_runbatch(self, *args):
+		"""
+		Toggles sending the safe segments of a 'run' route to the game in a single batch.
+		Segments are safe until the next exit that has a door or needs climbing, or a command such as 'lead'.
+		"""
+		if not args or not args[0] or not args[0].strip():
+			self.runBatching = not self.runBatching
+		else:
+			self.runBatching = args[0].strip().lower() == "on"
+		self.sendPlayer(f"Run batching {'on' if self.runBatching else 'off'}.")
+
+	def user_command_runwindow(self, *args):
+		"""
+		Sets how many movements 'run' may send before the first of them is confirmed by the game.
+		A window of 1 waits for each movement to be confirmed before sending the next.
+		"""
+		if args and args[0] and args[0].strip():
+			try:
+				self.runWindow = int(args[0].strip())
+			except ValueError:
+				return self.sendPlayer(f"Usage: runwindow [1-{RUN_WINDOW_MAXIMUM}]")
+		self.sendPlayer(f"Run window {self.runWindow}.")
+
 	def user_command_rdelete(self, *args):
 		self.sendPlayer(self.rdelete(*args))
 
@@ -534,6 +708,17 @@ class Mapper(threading.Thread, World):
 	def user_command_rinfo(self, *args):
 		self.sendPlayer("\n".join(self.rinfo(*args)))
 
+	def user_command_mapstats(self, *args):
+		"""Shows the number of rooms, connected components, one-way traps, and orphaned rooms in the map."""
+		self.sendPlayer("\n".join(self.mapstats(*args)))
+
+	def user_command_queuestats(self, *args):
+		"""Shows how many events are waiting for the mapper, and how many were dropped or held back."""
+		result = ["Event queue:", *self.queue.stats()]
+		if self._interface != "text":
+			result.extend(self._gui_queue.stats())
+		self.sendPlayer("\n".join(result))
+
 	def user_command_vnum(self, *args):
 		"""states the vnum of the current room"""
 		self.sendPlayer(f"Vnum: {self.currentRoom.vnum}.")
@@ -553,22 +738,74 @@ class Mapper(threading.Thread, World):
 	def user_command_getlabel(self, *args):
 		self.sendPlayer(self.getlabel(*args))
 
+	def user_command_labeltable(self, *args):
+		"""
+		Shows the cost of moving between two labelled rooms, or 'labeltable refresh' to recalculate the costs
+		between all labelled rooms. Routes to labelled rooms are read from the table while it is up to date.
+		"""
+		if args and args[0] and args[0].strip().lower() == "refresh":
+			if self.isRefreshingLabelDistances:
+				return self.sendPlayer("The label table is already being calculated.")
+			self.isRefreshingLabelDistances = True
+			if not self._isLabelDistancesLoaded:
+				self.loadLabelDistances()
+			thread = threading.Thread(
+				target=self.labelDistancesWorker,
+				args=(self.graph, list(self.labels.values()), self._labelDistances),
+				name="LabelDistances",
+			)
+			thread.daemon = True
+			thread.start()
+			return self.sendPlayer("Calculating the costs between labelled rooms.")
+		self.sendPlayer(self.labeltable(*args))
+
+	def labelDistancesWorker(self, graph, vnums, previous):
+		start = default_timer()
+		try:
+			table = roomdata.distances.buildLabelDistances(graph, vnums, previous)
+		except Exception:
+			logger.exception("Error while calculating the label table.")
+			table = None
+		self.queue.put((MAPPER_DATA, (self.handleLabelDistances, (table, default_timer() - start))))
+
+	def handleLabelDistances(self, table, elapsed):
+		self.isRefreshingLabelDistances = False
+		if table is None:
+			self.sendPlayer("Error while calculating the label table.")
+		else:
+			self.sendPlayer(self.labelDistancesRefreshed(table, elapsed))
+
 	def user_command_savemap(self, *args):
 		self.saveRooms()
 
 	def user_command_run(self, *args):
 		if not args or not args[0] or not args[0].strip():
-			return self.sendPlayer("Usage: run [label|vnum]")
-		self.autoWalkDirections = []
+			return self.sendPlayer("Usage: run [label|vnum|nearest query]")
 		argString = args[0].strip()
+		isTarget = argString.lower() == "t" or argString.lower().startswith("t ")
+		if self.autoWalkPending and not isTarget:
+			# The room the player will end up in is not known until the movements already sent are answered.
+			self.stopRun()
+			self.queuedRun = argString
+			return self.sendPlayer(f"Running once {len(self.autoWalkPending)} movements are answered.")
+		self.autoWalkDirections = []
 		if argString.lower() == "c":
 			if self.lastPathFindQuery:
+				if self.lastPathFindQuery.lower().startswith("nearest "):
+					self.sendPlayer(self.lastPathFindQuery)
+					return self.runNearest(self.lastPathFindQuery[len("nearest ") :])
 				match = RUN_DESTINATION_REGEX.match(self.lastPathFindQuery)
 				destination = match.group("destination")
 				self.sendPlayer(destination)
 			else:
 				return self.sendPlayer("Error: no previous path to continue.")
-		elif argString.lower() == "t" or argString.lower().startswith("t "):
+		elif argString.lower() == "nearest" or argString.lower().startswith("nearest "):
+			query = argString[len("nearest ") :].strip()
+			if not query:
+				return self.sendPlayer("Usage: run nearest [mob flag|load flag|label prefix|key:value]")
+			self.lastPathFindQuery = f"nearest {query}"
+			return self.runNearest(query)
+		elif isTarget:
 			argString = argString[2:].strip()
 			if not argString:
 				if self.lastPathFindQuery:
@@ -587,13 +824,24 @@ class Mapper(threading.Thread, World):
 			flags = flags.split("|")
 		else:
 			flags = None
-		result = self.pathFind(destination=destination, flags=flags)
+		self.startSearch(
+			self.pathSearch(destination=destination, flags=flags),
+			functools.partial(self.startRun, query=None if argString == "c" else argString),
+		)
+
+	def runNearest(self, query):
+		self.startSearch(self.nearestSearch(query), self.startRun)
+
+	def startRun(self, result, query=None):
 		if result is not None:
 			self.autoWalkDirections = result
 			self.autoWalk = True
+			self.autoWalkRoute = self.lastRoute
 			if result:
-				if argString != "c":
-					self.lastPathFindQuery = argString
+				if query is not None:
+					self.lastPathFindQuery = query
+				if self.lastRoute is not None:
+					self.countRoute(*self.lastRoute)
 				self.walkNextDirection()
 
 	def user_command_step(self, *args):
@@ -615,6 +863,7 @@ class Mapper(threading.Thread, World):
 			self.sendPlayer("Specify a path to follow.")
 
 	def user_command_stop(self, *args):
+		self.queuedRun = None
 		self.sendPlayer(self.stopRun())
 
 	def user_command_path(self, *args):
@@ -622,6 +871,52 @@ class Mapper(threading.Thread, World):
 		if result is not None:
 			self.sendPlayer(result)
 
+	def user_command_reach(self, *args):
+		"""
+		Counts the rooms which can be reached within a movement cost, such as 'reach 100' or 'reach 100 noroad'.
+		The rooms are tinted in the hc GUI until 'reach off' is used.
+		"""
+		result = self.reach(*args)
+		if result:
+			self.sendPlayer(result)
+
+	def user_command_route(self, *args):
+		"""Finds a short route from the current room which visits each of the given labels or vnums."""
+		stops, error = self.routeStops(*args)
+		if error:
+			return self.sendPlayer(error)
+		origin = self.currentRoom
+		vnums = [roomObj.vnum for roomObj in (origin, *stops)]
+		graph, missing = self.missingPairCosts(vnums)
+		thread = threading.Thread(
+			target=self.routeWorker,
+			args=(graph, self.labelDistances, origin, stops, vnums, missing, args),
+			name="Route",
+		)
+		thread.daemon = True
+		thread.start()
+
+	def routeWorker(self, graph, table, origin, stops, vnums, missing, args):
+		# The costs between the stops, and the paths between them, are found without blocking the mapper thread.
+		try:
+			rows = roomdata.distances.pairwiseCosts(
+				graph, [graph.indices[vnum] for vnum in missing], [graph.indices[vnum] for vnum in vnums]
+			)
+			result = self.routeTour(graph, table, origin, stops, self.addPairCosts(graph, vnums, missing, rows))
+		except Exception:
+			logger.exception("Error while finding a route.")
+			result = None
+		self.queue.put((MAPPER_DATA, (self.handleRoute, (graph, origin, result, args))))
+
+	def handleRoute(self, graph, origin, result, args):
+		if graph is not self.graph or self.currentRoom is not origin:
+			# The map was changed, or the player moved, while the route was found.
+			self.user_command_route(*args)
+		elif result is None:
+			self.sendPlayer("Error while finding a route.")
+		else:
+			self.sendPlayer(result)
+
 	def user_command_sync(self, *args):
 		if not args or not args[0]:
 			self.sendPlayer("Map no longer synced. Auto sync on.")
@@ -663,60 +958,279 @@ class Mapper(threading.Thread, World):
 		self.output("\n".join(result))
 
 	def walkNextDirection(self):
-		if not self.autoWalkDirections:
-			return
-		while self.autoWalkDirections:
-			command = self.autoWalkDirections.pop()
+		"""
+		Sends directions from the route until the run window is full of unconfirmed movements.
+		If run batching is on, a safe segment of the route is sent at once regardless of the window.
+		Other commands, such as opening a door, are only sent once every movement before them is confirmed.
+		"""
+		if self.runBatching and self.isSynced:
+			count = self.batchableDirections()
+			if count:
+				batch = self.autoWalkDirections[-count:][::-1]
+				del self.autoWalkDirections[-count:]
+				if not self.autoWalkDirections:
+					self.sendPlayer("Arriving at destination.")
+					self.autoWalk = False
+				self.autoWalkDirection = batch[-1]
+				self.autoWalkPending.extend(batch)
+				self.sendGame("\r\n".join(direction[0] for direction in batch))
+		while self.autoWalkDirections and len(self.autoWalkPending) < self.runWindow:
+			command = self.autoWalkDirections[-1]
+			if command not in DIRECTIONS and self.autoWalkPending:
+				break
+			self.autoWalkDirections.pop()
 			if not self.autoWalkDirections:
 				self.sendPlayer("Arriving at destination.")
 				self.autoWalk = False
 			if command in DIRECTIONS:
 				# Send the first character of the direction to Mume.
+				self.autoWalkDirection = command
+				self.autoWalkPending.append(command)
 				self.sendGame(command[0])
-				break
 			else:
 				# command is a non-direction such as 'lead' or 'ride'.
 				self.sendGame(command)
 
+	def batchableDirections(self):
+		"""
+		Counts the directions at the start of the remaining route which are safe to send in one batch.
+		The route is followed through the map from the room the player will be in once every sent movement
+		is confirmed.
+		"""
+		roomObj = self.currentRoom
+		for direction in self.autoWalkPending:
+			exitObj = roomObj.exits.get(direction)
+			if exitObj is None or self.exitTarget(exitObj) is None:
+				return 0
+			roomObj = exitObj.target
+		count = 0
+		for command in reversed(self.autoWalkDirections):
+			exitObj = roomObj.exits.get(command)
+			if (
+				exitObj is None
+				or self.exitTarget(exitObj) is None
+				or not BATCH_UNSAFE_EXIT_FLAGS.isdisjoint(exitObj.exitFlags)
+				or exitObj.target.terrain == "deathtrap"
+			):
+				break
+			count += 1
+			roomObj = exitObj.target
+		return count
+
+	def confirmRunMovement(self, direction):
+		"""Called when the player moves, to match the movement with the oldest unconfirmed one of the run."""
+		if not self.autoWalkPending:
+			return None
+		expected = self.autoWalkPending.pop(0)
+		if direction != expected and not self.isReplanning:
+			self.interruptRun()
+
 	def stopRun(self):
+		# Movements which were already sent stay pending, so that they are not mistaken for those of a later run.
 		self.autoWalk = False
 		self.autoWalkDirections = []
+		self.autoWalkDirection = None
+		self.autoWalkRoute = None
+		self.isReplanning = False
+		self.cancelSearch()
 		return "Run canceled!"
 
-	def sync(self, name=None, desc=None, exits=None, vnum=None):
-		if vnum:
-			if vnum in self.labels:
-				vnum = self.labels[vnum]
-			if vnum in self.rooms:
-				self.currentRoom = self.rooms[vnum]
-				self.isSynced = True
-				self.sendPlayer(f"Synced to room {self.currentRoom.name} with vnum {self.currentRoom.vnum}")
-			else:
-				self.sendPlayer(f"No such vnum or label: {vnum}.")
+	def interruptRun(self, isBlocked=False):
+		"""
+		Called when the player is moved off course, or prevented from moving, while running.
+		If auto replanning is on, the route is repaired at the first prompt after every movement which was
+		already sent has been answered by the game, otherwise the run is stopped.
+		"""
+		if isBlocked and self.autoWalkPending:
+			# The movement which failed will never be confirmed.
+			direction = self.autoWalkPending.pop(0)
 		else:
-			nameVnums = []
-			descVnums = []
-			for vnum, roomObj in self.rooms.items():
-				if roomObj.name == name:
-					nameVnums.append(vnum)
-				if desc and roomObj.desc == desc:
-					descVnums.append(vnum)
-			if not nameVnums:
-				self.sendPlayer("Current room not in the database. Unable to sync.")
-			elif len(descVnums) == 1:
-				self.currentRoom = self.rooms[descVnums[0]]
-				self.isSynced = True
-				self.sendPlayer(f"Synced to room {self.currentRoom.name} with vnum {self.currentRoom.vnum}")
-			elif len(nameVnums) == 1:
-				self.currentRoom = self.rooms[nameVnums[0]]
-				self.isSynced = True
-				self.sendPlayer(
-					f"Name-only synced to room {self.currentRoom.name} with vnum {self.currentRoom.vnum}"
-				)
-			else:
-				self.sendPlayer("More than one room in the database matches current room. Unable to sync.")
+			direction = self.autoWalkDirection
+		if not self.autoReplanning or not self.autoWalk or self.autoWalkRoute is None:
+			self.stopRun()
+			return None
+		if isBlocked and self.isSynced and direction is not None:
+			self.blockExit(self.autoWalkRoute, self.currentRoom, direction)
+		# Movements sent after the one that failed stay pending. They are confirmed without being checked
+		# as they arrive, while the map follows the player.
+		self.autoWalkDirections = []
+		self.isReplanning = True
+
+	def desyncRun(self):
+		"""
+		Called when the player moves while the map is not synced.
+		The movements which were sent can no longer be matched with the run, so the run is interrupted.
+		"""
+		if self.autoWalk or self.autoWalkPending:
+			self.interruptRun()
+			self.autoWalkPending = []
+
+	def startQueuedRun(self):
+		"""Starts the run which was requested while the movements of the previous run were being answered."""
+		argString = self.queuedRun
+		self.queuedRun = None
+		if self.isSynced:
+			self.user_command_run(argString)
+		else:
+			self.sendPlayer(f"Not running to '{argString}', since the map is no longer synced.")
+
+	def resumeRun(self):
+		"""Continues an interrupted run from the current room."""
+		self.isReplanning = False
+		self.startSearch(self.replanSearch(self.autoWalkRoute), self.continueRun)
+
+	def continueRun(self, result):
+		if not result:
+			if result is not None:
+				self.sendPlayer("Arriving at destination.")
+			self.stopRun()
+			return None
+		self.sendPlayer(f"Replanning route from '{self.currentRoom.name}'.")
+		self.autoWalkDirections = result
+		self.walkNextDirection()
+
+	def startSearch(self, search, callback):
+		"""
+		Runs a path search on a worker thread, so that events keep being handled while it runs.
+		Any search which is already running is canceled.
+		The callback is called on the mapper thread with the resulting commands once the search finishes.
+		If a search was not needed to answer the query, the callback is called immediately.
+		"""
+		self.cancelSearch()
+		if not isinstance(search, PathSearch):
+			return callback(search)
+		self.activeSearch = search
+		thread = threading.Thread(target=self.searchWorker, args=(search, callback), name="PathSearch")
+		thread.daemon = True
+		thread.start()
+
+	def searchWorker(self, search, callback):
+		try:
+			search.run()
+		except Exception:
+			logger.exception("Error while searching for a path.")
+			search.goal = None
+		if not search.cancelled.is_set():
+			self.queue.put((MAPPER_DATA, (self.handleSearchResult, (search, callback))))
+
+	def cancelSearch(self):
+		if self.activeSearch is not None:
+			self.activeSearch.cancelled.set()
+			self.activeSearch = None
+
+	def handleSearchResult(self, search, callback):
+		if search is not self.activeSearch:
+			# The search was canceled after it finished, but before the result was handled.
+			return None
+		self.activeSearch = None
+		origin = self.currentRoom
+		if origin is not None and origin.vnum in self.rooms and search.graph.vnums[search.origin] != origin.vnum:
+			# The player moved while the search was running, so the path would start from the wrong room.
+			return self.startSearch(self.retargetSearch(search, origin), callback)
+		callback(self.searchResult(search))
+
+	def sync(self, name=None, desc=None, exits=None, vnum=None):
+		# Override World.sync.
+		if self.mapClient is None:
+			return super().sync(name, desc, exits, vnum)
+		vnum = self.remoteRequest("syncRoom", name, desc, vnum)
+		if vnum is not None and vnum in self.rooms:
+			self.currentRoom = self.rooms[vnum]
+			self.isSynced = True
 		return self.isSynced
 
+	def pathSearch(self, origin=None, destination=None, flags=None):
+		# Override World.pathSearch.
+		if self.mapClient is None:
+			return super().pathSearch(origin, destination, flags)
+		return self.remoteRoute(self.remoteRequest("findRoute", destination, flags, origin=origin))
+
+	def nearestSearch(self, query, origin=None):
+		# Override World.nearestSearch.
+		if self.mapClient is None:
+			return super().nearestSearch(query, origin)
+		return self.remoteRoute(self.remoteRequest("findNearest", query, origin=origin))
+
+	def replanSearch(self, route, origin=None):
+		# Override World.replanSearch, so that the route is replanned with the exits the server blocked for it.
+		if self.mapClient is None:
+			return super().replanSearch(route, origin)
+		destination, avoidTerrains = route
+		return self.remoteRoute(
+			self.remoteRequest("replanRoute", destination, sorted(avoidTerrains), origin=origin)
+		)
+
+	def blockExit(self, route, roomObj, direction):
+		# Override World.blockExit, since the search trees of the session are kept by the map server.
+		if self.mapClient is None:
+			return super().blockExit(route, roomObj, direction)
+		destination, avoidTerrains = route
+		self.remoteRequest("blockRouteExit", destination, sorted(avoidTerrains), direction, origin=roomObj)
+
+	def reachableRooms(self, *args):
+		# Override World.reachableRooms, so that the rooms are tinted in the GUI of the session.
+		if self.mapClient is None:
+			return super().reachableRooms(*args)
+		result = self.remoteRequest("reachableRooms", *args)
+		if result is None:
+			# The error was already shown to the user.
+			return "", None
+		message, vnums = result
+		return message, None if vnums is None else frozenset(vnums)
+
+	def remoteRoute(self, result):
+		"""Stores the route of a path found by the map server in lastRoute, and returns the commands."""
+		if result is None:
+			return None
+		commands, route = result
+		if route is not None:
+			self.lastRoute = (route[0], frozenset(route[1]))
+		return commands
+
+	def getNeighborsFromRoom(self, start=None, radius=1):
+		# Override World.getNeighborsFromRoom, so that only the rooms drawn by the GUI are fetched.
+		if self.mapClient is None:
+			return super().getNeighborsFromRoom(start, radius)
+		start = start or self.currentRoom
+		output, neighbors = self.mapClient.request("neighborData", radius, vnum=start.vnum)
+		return [
+			(roomDict["vnum"], self.rooms.add(roomFromDict(roomDict)), *difference)
+			for roomDict, *difference in neighbors or ()
+		]
+
+	def remoteRequest(self, command, *args, origin=None):
+		"""Sends a request to the map server from the current room, or an origin room, and shows any output."""
+		origin = origin or self.currentRoom
+		output, result = self.mapClient.request(
+			command, *args, vnum=None if origin is None else origin.vnum, period=self.costPeriod()
+		)
+		if output:
+			self.sendPlayer("\n".join(output))
+		return result
+
+	def remoteCommand(self, command, argString):
+		"""Handles a user command which reads or edits the map, by sending it to the map server."""
+		args = (self.findFormat, argString) if command in FIND_COMMANDS else (argString,)
+		result = self.remoteRequest(command, *args)
+		if isinstance(result, list):
+			result = "\n".join(result)
+		if result:
+			self.sendPlayer(result)
+
+	def onMapChanged(self):
+		# Called on the thread which receives from the map server.
+		self.queue.put((MAPPER_DATA, (self.handleMapChanged, ())))
+
+	def handleMapChanged(self):
+		"""Forgets the rooms fetched from the map server after the map was edited, and refreshes the GUI."""
+		self.rooms.clear()
+		if self.currentRoom is not None:
+			if self.currentRoom.vnum in self.rooms:
+				self.currentRoom = self.rooms[self.currentRoom.vnum]
+			else:
+				self.isSynced = False
+		self.GUIRefresh()
+
 	def roomDetails(self):
 		doors = []
 		deathTraps = []
@@ -725,13 +1239,14 @@ class Mapper(threading.Thread, World):
 		for direction, exitObj in self.currentRoom.exits.items():
 			if exitObj.door and exitObj.door != "exit":
 				doors.append(f"{direction}: {exitObj.door}")
-			if not exitObj.to or exitObj.to == "undefined":
-				undefineds.append(direction)
-			elif exitObj.to == "death":
+			target = self.exitTarget(exitObj)
+			if exitObj.to == "death":
 				deathTraps.append(direction)
+			elif target is None:
+				undefineds.append(direction)
 			elif (
-				REVERSE_DIRECTIONS[direction] not in self.rooms[exitObj.to].exits
-				or self.rooms[exitObj.to].exits[REVERSE_DIRECTIONS[direction]].to != self.currentRoom.vnum
+				REVERSE_DIRECTIONS[direction] not in target.exits
+				or target.exits[REVERSE_DIRECTIONS[direction]].to != self.currentRoom.vnum
 			):
 				oneWays.append(direction)
 		if doors:
@@ -841,10 +1356,15 @@ class Mapper(threading.Thread, World):
 		if movement not in self.currentRoom.exits:
 			self.currentRoom.exits[movement] = self.getNewExit(movement)
 		self.currentRoom.exits[movement].to = vnum
+		self.currentRoom.exits[movement].target = newRoom
+		self.mapChanged(self.currentRoom.vnum, vnum)
 		self.sendPlayer(f"Adding room '{newRoom.name}' with vnum '{vnum}'")
 
 	def mud_event_prompt(self, data):
 		self.prompt = data
+		if self.movement is not None and not self.isSynced:
+			# The player moved while the map was not synced.
+			self.desyncRun()
 		if self.isSynced:
 			if self.autoMapping and self.moved:
 				self.updateRoomFlags(self.prompt)
@@ -853,8 +1373,12 @@ class Mapper(threading.Thread, World):
 		if self.isSynced and self.dynamic is not None:
 			self.roomDetails()
 			if self.autoWalkDirections and self.moved and self.autoWalk:
-				# The player is auto-walking. Send the next direction to Mume.
+				# The player is auto-walking. Refill the run window with the next directions.
 				self.walkNextDirection()
+		if self.isReplanning and self.isSynced and not self.autoWalkPending:
+			self.resumeRun()
+		elif self.queuedRun is not None and not self.autoWalkPending:
+			self.startQueuedRun()
 		self.addedNewRoomFrom = None
 		self.scouting = False
 		self.movement = None
@@ -874,21 +1398,18 @@ class Mapper(threading.Thread, World):
 			return
 		elif data == "A huge clock is standing here.":
 			self.sendGame("look at clock")
-
-		elif data == (
-			"Wet, cold and filled with mud you drop down into a dark "
-			"and moist cave, while you notice the mud above you moving "
-			"to close the hole you left in the cave ceiling."
-		):
-			self.sync(vnum="17189")
-		elif data == (
-			"The gravel below your feet loosens, shifting slightly.. "
-			"Suddenly, you lose your balance and crash to the cave floor below."
-		):
-			self.sync(vnum="15324")
+		elif data in SYNC_LINES:
+			self.sync(vnum=SYNC_LINES[data])
 		elif not self.timeSynchronized:
 			self.syncTime(data)
-		if MOVEMENT_FORCED_REGEX.search(data) or MOVEMENT_PREVENTED_REGEX.search(data):
+		if MOVEMENT_BLOCKED_REGEX.search(data):
+			self.interruptRun(isBlocked=True)
+		elif MOVEMENT_FORCED_REGEX.search(data):
+			self.interruptRun()
+		elif MOVEMENT_PREVENTED_REGEX.search(data):
+			if self.autoWalkPending:
+				# The movement which was refused will never be confirmed.
+				self.autoWalkPending.pop(0)
 			self.stopRun()
 		if self.isSynced and self.autoMapping:
 			if data == "It's too difficult to ride here." and self.currentRoom.ridable != "notridable":
@@ -968,7 +1489,7 @@ class Mapper(threading.Thread, World):
 		elif not self.autoMapping and self.movement not in self.currentRoom.exits:
 			self.isSynced = False
 			self.sendPlayer(f"Error: direction '{self.movement}' not in database. Map no longer synced!")
-		elif not self.autoMapping and self.currentRoom.exits[self.movement].to not in self.rooms:
+		elif not self.autoMapping and self.exitTarget(self.currentRoom.exits[self.movement]) is None:
 			self.isSynced = False
 			self.sendPlayer(
 				f"Error: vnum ({self.currentRoom.exits[self.movement].to}) in direction ({self.movement}) "
@@ -980,7 +1501,7 @@ class Mapper(threading.Thread, World):
 				and self.movement in DIRECTIONS
 				and (
 					self.movement not in self.currentRoom.exits
-					or self.currentRoom.exits[self.movement].to not in self.rooms
+					or self.exitTarget(self.currentRoom.exits[self.movement]) is None
 				)
 			):
 				# Player has moved in a direction that either doesn't exist in the database
@@ -1004,6 +1525,7 @@ class Mapper(threading.Thread, World):
 			self.currentRoom = self.rooms[self.currentRoom.exits[self.movement].to]
 			self.moved = self.movement
 			self.movement = None
+			self.confirmRunMovement(self.moved)
 			if self.autoMapping and self.autoUpdateRooms:
 				if self.roomName and self.currentRoom.name != self.roomName:
 					self.currentRoom.name = self.roomName
@@ -1022,6 +1544,7 @@ class Mapper(threading.Thread, World):
 				self.currentRoom.exits[REVERSE_DIRECTIONS[self.moved]] = self.getNewExit(
 					direction=REVERSE_DIRECTIONS[self.moved], to=self.addedNewRoomFrom
 				)
+				self.mapChanged(self.currentRoom.vnum)
 			self.updateExitFlags(exits)
 		self.addedNewRoomFrom = None
 
@@ -1034,7 +1557,11 @@ class Mapper(threading.Thread, World):
 		else:
 			userCommand = data.split()[0]
 			args = data[len(userCommand) :].strip()
-			getattr(self, f"user_command_{decodeBytes(userCommand)}")(decodeBytes(args))
+			userCommand = decodeBytes(userCommand)
+			if self.mapClient is not None and userCommand in USER_COMMANDS:
+				self.remoteCommand(userCommand, decodeBytes(args))
+			else:
+				getattr(self, f"user_command_{userCommand}")(decodeBytes(args))
 
 	def handleMudEvent(self, event, data):
 		data = stripAnsi(decodeBytes(data))
@@ -1063,20 +1590,85 @@ class Mapper(threading.Thread, World):
 		if event in self.mudEventHandlers and handler in self.mudEventHandlers[event]:
 			self.mudEventHandlers[event].remove(handler)
 
+	@property
+	def isPrefetchDue(self):
+		"""True if routes should be prefetched from the current room once the mapper is idle."""
+		return (
+			self.prefetching
+			and self.mapClient is None
+			and self.isSynced
+			and self.activeSearch is None
+			and self.prefetchedFrom != (self.currentRoom.vnum, self.mapVersion, self.costPeriod())
+		)
+
+	def prefetchIdle(self):
+		# Prefetching stops as soon as an event is queued, and continues the next time the mapper is idle.
+		if self.prefetchRoutes(QueueActivity(self.queue)):
+			self.prefetchedFrom = (self.currentRoom.vnum, self.mapVersion, self.costPeriod())
+			# Runs are counted in memory, and saved while nothing else needs doing.
+			self.saveRouteUsage()
+
+	def handleEvent(self, dataType, data):
+		if dataType == USER_DATA:
+			# The data was a valid mapper command, sent from the user's mud client.
+			self.handleUserData(data)
+		elif dataType == MUD_DATA:
+			# The data was from the mud server.
+			event, data = data
+			self.handleMudEvent(event, data)
+		elif dataType == MAPPER_DATA:
+			# The data was a function to call with the result of work done on another thread.
+			function, args = data
+			function(*args)
+		if self.queue.empty():
+			# Send any coalesced output to the player once there are no more events to handle.
+			self.proxy.player.flush()
+
 	def run(self):
 		while True:
 			try:
-				dataType, data = self.queue.get()
+				try:
+					dataType, data = self.queue.get(timeout=PREFETCH_IDLE_DELAY if self.isPrefetchDue else None)
+				except Empty:
+					self.prefetchIdle()
+					continue
+				if data is None:
+					break
+				self.handleEvent(dataType, data)
+			except Exception as e:
+				self.output("map error")
+				print("error " + str(e))
+		self.saveRouteUsage()
+		self.sendPlayer("Exiting mapper thread.")
+		self.proxy.player.flush()
+		if self.mapClient is not None:
+			self.mapClient.close()
+
+	async def runAsync(self):
+		"""
+		Handles events as a task on an asyncio event loop, instead of on the mapper thread.
+
+		The event queue must have a `get` coroutine, which raises queue.Empty if no event is put before the timeout.
+		Routes are prefetched in the loop's default executor, so that data is still proxied while searching.
+		"""
+		loop = asyncio.get_running_loop()
+		while True:
+			try:
+				try:
+					dataType, data = await self.queue.get(
+						timeout=PREFETCH_IDLE_DELAY if self.isPrefetchDue else None
+					)
+				except Empty:
+					await loop.run_in_executor(None, self.prefetchIdle)
+					continue
 				if data is None:
 					break
-				elif dataType == USER_DATA:
-					# The data was a valid mapper command, sent from the user's mud client.
-					self.handleUserData(data)
-				elif dataType == MUD_DATA:
-					# The data was from the mud server.
-					event, data = data
-					self.handleMudEvent(event, data)
+				self.handleEvent(dataType, data)
 			except Exception as e:
 				self.output("map error")
 				print("error " + str(e))
+		self.saveRouteUsage()
 		self.sendPlayer("Exiting mapper thread.")
+		self.proxy.player.flush()
+		if self.mapClient is not None:
+			self.mapClient.close()
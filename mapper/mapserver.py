@@ -0,0 +1,573 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+A map server, which owns a single copy of the world for several proxy sessions.
+
+Each session connects to the server over a local socket, and sends requests as lines of JSON.
+Requests which only read the map are handled concurrently, while edits are handled one at a time,
+and every session is told when the map was edited so that it can refresh its GUI.
+"""
+
+
+# Future Modules:
+from __future__ import annotations
+
+# Built-in Modules:
+import itertools
+import json
+import logging
+import os
+import socket
+import threading
+import types
+from collections import OrderedDict
+from collections.abc import Mapping
+from contextlib import contextmanager
+from queue import SimpleQueue
+
+# Local Modules:
+from . import roomdata
+from .utils import getDirectoryPath
+from .world import World
+
+
+MAP_SERVER_ADDRESS = os.path.join(getDirectoryPath("data"), "mapserver.sock")
+MAP_SERVER_PORT = 4001  # Used instead of the socket file on platforms without Unix sockets.
+ROOM_CACHE_SIZE = 4096  # The number of rooms each session keeps.
+FIND_COMMANDS = frozenset(("fdoor", "fdynamic", "flabel", "fname", "fnote"))
+READ_COMMANDS = frozenset(
+	(
+		*FIND_COMMANDS,
+		"blockRouteExit",
+		"findNearest",
+		"findRoute",
+		"getlabel",
+		"mapstats",
+		"neighborData",
+		"path",
+		"reachableRooms",
+		"replanRoute",
+		"rinfo",
+		"roomData",
+		"route",
+		"syncRoom",
+	)
+)
+EDIT_COMMANDS = frozenset(
+	(
+		"doorflags",
+		"exitflags",
+		"labeltable",
+		"ralign",
+		"ravoid",
+		"rdelete",
+		"rlabel",
+		"rlight",
+		"rlink",
+		"rloadflags",
+		"rmobflags",
+		"rnote",
+		"rportable",
+		"rridable",
+		"rterrain",
+		"rx",
+		"ry",
+		"rz",
+		"savemap",
+		"secret",
+	)
+)
+# The commands which sessions use to track the player and walk routes, rather than being typed by the user.
+SESSION_COMMANDS = frozenset(
+	(
+		"blockRouteExit",
+		"findNearest",
+		"findRoute",
+		"neighborData",
+		"reachableRooms",
+		"replanRoute",
+		"roomData",
+		"syncRoom",
+	)
+)
+# The user commands which sessions send to the map server, rather than handling themselves.
+USER_COMMANDS = READ_COMMANDS.union(EDIT_COMMANDS).difference(SESSION_COMMANDS)
+# The attributes which each session has its own copy of. All others are those of the shared world.
+SESSION_ATTRIBUTES = frozenset(
+	("_costPeriod", "_currentRoom", "_nearestTree", "_outputLines", "_routeTree", "isSynced", "lastRoute")
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+def mapServerAddress(address=None):
+	"""Returns the socket family and address of the map server, given the path of its socket file."""
+	if not hasattr(socket, "AF_UNIX"):
+		return socket.AF_INET, ("127.0.0.1", MAP_SERVER_PORT)
+	return socket.AF_UNIX, address or MAP_SERVER_ADDRESS
+
+
+def connectMapServer(address=None):
+	family, address = mapServerAddress(address)
+	sock = socket.socket(family, socket.SOCK_STREAM)
+	try:
+		sock.connect(address)
+	except EnvironmentError:
+		sock.close()
+		raise
+	return sock
+
+
+def roomToDict(roomObj):
+	"""Converts a room to a dict which can be sent to a session."""
+	return {
+		"vnum": roomObj.vnum,
+		"name": roomObj.name,
+		"desc": roomObj.desc,
+		"dynamicDesc": roomObj.dynamicDesc,
+		"note": roomObj.note,
+		"terrain": roomObj.terrain,
+		"light": roomObj.light,
+		"align": roomObj.align,
+		"portable": roomObj.portable,
+		"ridable": roomObj.ridable,
+		"avoid": roomObj.avoid,
+		"mobFlags": sorted(roomObj.mobFlags),
+		"loadFlags": sorted(roomObj.loadFlags),
+		"x": roomObj.x,
+		"y": roomObj.y,
+		"z": roomObj.z,
+		"exits": {
+			direction: {
+				"exitFlags": sorted(exitObj.exitFlags),
+				"doorFlags": sorted(exitObj.doorFlags),
+				"door": exitObj.door,
+				"to": exitObj.to,
+			}
+			for direction, exitObj in roomObj.exits.items()
+		},
+	}
+
+
+def roomFromDict(roomDict):
+	"""Creates a room from a dict made by roomToDict."""
+	newRoom = roomdata.objects.Room(roomDict["vnum"])
+	for key in ("name", "desc", "dynamicDesc", "note", "terrain", "light", "align", "portable", "ridable"):
+		setattr(newRoom, key, roomDict[key])
+	newRoom.avoid = roomDict["avoid"]
+	newRoom.mobFlags = set(roomDict["mobFlags"])
+	newRoom.loadFlags = set(roomDict["loadFlags"])
+	newRoom.x, newRoom.y, newRoom.z = roomDict["x"], roomDict["y"], roomDict["z"]
+	newRoom.calculateCost()
+	for direction, exitDict in roomDict["exits"].items():
+		newExit = roomdata.objects.Exit()
+		newExit.direction = direction
+		newExit.vnum = newRoom.vnum
+		newExit.to = exitDict["to"]
+		newExit.exitFlags = set(exitDict["exitFlags"])
+		newExit.doorFlags = set(exitDict["doorFlags"])
+		newExit.door = exitDict["door"]
+		newRoom.exits[direction] = newExit
+	return newRoom
+
+
+class ReadWriteLock(object):
+	"""
+	A lock which is held by any number of readers at once, or by a single writer.
+	Readers wait while a writer is waiting, so that edits are not delayed by a steady stream of reads.
+	"""
+
+	def __init__(self):
+		self._condition = threading.Condition()
+		self._readers = 0
+		self._writers = 0  # The number of writers holding or waiting for the lock.
+		self._isWriting = False
+
+	@contextmanager
+	def read(self):
+		with self._condition:
+			self._condition.wait_for(lambda: not self._writers)
+			self._readers += 1
+		try:
+			yield
+		finally:
+			with self._condition:
+				self._readers -= 1
+				if not self._readers:
+					self._condition.notify_all()
+
+	@contextmanager
+	def write(self):
+		with self._condition:
+			self._writers += 1
+			self._condition.wait_for(lambda: not self._readers and not self._isWriting)
+			self._isWriting = True
+		try:
+			yield
+		finally:
+			with self._condition:
+				self._isWriting = False
+				self._writers -= 1
+				self._condition.notify_all()
+
+
+class WorldView(object):
+	"""
+	A session's view of a shared world.
+
+	The methods of the world are called with the view as self, so that the current room, the cached search
+	trees, and the output belong to the session, while the rooms, labels, and derived data are shared.
+	"""
+
+	def __init__(self, world):
+		object.__setattr__(self, "_world", world)
+		for name in SESSION_ATTRIBUTES:
+			object.__setattr__(self, name, None)
+		object.__setattr__(self, "isSynced", False)
+		object.__setattr__(self, "_outputLines", [])
+
+	def __getattr__(self, name):
+		# Only called for attributes which the view does not have itself.
+		value = getattr(type(self._world), name, None)
+		if isinstance(value, (types.FunctionType, property)):
+			return value.__get__(self)
+		return getattr(self._world, name)
+
+	def __setattr__(self, name, value):
+		attribute = getattr(type(self._world), name, None)
+		if isinstance(attribute, property):
+			attribute.__set__(self, value)
+		elif name in SESSION_ATTRIBUTES:
+			object.__setattr__(self, name, value)
+		else:
+			setattr(self._world, name, value)
+
+	def output(self, text):
+		self._outputLines.append(text)
+
+	def costPeriod(self):
+		return self._costPeriod or "DAY"
+
+
+class RemoteRooms(Mapping):
+	"""
+	The rooms of a map server, fetched when they are first used.
+
+	Only the most recently used rooms are kept, so that the memory used by a session does not grow with the map.
+	Iterating over the mapping only yields the rooms which are currently kept.
+	"""
+
+	def __init__(self, client, size=ROOM_CACHE_SIZE):
+		self._client = client
+		self._size = size
+		self._rooms = OrderedDict()
+		self._missing = set()  # Vnums, such as 'undefined', which the server has no room for.
+		self._lock = threading.RLock()
+
+	def __getitem__(self, vnum):
+		with self._lock:
+			if vnum in self._rooms:
+				self._rooms.move_to_end(vnum)
+				return self._rooms[vnum]
+			elif vnum in self._missing:
+				raise KeyError(vnum)
+			output, roomDict = self._client.request("roomData", vnum=vnum)
+			if roomDict is None:
+				self._missing.add(vnum)
+				raise KeyError(vnum)
+			return self.add(roomFromDict(roomDict))
+
+	def __iter__(self):
+		with self._lock:
+			return iter(list(self._rooms))
+
+	def __len__(self):
+		return len(self._rooms)
+
+	def add(self, roomObj):
+		"""Keeps a room which was received from the server, and returns it."""
+		with self._lock:
+			if roomObj.vnum in self._rooms:
+				# The kept room is up to date, since every room is forgotten when the map is edited,
+				# and the exits of other rooms may already lead to it.
+				self._rooms.move_to_end(roomObj.vnum)
+				roomObj = self._rooms[roomObj.vnum]
+			else:
+				self._rooms[roomObj.vnum] = roomObj
+			while len(self._rooms) > self._size:
+				vnum, evicted = self._rooms.popitem(last=False)
+				# Resolved exits would keep the rooms they lead to alive after they are no longer kept.
+				for exitObj in evicted.exits.values():
+					exitObj.target = None
+			return roomObj
+
+	def clear(self):
+		"""Forgets every room, so that they are fetched again after the map was edited."""
+		with self._lock:
+			for roomObj in self._rooms.values():
+				for exitObj in roomObj.exits.values():
+					exitObj.target = None
+			self._rooms.clear()
+			self._missing.clear()
+
+
+class MapClient(object):
+	"""
+	A session's connection to the map server.
+
+	Requests may be made from any thread. Each waits for its own response, while notifications from
+	the server are passed to onMapChanged on the receiving thread.
+	"""
+
+	def __init__(self, address=None, onMapChanged=None):
+		self._socket = connectMapServer(address)
+		self._file = self._socket.makefile("rb")
+		self._sendLock = threading.Lock()
+		self._ids = itertools.count()
+		self._pending = {}
+		self._pendingLock = threading.Lock()
+		self.isClosed = False
+		self.onMapChanged = onMapChanged
+		self._thread = threading.Thread(target=self._receive, name="MapClient")
+		self._thread.daemon = True
+		self._thread.start()
+
+	def request(self, command, *args, vnum=None, period="DAY"):
+		"""Sends a request, and returns the lines of output and the result once the server responds."""
+		requestID = next(self._ids)
+		response = SimpleQueue()
+		with self._pendingLock:
+			if self.isClosed:
+				return ["Error: not connected to the map server."], None
+			self._pending[requestID] = response
+		data = {"id": requestID, "command": command, "args": args, "vnum": vnum, "period": period}
+		try:
+			with self._sendLock:
+				self._socket.sendall(json.dumps(data).encode("utf-8") + b"\n")
+		except EnvironmentError:
+			self.close()
+		message = response.get()
+		if message is None:
+			return ["Error: the map server disconnected."], None
+		return message["output"], message["result"]
+
+	def close(self):
+		with self._pendingLock:
+			self.isClosed = True
+			pending = list(self._pending.values())
+			self._pending.clear()
+		for response in pending:
+			response.put(None)
+		try:
+			self._socket.shutdown(socket.SHUT_RDWR)
+		except EnvironmentError:
+			pass
+		self._socket.close()
+
+	def _receive(self):
+		try:
+			for line in self._file:
+				message = json.loads(line)
+				if "event" in message:
+					if message["event"] == "mapChanged" and self.onMapChanged is not None:
+						self.onMapChanged()
+					continue
+				with self._pendingLock:
+					response = self._pending.pop(message["id"], None)
+				if response is not None:
+					response.put(message)
+		except (EnvironmentError, ValueError):
+			logger.exception("Error while receiving from the map server.")
+		finally:
+			self.close()
+
+
+class MapSession(threading.Thread):
+	"""Handles the requests of a session connected to the map server."""
+
+	def __init__(self, server, sock):
+		threading.Thread.__init__(self)
+		self.name = "MapSession"
+		self.daemon = True
+		self.server = server
+		self.socket = sock
+		self.view = WorldView(server)
+		self._sendLock = threading.Lock()
+
+	def send(self, message):
+		try:
+			with self._sendLock:
+				self.socket.sendall(json.dumps(message).encode("utf-8") + b"\n")
+		except EnvironmentError:
+			pass
+
+	def close(self):
+		try:
+			self.socket.shutdown(socket.SHUT_RDWR)
+		except EnvironmentError:
+			pass
+
+	def run(self):
+		try:
+			with self.socket.makefile("rb") as fileObj:
+				for line in fileObj:
+					self.send(self.server.handleRequest(self.view, json.loads(line)))
+		except (EnvironmentError, ValueError):
+			logger.exception("Error while receiving from a map session.")
+		finally:
+			self.server.removeSession(self)
+			self.socket.close()
+
+
+class MapServer(World):
+	"""Owns the world, and handles the requests of every session connected to it."""
+
+	def __init__(self, address=None):
+		self.family, self.address = mapServerAddress(address)
+		self.lock = ReadWriteLock()
+		self.sessions = []
+		self._sessionsLock = threading.Lock()
+		self.finished = threading.Event()
+		World.__init__(self, interface="text")
+
+	def listen(self):
+		if self.family == socket.AF_UNIX and os.path.exists(self.address):
+			try:
+				connectMapServer(self.address).close()
+			except EnvironmentError:
+				# The socket file was left behind by a map server which is no longer running.
+				os.remove(self.address)
+			else:
+				raise RuntimeError(f"A map server is already running at '{self.address}'.")
+		listener = socket.socket(self.family, socket.SOCK_STREAM)
+		listener.bind(self.address)
+		listener.listen(5)
+		return listener
+
+	def close(self):
+		self.finished.set()
+
+	def serve(self, listener=None):
+		"""Accepts sessions until the server is closed."""
+		listener = self.listen() if listener is None else listener
+		listener.settimeout(1.0)
+		self.output(f"Map server listening at '{self.address}'.")
+		try:
+			while not self.finished.is_set():
+				try:
+					sock, address = listener.accept()
+				except socket.timeout:
+					continue
+				sock.settimeout(None)
+				session = MapSession(self, sock)
+				with self._sessionsLock:
+					self.sessions.append(session)
+				session.start()
+		finally:
+			listener.close()
+			if self.family == socket.AF_UNIX:
+				os.remove(self.address)
+			with self._sessionsLock:
+				sessions = list(self.sessions)
+			for session in sessions:
+				session.close()
+
+	def removeSession(self, session):
+		with self._sessionsLock:
+			if session in self.sessions:
+				self.sessions.remove(session)
+
+	def notify(self, message):
+		"""Sends a notification to every session."""
+		with self._sessionsLock:
+			sessions = list(self.sessions)
+		for session in sessions:
+			session.send(message)
+
+	def handleRequest(self, view, request):
+		command = request.get("command")
+		if command in EDIT_COMMANDS:
+			lock = self.lock.write
+		elif command in READ_COMMANDS:
+			lock = self.lock.read
+		else:
+			return {"id": request.get("id"), "output": [f"Error: unknown command '{command}'."], "result": None}
+		with lock():
+			view._outputLines = []
+			view._costPeriod = request.get("period")
+			view.currentRoom = self.rooms.get(request.get("vnum"))
+			try:
+				result = getattr(view, command)(*request.get("args", ()))
+			except Exception:
+				logger.exception(f"Error while handling the map server command '{command}'.")
+				view.output("map error")
+				result = None
+			if command in EDIT_COMMANDS:
+				# Data derived from the map is rebuilt once, rather than by each reader after the edit.
+				self.graph
+		if command in EDIT_COMMANDS:
+			self.notify({"event": "mapChanged"})
+		return {"id": request.get("id"), "output": view._outputLines, "result": result}
+
+	def roomData(self):
+		return roomToDict(self.currentRoom) if self.currentRoom is not None else None
+
+	def neighborData(self, radius):
+		"""Returns the rooms around the current room, with their differences in X-Y-Z coordinates."""
+		if self.currentRoom is None:
+			return []
+		return [
+			[roomToDict(roomObj), *difference]
+			for vnum, roomObj, *difference in self.getNeighborsFromRoom(radius=radius)
+		]
+
+	def syncRoom(self, name=None, desc=None, vnum=None):
+		"""Returns the vnum of the room which the session was synced to, or None if it could not be synced."""
+		self.isSynced = False
+		self.sync(name, desc, vnum=vnum)
+		return self.currentRoom.vnum if self.isSynced else None
+
+	def sessionRoute(self, commands):
+		"""
+		Returns the commands for walking a path, with the route they follow as stored in lastRoute,
+		so that the session can replan the route.
+		"""
+		route = None if self.lastRoute is None else [self.lastRoute[0], sorted(self.lastRoute[1])]
+		return [commands, route]
+
+	def findRoute(self, destination, flags=None):
+		"""Finds the path to a destination, as used by a session for the run command."""
+		self.lastRoute = None
+		return self.sessionRoute(self.pathFind(destination=destination, flags=flags))
+
+	def findNearest(self, query):
+		"""Finds the path to the nearest room matching a query, as used by a session for the run command."""
+		self.lastRoute = None
+		return self.sessionRoute(self.nearestFind(query))
+
+	def replanRoute(self, destination, avoidTerrains):
+		"""Finds the path along a previous route of the session from the current room."""
+		self.lastRoute = None
+		return self.sessionRoute(self.replan((destination, frozenset(avoidTerrains))))
+
+	def blockRouteExit(self, destination, avoidTerrains, direction):
+		"""Prevents a previous route of the session from using an exit of the current room."""
+		self.blockExit((destination, frozenset(avoidTerrains)), self.currentRoom, direction)
+
+	def reachableRooms(self, *args):
+		message, vnums = World.reachableRooms(self, *args)
+		return [message, None if vnums is None else sorted(vnums)]
+
+	def savemap(self, *args):
+		self.saveRooms()
+
+
+def main(address=None):
+	server = MapServer(address)
+	try:
+		server.serve()
+	except KeyboardInterrupt:
+		pass
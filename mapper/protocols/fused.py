@@ -0,0 +1,275 @@
+"""
+Fused Telnet, MPI, and XML protocols.
+"""
+
+
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+
+# Future Modules:
+from __future__ import annotations
+
+# Built-in Modules:
+import logging
+import re
+from typing import AbstractSet, List, Pattern, Tuple
+
+# Local Modules:
+from .base import Protocol
+from .mpi import MPI_INIT, MPI_LINE_START, MPIProtocol
+from .telnet import TelnetProtocol
+from .telnet_constants import COMMAND_BYTES, CR, CR_LF, IAC, LF
+from .xml import GT, LT, XMLProtocol
+from ..utils import unescapeXML
+
+
+FAST_MPI_STATES: AbstractSet[str] = frozenset(("data", "newline"))
+# Splits raw data into runs of text, tags with or without their closing bracket,
+# subnegotiations without an escaped IAC, negotiations, and other Telnet commands.
+# Every byte of the data is part of a token.
+TOKEN_REGEX: Pattern[bytes] = re.compile(
+	rb"([^<\xff]+)|<([^>\xff\r\n]*)(>?)|\xff(?:(\xfa[^\xff]*)\xff\xf0|([\xfb-\xfe])(.)|(.?))", re.DOTALL
+)
+
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+
+def tokenSize(token: Tuple[bytes, ...]) -> int:
+	"""
+	Calculates the size of a token found by `TOKEN_REGEX` in the raw data.
+
+	Args:
+		token: The groups of the token.
+
+	Returns:
+		The number of bytes the token spans.
+	"""
+	appData, tag, tagEnd, subnegotiation, negotiation, option, command = token
+	if appData:
+		return len(appData)
+	elif subnegotiation:
+		# IAC + SB + payload + IAC + SE.
+		return len(subnegotiation) + 3
+	return 1 + len(tag) + len(tagEnd) + len(negotiation) + len(option) + len(command)
+
+
+class FusedProtocol(Protocol):
+	"""
+	Implements the MPI and XML protocols as a single stage after a Telnet protocol.
+
+	This class is mixed in after a TelnetProtocol subclass, so that the application data
+	found by the Telnet parser is passed straight to it through `super().on_dataReceived`,
+	rather than through separately registered protocol handlers.
+	It is the layered path of `FusedTelnetProtocol`, for data the single pass tokenizer doesn't handle.
+	Data which can't contain the start of an MPI frame is given to the XML parser without passing
+	through the MPI state machine, which would otherwise walk it line by line.
+
+	Attributes:
+		mpi: The MPI protocol, which holds the MPI state and command callbacks.
+		xml: The XML protocol, which holds the XML state and sends mapper events.
+	"""
+
+	def __init__(self, *args, **kwargs) -> None:
+		outputFormat = kwargs.pop("outputFormat") if "outputFormat" in kwargs else None
+		xmlKwargs = {"eventCaller": kwargs.pop("eventCaller")} if "eventCaller" in kwargs else {}
+		super().__init__(*args, **kwargs)
+		self.xml: XMLProtocol = XMLProtocol(
+			self.write, super().on_dataReceived, outputFormat=outputFormat, **xmlKwargs
+		)
+		self.mpi: MPIProtocol = MPIProtocol(self.write, self.xml.on_dataReceived, outputFormat=outputFormat)
+
+	def on_connectionMade(self) -> None:
+		super().on_connectionMade()
+		self.mpi.on_connectionMade()
+		self.xml.on_connectionMade()
+
+	def on_connectionLost(self) -> None:
+		self.xml.on_connectionLost()
+		self.mpi.on_connectionLost()
+		super().on_connectionLost()
+
+	def on_dataReceived(self, data: bytes) -> None:
+		if not data:
+			return None
+		mpi = self.mpi
+		state = mpi.state
+		if (state == "data" or state == "newline" and not data.startswith(MPI_INIT[:1])) and (
+			MPI_LINE_START not in data
+		):
+			# No MPI frame can start in this data.
+			mpi.state = "newline" if data.endswith(LF) else "data"
+			self.xml.on_dataReceived(data)
+		else:
+			mpi.on_dataReceived(data)
+
+
+class FusedTelnetProtocol(TelnetProtocol, FusedProtocol):
+	"""
+	Implements the Telnet, MPI, and XML protocols in a single protocol handler.
+
+	Raw data is scanned once by a single tokenizer. Telnet commands are dispatched as they are found,
+	line endings and escaped IAC bytes are decoded, the MPI line state is tracked,
+	and text and tags are handled in place with the state and buffers of the XML parser.
+	The XML handling mirrors `XMLProtocol.on_dataReceived`, and the two must be kept in step.
+
+	Data the tokenizer doesn't handle, such as MPI frames, bare CR bytes, subnegotiations with an escaped IAC,
+	and tags or Telnet commands split between chunks, is given to the layered Telnet, MPI, and XML state machines
+	up to the end of the line. Both paths keep the Telnet, MPI, and XML states between tokens,
+	so either can continue where the other stopped.
+	"""
+
+	def on_dataReceived(self, data: bytes) -> None:
+		mpi = self.mpi
+		size = len(data)
+		index = 0
+		while index < size:
+			if self._state == "data" and mpi.state in FAST_MPI_STATES:
+				index = self.scan(data, index)
+				if index >= size:
+					break
+			end = data.find(LF, index)
+			end = size if end < 0 else end + 1
+			super().on_dataReceived(data if index == 0 and end == size else data[index:end])
+			index = end
+
+	def flushAppData(self, appDataBuffer: List[bytes]) -> None:
+		"""
+		Passes on the application data which was buffered while scanning.
+
+		Args:
+			appDataBuffer: The buffered application data.
+		"""
+		if appDataBuffer:
+			appData = b"".join(appDataBuffer)
+			appDataBuffer.clear()
+			self._receiver(appData if self.xml.outputFormat == "raw" else unescapeXML(appData, True))
+
+	def scan(self, data: bytes, index: int) -> int:  # NOQA: C901
+		"""
+		Parses data with the single pass tokenizer.
+
+		Args:
+			data: The raw data received from the peer.
+			index: The index in the data to start from.
+
+		Returns:
+			The index of the first byte the tokenizer couldn't handle, or the size of the data.
+			A tag continued from the previous chunk is only handled if it ends in the data
+			without a line ending or IAC byte.
+		"""
+		xml = self.xml
+		isRaw = xml.outputFormat == "raw"
+		isTintin = xml.outputFormat == "tintin"
+		modes = xml.modes
+		tintinReplacements = xml.tintinReplacements
+		on_mapperEvent = xml.on_mapperEvent
+		# The XML state is kept in local variables while scanning, and is stored again afterward.
+		lineBuffer = xml._lineBuffer
+		textBuffer = xml._textBuffer
+		gratuitous = xml._gratuitous
+		mode = xml._mode
+		appDataBuffer: List[bytes] = []
+		isNewline = self.mpi.state == "newline"
+		# The MPI checks are only needed if an MPI frame could start somewhere in the data.
+		isMPIPossible = MPI_INIT[:1] in data
+		if xml.state == "tag":
+			# The data continues a tag from the previous chunk.
+			end = data.find(GT, index)
+			if end < 0:
+				return index
+			tag = data[index:end]
+			if IAC in tag or CR in tag or LF in tag:
+				return index
+			tokens = [(b"", bytes(xml._tagBuffer) + tag, GT, b"", b"", b"", b"")]
+			xml._tagBuffer.clear()
+			xml.state = "data"
+			tokens.extend(TOKEN_REGEX.findall(data, end + 1))
+		else:
+			tokens = TOKEN_REGEX.findall(data, index)
+		count = 0
+		try:
+			for count, token in enumerate(tokens):
+				appData, tag, tagEnd, subnegotiation, negotiation, option, command = token
+				if tagEnd:
+					if textBuffer:
+						text = bytes(textBuffer)
+						textBuffer.clear()
+					else:
+						text = b""
+					if isRaw:
+						appDataBuffer.append(LT + tag + GT)
+					elif isTintin and not gratuitous:
+						appDataBuffer.append(tintinReplacements.get(tag, b""))
+					if mode is None and tag.startswith(b"movement"):
+						on_mapperEvent("movement", unescapeXML(tag[13:-1], True))
+					elif tag == b"gratuitous":
+						gratuitous = True
+					elif tag == b"/gratuitous":
+						gratuitous = False
+					elif tag in modes:
+						mode = modes[tag]
+						if tag.startswith(b"/"):
+							on_mapperEvent(
+								"dynamic" if tag == b"/room" else tag[1:].decode("us-ascii"), unescapeXML(text, True)
+							)
+					isNewline = False
+					continue
+				elif appData:
+					if CR in appData:
+						appData = appData.replace(CR_LF, LF)
+						if CR in appData:
+							# A bare CR.
+							break
+					if isMPIPossible and (
+						MPI_LINE_START in appData or isNewline and appData.startswith(MPI_INIT[:1])
+					):
+						# An MPI frame might start in this text.
+						break
+				elif command == IAC:
+					# Escaped IAC.
+					appData = IAC
+				elif negotiation or subnegotiation or command in COMMAND_BYTES:
+					xml._gratuitous = gratuitous
+					xml._mode = mode
+					self.flushAppData(appDataBuffer)
+					if negotiation:
+						self.on_command(negotiation, option)
+					elif subnegotiation:
+						self.on_subnegotiation(subnegotiation[1:2], subnegotiation[2:])
+					else:
+						self.on_command(command, None)
+					continue
+				else:
+					# A partial tag, or a Telnet command the tokenizer doesn't handle.
+					break
+				# Text outside of any tag.
+				if isRaw or not gratuitous:
+					appDataBuffer.append(appData)
+				if mode is not None:
+					textBuffer.extend(appData)
+				elif LF not in appData and not lineBuffer.endswith(CR):
+					# No line can end in this text.
+					lineBuffer.extend(appData)
+				else:
+					lineBuffer.extend(appData)
+					lines = lineBuffer.splitlines(True)
+					lineBuffer.clear()
+					if not lines[-1].endswith(LF):
+						lineBuffer.extend(lines.pop())
+					for line in lines:
+						if line.strip():
+							on_mapperEvent("line", unescapeXML(line.rstrip(CR_LF), True))
+				isNewline = appData.endswith(LF)
+			else:
+				count = len(tokens)
+		finally:
+			xml._gratuitous = gratuitous
+			xml._mode = mode
+			self.flushAppData(appDataBuffer)
+		# Every byte of the data is part of a token, so the unhandled tokens end the data.
+		index = len(data) - sum(tokenSize(token) for token in tokens[count:])
+		self.mpi.state = "newline" if isNewline else "data"
+		return index
@@ -9,7 +9,8 @@ from __future__ import annotations
 # Built-in Modules:
 import inspect
 import logging
-from typing import Callable, MutableSequence, Type
+import threading
+from typing import Any, Callable, List, MutableSequence, Sequence, Type, Union
 
 # Local Modules:
 from .base import Protocol
@@ -21,12 +22,55 @@ logger: logging.Logger = logging.getLogger(__name__)
 
 
 class Manager(object):
-	def __init__(self, writer: Callable[[bytes], None], receiver: Callable[[bytes], None]) -> None:
+	"""
+	Manages the protocol handlers for one side of a connection.
+
+	If `flushDelay` is given, data written while connected is coalesced, and sent to peer in a single call to
+	the writer when `flush` is called, at the end of `parse`, or when the oldest unsent data is `flushDelay`
+	seconds old. If `vectorWriter` is also given, coalesced data is sent with it as a list of buffers,
+	rather than being joined first. The deadline is enforced by a flusher thread, unless `flushTimer` is given.
+
+	Attributes:
+		writesRequested: The number of times data was written.
+		writesIssued: The number of calls made to the writer.
+		bytesSent: The number of bytes passed to the writer.
+	"""
+
+	def __init__(
+		self,
+		writer: Callable[[bytes], None],
+		receiver: Callable[[bytes], None],
+		flushDelay: Union[float, None] = None,
+		vectorWriter: Union[Callable[[Sequence[bytes]], None], None] = None,
+		onParsed: Union[Callable[[], None], None] = None,
+		flushTimer: Union[Callable[[float, Callable[[], None]], Any], None] = None,
+	) -> None:
+		"""
+		Defines the constructor for the object.
+
+		Args:
+			writer: The function which sends data to peer.
+			receiver: The function which receives data after it is parsed.
+			flushDelay: The number of seconds after which coalesced data is sent, or None to send data immediately.
+			vectorWriter: The function which sends a list of buffers to peer, or None to join them.
+			onParsed: A function to call each time `parse` has finished parsing data.
+			flushTimer: A function which calls a function after a delay, such as `loop.call_later`,
+				used to enforce the flush deadline instead of a flusher thread.
+		"""
 		self._writer: Callable[[bytes], None] = writer
 		self._receiver: Callable[[bytes], None] = receiver
 		self._readBuffer: MutableSequence[bytes] = []
 		self._writeBuffer: MutableSequence[bytes] = []
 		self._handlers: MutableSequence[Protocol] = []
+		self._flushDelay: Union[float, None] = flushDelay
+		self._vectorWriter: Union[Callable[[Sequence[bytes]], None], None] = vectorWriter
+		self._onParsed: Union[Callable[[], None], None] = onParsed
+		self._flushTimer: Union[Callable[[float, Callable[[], None]], Any], None] = flushTimer
+		self._pendingWrites: List[bytes] = []
+		self._flushCondition: threading.Condition = threading.Condition()
+		self.writesRequested: int = 0
+		self.writesIssued: int = 0
+		self.bytesSent: int = 0
 
 	@property
 	def isConnected(self) -> bool:
@@ -55,6 +99,8 @@ class Manager(object):
 		"""
 		if not self.isConnected:
 			self._isConnected = True
+			if self._flushDelay is not None and self._flushTimer is None:
+				threading.Thread(target=self._flushLoop, name="Flush", daemon=True).start()
 			if self._readBuffer:
 				data = b"".join(self._readBuffer)
 				self._readBuffer.clear()
@@ -69,25 +115,74 @@ class Manager(object):
 		if self.isConnected:
 			while self._handlers:
 				self.unregister(self._handlers[0])
-			self._isConnected = False
+			try:
+				self.flush()
+			except EnvironmentError:
+				logger.debug("Unable to send coalesced data while disconnecting.")
+			with self._flushCondition:
+				self._isConnected = False
+				self._flushCondition.notify()
+
+	def flush(self) -> None:
+		"""Sends any coalesced data to peer."""
+		with self._flushCondition:
+			if self._pendingWrites:
+				buffers = self._pendingWrites
+				self._pendingWrites = []
+				self._send(buffers)
+
+	def _flushLoop(self) -> None:
+		"""Sends coalesced data which was not flushed within `flushDelay` seconds of being written."""
+		with self._flushCondition:
+			while self.isConnected:
+				if self._pendingWrites:
+					self._flushCondition.wait(self._flushDelay)
+					try:
+						self.flush()
+					except EnvironmentError:
+						# The thread reading from peer handles the connection being lost.
+						logger.debug("Unable to send coalesced data.")
+				else:
+					self._flushCondition.wait()
+
+	def _send(self, buffers: Sequence[bytes]) -> None:
+		"""
+		Sends data to peer in a single call to the writer.
+
+		Args:
+			buffers: The data to be sent.
+		"""
+		if len(buffers) == 1:
+			self._writer(buffers[0])
+		elif self._vectorWriter is not None:
+			self._vectorWriter(buffers)
+		else:
+			self._writer(b"".join(buffers))
+		self.writesIssued += 1
+		self.bytesSent += sum(len(data) for data in buffers)
 
 	def parse(self, data: bytes) -> None:
 		"""
 		Parses data from peer.
 
 		If not connected, data will be buffered until `connect` is called.
+		Any data written while parsing is flushed afterward.
 
 		Args:
 			data: The data to be parsed.
 		"""
 		if not self.isConnected or not self._handlers:
 			self._readBuffer.append(data)
+			return None
 		elif self._readBuffer:
 			data = b"".join(self._readBuffer) + data
 			self._readBuffer.clear()
-			self._handlers[0].on_dataReceived(data)
-		elif data:
-			self._handlers[0].on_dataReceived(data)
+		elif not data:
+			return None
+		self._handlers[0].on_dataReceived(data)
+		self.flush()
+		if self._onParsed is not None:
+			self._onParsed()
 
 	def write(self, data: bytes, escape: bool = False) -> None:
 		"""
@@ -107,12 +202,24 @@ class Manager(object):
 			)
 		if not self.isConnected or not self._handlers:
 			self._writeBuffer.append(data)
+			return None
 		elif self._writeBuffer:
 			data = b"".join(self._writeBuffer) + data
 			self._writeBuffer.clear()
-			self._writer(data)
-		elif data:
-			self._writer(data)
+		elif not data:
+			return None
+		self.writesRequested += 1
+		if self._flushDelay is None:
+			self._send((data,))
+			return None
+		with self._flushCondition:
+			self._pendingWrites.append(data)
+			if len(self._pendingWrites) == 1:
+				# Start the deadline for sending the data.
+				if self._flushTimer is None:
+					self._flushCondition.notify()
+				else:
+					self._flushTimer(self._flushDelay, self.flush)
 
 	def register(self, handler: Type[Protocol], *args, **kwargs) -> None:
 		"""
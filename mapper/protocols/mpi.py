@@ -18,7 +18,7 @@ import subprocess
 import sys
 import tempfile
 import threading
-from typing import AbstractSet, Callable, Mapping, MutableSequence
+from typing import AbstractSet, Callable, List, Mapping, MutableSequence, Union
 
 # Local Modules:
 from .base import Protocol
@@ -27,6 +27,7 @@ from ..utils import removeFile
 
 
 MPI_INIT: bytes = b"~$#E"
+MPI_LINE_START: bytes = LF + MPI_INIT[:1]
 
 
 logger: logging.Logger = logging.getLogger(__name__)
@@ -49,7 +50,9 @@ class MPIProtocol(Protocol):
 		self.outputFormat = kwargs.pop("outputFormat") if "outputFormat" in kwargs else None
 		super().__init__(*args, **kwargs)
 		self._state: str = "data"
-		self._MPIBuffer: bytearray = bytearray()
+		self._MPIBuffer: bytearray = bytearray()  # Used for the init sequence and the length.
+		self._MPIBody: bytearray = bytearray()  # Used for a body which is received in more than one chunk.
+		self._MPIBodyOffset: int = 0
 		self._MPIThreads: MutableSequence[threading.Thread] = []
 		self.commandMap: Mapping[bytes, Callable[[bytes], None]] = {b"E": self.edit, b"V": self.view}
 		editors: Mapping[str, str] = {
@@ -124,66 +127,129 @@ class MPIProtocol(Protocol):
 			removeFile(fileName)
 
 	def on_dataReceived(self, data: bytes) -> None:  # NOQA: C901
-		appDataBuffer = []
-		while data:
-			if self.state == "data":
-				appData, separator, data = data.partition(LF)
-				appDataBuffer.append(appData + separator)
-				if separator:
-					self.state = "newline"
-			elif self.state == "newline":
-				if MPI_INIT.startswith(data[: len(MPI_INIT)]):
+		# The data is scanned by index over a memoryview, so that the remaining data is never re-sliced.
+		# Application data between MPI frames is forwarded as a few large slices, rather than line by line.
+		appDataBuffer: List[Union[bytes, memoryview]] = []
+		view = memoryview(data)
+		size = len(data)
+		index = 0
+		while index < size:
+			state = self._state
+			if state == "data":
+				# An MPI frame can only start at the beginning of a line.
+				end = data.find(MPI_LINE_START, index)
+				if end < 0:
+					if data.endswith(LF):
+						self._state = "newline"
+					appDataBuffer.append(view[index:] if index else data)
+					index = size
+				else:
+					appDataBuffer.append(view[index : end + 1])
+					self._state = "newline"
+					index = end + 1
+			elif state == "newline":
+				if MPI_INIT.startswith(data[index : index + len(MPI_INIT)]):
 					# Data starts with some or all of the MPI_INIT sequence.
-					self.state = "init"
+					self._state = "init"
 				else:
-					self.state = "data"
-			elif self.state == "init":
-				remaining = len(MPI_INIT) - len(self._MPIBuffer)
-				self._MPIBuffer.extend(data[:remaining])
-				data = data[remaining:]
-				if self._MPIBuffer == MPI_INIT:
+					self._state = "data"
+			elif state == "init":
+				expected = MPI_INIT[len(self._MPIBuffer) :]
+				received = data[index : index + len(expected)]
+				if not expected.startswith(received):
+					# The Bytes in the buffer are not part of an MPI init sequence.
+					# Those received in earlier data are passed on, and the rest are scanned again as data.
+					appDataBuffer.append(bytes(self._MPIBuffer))
+					self._MPIBuffer.clear()
+					self._state = "data"
+					continue
+				self._MPIBuffer.extend(received)
+				index += len(received)
+				if len(self._MPIBuffer) == len(MPI_INIT):
 					# The final byte in the MPI_INIT sequence has been reached.
 					if appDataBuffer:
-						super().on_dataReceived(b"".join(appDataBuffer))
+						super().on_dataReceived(self._joinAppData(appDataBuffer, data))
 						appDataBuffer.clear()
 					self._MPIBuffer.clear()
-					self.state = "command"
-				elif not MPI_INIT.startswith(self._MPIBuffer):
-					# The Bytes in the buffer are not part of an MPI init sequence.
-					data = bytes(self._MPIBuffer) + data
-					self._MPIBuffer.clear()
-					self.state = "data"
-			elif self.state == "command":
+					self._state = "command"
+			elif state == "command":
 				# The MPI command is a single byte.
-				self._command, data = data[:1], data[1:]
-				self.state = "length"
-			elif self.state == "length":
-				length, separator, data = data.partition(LF)
-				self._MPIBuffer.extend(length)
-				if not self._MPIBuffer.isdigit():
-					logger.warning(f"Invalid data {self._MPIBuffer!r} in MPI length. Digit expected.")
-					data = MPI_INIT + self._command + bytes(self._MPIBuffer) + separator + data
+				self._command = data[index : index + 1]
+				index += 1
+				self._state = "length"
+			elif state == "length":
+				end = data.find(LF, index)
+				length = data[index : size if end < 0 else end]
+				if not (self._MPIBuffer + length).isdigit():
+					# Any bytes of the header received in earlier data are passed on, and the rest are scanned again.
+					header = MPI_INIT + self._command + self._MPIBuffer
+					logger.warning(f"Invalid data {self._MPIBuffer + length!r} in MPI length. Digit expected.")
+					appDataBuffer.append(header)
 					del self._command
 					self._MPIBuffer.clear()
-					self.state = "data"
-				elif separator:
+					self._state = "newline" if header.endswith(LF) else "data"
+				elif end < 0:
+					self._MPIBuffer.extend(length)
+					index = size
+				else:
 					# The buffer contains the length of subsequent bytes to be received.
+					self._MPIBuffer.extend(length)
 					self._length = int(self._MPIBuffer)
 					self._MPIBuffer.clear()
-					self.state = "body"
-			elif self.state == "body":
-				remaining = self._length - len(self._MPIBuffer)
-				self._MPIBuffer.extend(data[:remaining])
-				data = data[remaining:]
-				if len(self._MPIBuffer) == self._length:
-					# The final byte in the expected MPI data has been received.
-					self.on_command(self._command, bytes(self._MPIBuffer))
-					del self._command
-					del self._length
-					self._MPIBuffer.clear()
-					self.state = "data"
+					self._state = "body"
+					index = end + 1
+					if not self._length:
+						self._finishCommand(b"")
+			elif state == "body":
+				offset = self._MPIBodyOffset
+				remaining = self._length - offset
+				count = min(remaining, size - index)
+				if not offset and count == remaining:
+					# The whole body is in this data.
+					self._finishCommand(data[index : index + count])
+				else:
+					if not offset:
+						# Allocate the body once, now that its length is known.
+						self._MPIBody = bytearray(self._length)
+					self._MPIBody[offset : offset + count] = view[index : index + count]
+					self._MPIBodyOffset += count
+					if count == remaining:
+						# The final byte in the expected MPI data has been received.
+						self._finishCommand(bytes(self._MPIBody))
+				index += count
 		if appDataBuffer:
-			super().on_dataReceived(b"".join(appDataBuffer))
+			super().on_dataReceived(self._joinAppData(appDataBuffer, data))
+
+	@staticmethod
+	def _joinAppData(appDataBuffer: List[Union[bytes, memoryview]], data: bytes) -> bytes:
+		"""
+		Joins buffered application data.
+
+		Args:
+			appDataBuffer: The buffered slices of application data.
+			data: The received data, which is returned without copying if it was buffered whole.
+
+		Returns:
+			The application data.
+		"""
+		if len(appDataBuffer) == 1 and appDataBuffer[0] is data:
+			return data
+		return b"".join(appDataBuffer)
+
+	def _finishCommand(self, body: bytes) -> None:
+		"""
+		Called when the body of an MPI message has been received.
+
+		Args:
+			body: The body of the message.
+		"""
+		command = self._command
+		del self._command
+		del self._length
+		self._MPIBody = bytearray()
+		self._MPIBodyOffset = 0
+		self._state = "data"
+		self.on_command(command, body)
 
 	def on_command(self, command: bytes, data: bytes) -> None:
 		"""
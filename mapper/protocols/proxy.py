@@ -11,6 +11,7 @@ import logging
 from typing import Sequence, Union
 
 # Local Modules:
+from .fused import FusedTelnetProtocol
 from .manager import Manager
 from .mpi import MPI_INIT, MPIProtocol
 from .telnet import TelnetProtocol
@@ -34,6 +35,9 @@ from .. import USER_DATA
 from ..utils import escapeIAC
 
 
+PLAYER_FLUSH_DELAY: float = 0.01  # Seconds.
+
+
 logger: logging.Logger = logging.getLogger(__name__)
 
 
@@ -146,6 +150,8 @@ class Game(Telnet):
 	def on_ga(self, *args) -> None:
 		"""Called when a Go Ahead command is received."""
 		self.proxy.player.write(self.proxy.promptTerminator)
+		# The end of a prompt is a natural point to send coalesced data to the player.
+		self.proxy.player.flush()
 
 	def on_connectionMade(self):
 		super().on_connectionMade()
@@ -176,6 +182,10 @@ class Game(Telnet):
 		super().on_disableLocal(option)
 
 
+class FusedGame(Game, FusedTelnetProtocol):
+	"""Parses Telnet, MPI, and XML data from the game in a single protocol handler."""
+
+
 class ProxyHandler(object):
 	def __init__(self, playerSocket, gameSocket, **kwargs):
 		self.outputFormat = kwargs["outputFormat"]
@@ -185,12 +195,23 @@ class ProxyHandler(object):
 		self.isEmulatingOffline = kwargs["isEmulatingOffline"]
 		self.mapperCommands = kwargs["mapperCommands"]
 		self.eventCaller = kwargs["eventCaller"]
-		self.player = Manager(playerSocket.sendall, self.on_playerReceived)
+		# Data written to the player is coalesced, and is sent when the game data which produced it has been parsed.
+		self.player = Manager(
+			playerSocket.sendall,
+			self.on_playerReceived,
+			flushDelay=PLAYER_FLUSH_DELAY,
+			vectorWriter=getattr(playerSocket, "sendmsgall", None),
+			flushTimer=kwargs.get("flushTimer"),
+		)
 		self.player.register(Player, self)
-		self.game = Manager(gameSocket.sendall, self.on_gameReceived)
-		self.game.register(Game, self)
-		self.game.register(MPIProtocol, outputFormat=self.outputFormat)
-		self.game.register(XMLProtocol, outputFormat=self.outputFormat, eventCaller=self.eventCaller)
+		self.isFusedParser = kwargs.get("isFusedParser", False)
+		self.game = Manager(gameSocket.sendall, self.on_gameReceived, onParsed=self.player.flush)
+		if self.isFusedParser:
+			self.game.register(FusedGame, self, outputFormat=self.outputFormat, eventCaller=self.eventCaller)
+		else:
+			self.game.register(Game, self)
+			self.game.register(MPIProtocol, outputFormat=self.outputFormat)
+			self.game.register(XMLProtocol, outputFormat=self.outputFormat, eventCaller=self.eventCaller)
 
 	def close(self):
 		self.disconnect()
@@ -34,7 +34,7 @@ from __future__ import annotations
 # Built-in Modules:
 import logging
 from abc import abstractmethod
-from typing import AbstractSet, Callable, Mapping, MutableMapping, Union
+from typing import AbstractSet, Callable, List, Mapping, MutableMapping, Union
 
 # Local Modules:
 from .base import Protocol
@@ -210,6 +210,8 @@ class TelnetProtocol(BaseTelnetProtocol):
 		self._state: str = "data"
 		self._options: MutableMapping[bytes, _OptionState] = {}
 		"""A mapping of option bytes to their current state."""
+		self._subnegotiation: bytearray = bytearray()
+		"""The payload of the subnegotiation being received."""
 		self.commandMap: Mapping[bytes, Callable[[Union[bytes, None]], None]] = {
 			WILL: self.on_will,
 			WONT: self.on_wont,
@@ -367,51 +369,78 @@ class TelnetProtocol(BaseTelnetProtocol):
 		self.write(IAC + SB + option + escapeIAC(data) + IAC + SE)
 
 	def on_dataReceived(self, data: bytes) -> None:  # NOQA: C901
-		appDataBuffer = []
-		while data:
-			if self.state == "data":
-				appData, separator, data = data.partition(IAC)
-				if separator:
-					self.state = "command"
-				elif appData.endswith(CR):
-					self.state = "newline"
-					appData = appData[:-1]
-				appDataBuffer.append(appData.replace(CR_LF, LF).replace(CR_NULL, CR))
+		# The data is scanned by index, jumping between IAC and CR bytes with bytes.find,
+		# so that the remaining data is never copied. Runs of application data without a CR
+		# are passed on as memoryview slices, which are only copied when joined.
+		appDataBuffer: List[Union[bytes, memoryview]] = []
+		view = memoryview(data)
+		size = len(data)
+		index = 0
+		while index < size:
+			state = self._state
+			if state == "data":
+				end = data.find(IAC, index)
+				if end < 0:
+					end = nextIndex = size
+				else:
+					self._state = "command"
+					nextIndex = end + 1
+				if data.find(CR, index, end) < 0:
+					if end > index:
+						appDataBuffer.append(view[index:end])
+				else:
+					appData = data[index:end]
+					if end == size and appData.endswith(CR):
+						self._state = "newline"
+						appData = appData[:-1]
+					appDataBuffer.append(appData.replace(CR_LF, LF).replace(CR_NULL, CR))
+				index = nextIndex
+				continue
+			elif state == "subnegotiation":
+				end = data.find(IAC, index)
+				if end < 0:
+					self._subnegotiation += view[index:]
+					index = size
+				else:
+					self._subnegotiation += view[index:end]
+					self._state = "subnegotiation-escaped"
+					index = end + 1
 				continue
-			byte, data = data[:1], data[1:]
-			if self.state == "command":
+			byte = data[index : index + 1]
+			index += 1
+			if state == "command":
 				if byte == IAC:
 					# Escaped IAC.
 					appDataBuffer.append(byte)
-					self.state = "data"
+					self._state = "data"
 				elif byte == SE:
-					self.state = "data"
+					self._state = "data"
 					logger.warning("IAC SE received outside of subnegotiation.")
 				elif byte == SB:
-					self.state = "subnegotiation"
-					self._commands = []
+					self._state = "subnegotiation"
+					self._subnegotiation.clear()
 				elif byte in COMMAND_BYTES:
-					self.state = "data"
+					self._state = "data"
 					if appDataBuffer:
 						super().on_dataReceived(b"".join(appDataBuffer))
 						appDataBuffer.clear()
 					self.on_command(byte, None)
 				elif byte in NEGOTIATION_BYTES:
-					self.state = "negotiation"
+					self._state = "negotiation"
 					self._command = byte
 				else:
-					self.state = "data"
+					self._state = "data"
 					logger.warning(f"Unknown Telnet command received {byte!r}.")
-			elif self.state == "negotiation":
-				self.state = "data"
+			elif state == "negotiation":
+				self._state = "data"
 				command = self._command
 				del self._command
 				if appDataBuffer:
 					super().on_dataReceived(b"".join(appDataBuffer))
 					appDataBuffer.clear()
 				self.on_command(command, byte)
-			elif self.state == "newline":
-				self.state = "data"
+			elif state == "newline":
+				self._state = "data"
 				if byte == LF:
 					appDataBuffer.append(byte)
 				elif byte == NULL:
@@ -428,30 +457,25 @@ class TelnetProtocol(BaseTelnetProtocol):
 					# NUL, it still makes sense to interpret this as CR and
 					# then apply all the usual interpretation to the IAC.
 					appDataBuffer.append(CR)
-					self.state = "command"
+					self._state = "command"
 				else:
 					appDataBuffer.append(CR + byte)
-			elif self.state == "subnegotiation":
-				if byte == IAC:
-					self.state = "subnegotiation-escaped"
-				else:
-					self._commands.append(byte)
-			elif self.state == "subnegotiation-escaped":
+			elif state == "subnegotiation-escaped":
 				if byte == SE:
-					self.state = "data"
-					commands = b"".join(self._commands)
-					del self._commands
+					self._state = "data"
+					commands = bytes(self._subnegotiation)
+					self._subnegotiation.clear()
 					if appDataBuffer:
 						super().on_dataReceived(b"".join(appDataBuffer))
 						appDataBuffer.clear()
 					self.on_subnegotiation(commands[:1], commands[1:])
 				else:
-					self.state = "subnegotiation"
-					self._commands.append(byte)
+					self._state = "subnegotiation"
+					self._subnegotiation += byte
 			else:
-				logger.warning(f"Invalid Telnet state {self.state!r}. How'd you do this?")
+				logger.warning(f"Invalid Telnet state {state!r}. How'd you do this?")
 				appDataBuffer.append(byte)
-				self.state = "data"
+				self._state = "data"
 		if appDataBuffer:
 			super().on_dataReceived(b"".join(appDataBuffer))
 
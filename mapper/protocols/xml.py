@@ -13,18 +13,22 @@ from __future__ import annotations
 
 # Built-in Modules:
 import logging
-from typing import AbstractSet, Callable, Mapping, Tuple, Union
+import re
+from typing import AbstractSet, Callable, List, Mapping, Pattern, Tuple, Union
 
 # Local Modules:
 from .base import Protocol
 from .mpi import MPI_INIT
-from .telnet_constants import CR_LF, LF
+from .telnet_constants import CR, CR_LF, LF
 from .. import MUD_DATA
 from ..utils import unescapeXML
 
 
 LT: bytes = b"<"
 GT: bytes = b">"
+# Splits data into runs of text, and tags with or without their closing bracket.
+# A tag without a closing bracket is continued in the next chunk of data.
+TOKEN_REGEX: Pattern[bytes] = re.compile(rb"([^<]+)|<([^>]*)(>?)")
 
 
 logger: logging.Logger = logging.getLogger(__name__)
@@ -100,54 +104,65 @@ class XMLProtocol(Protocol):
 
 	def on_dataReceived(self, data: bytes) -> None:  # NOQA: C901
 		outputFormat = self.outputFormat
-		appDataBuffer = []
-		while data:
-			if self.state == "data":
-				appData, separator, data = data.partition(LT)
+		appDataBuffer: List[bytes] = []
+		index = 0
+		if self._state == "tag":
+			# The data continues a tag from the previous chunk.
+			index = data.find(GT)
+			if index < 0:
+				self._tagBuffer.extend(data)
+				return None
+			self._tagBuffer.extend(data[:index])
+			tokens = [(b"", bytes(self._tagBuffer), GT)]
+			self._tagBuffer.clear()
+			self._state = "data"
+			index += 1
+		else:
+			tokens = []
+		tokens.extend(TOKEN_REGEX.findall(data, index))
+		for appData, tag, tagEnd in tokens:
+			if appData:
 				if outputFormat == "raw" or not self._gratuitous:
 					appDataBuffer.append(appData)
-				if self._mode is None:
+				if self._mode is not None:
+					self._textBuffer.extend(appData)
+				elif LF not in appData and CR not in appData and not self._lineBuffer.endswith(CR):
+					# No line can end in this text.
+					self._lineBuffer.extend(appData)
+				else:
 					self._lineBuffer.extend(appData)
 					lines = self._lineBuffer.splitlines(True)
 					self._lineBuffer.clear()
-					if lines and not lines[-1].endswith(LF):
+					if not lines[-1].endswith(LF):
 						self._lineBuffer.extend(lines.pop())
-					lines = [line.rstrip(CR_LF) for line in lines if line.strip()]
 					for line in lines:
-						self.on_mapperEvent("line", unescapeXML(line, True))
-				else:
-					self._textBuffer.extend(appData)
-				if separator:
-					self.state = "tag"
-			elif self.state == "tag":
-				appData, separator, data = data.partition(GT)
-				self._tagBuffer.extend(appData)
-				if not separator:
-					# End of tag not reached yet.
-					continue
-				# End of tag reached.
-				tag = bytes(self._tagBuffer)
-				self._tagBuffer.clear()
-				text = bytes(self._textBuffer)
-				self._textBuffer.clear()
-				if outputFormat == "raw":
-					appDataBuffer.append(LT + tag + GT)
-				elif outputFormat == "tintin" and not self._gratuitous:
-					appDataBuffer.append(self.tintinReplacements.get(tag, b""))
-				if self._mode is None and tag.startswith(b"movement"):
-					self.on_mapperEvent("movement", unescapeXML(tag[13:-1], True))
-				elif tag == b"gratuitous":
-					self._gratuitous = True
-				elif tag == b"/gratuitous":
-					self._gratuitous = False
-				elif tag in self.modes:
-					self._mode = self.modes[tag]
-					if tag.startswith(b"/"):
-						self.on_mapperEvent(
-							"dynamic" if tag == b"/room" else tag[1:].decode("us-ascii"),
-							unescapeXML(text, True),
-						)
-				self.state = "data"
+						if line.strip():
+							self.on_mapperEvent("line", unescapeXML(line.rstrip(CR_LF), True))
+				continue
+			elif not tagEnd:
+				# End of tag not reached yet.
+				self._tagBuffer.extend(tag)
+				self._state = "tag"
+				continue
+			# End of tag reached.
+			text = bytes(self._textBuffer)
+			self._textBuffer.clear()
+			if outputFormat == "raw":
+				appDataBuffer.append(LT + tag + GT)
+			elif outputFormat == "tintin" and not self._gratuitous:
+				appDataBuffer.append(self.tintinReplacements.get(tag, b""))
+			if self._mode is None and tag.startswith(b"movement"):
+				self.on_mapperEvent("movement", unescapeXML(tag[13:-1], True))
+			elif tag == b"gratuitous":
+				self._gratuitous = True
+			elif tag == b"/gratuitous":
+				self._gratuitous = False
+			elif tag in self.modes:
+				self._mode = self.modes[tag]
+				if tag.startswith(b"/"):
+					self.on_mapperEvent(
+						"dynamic" if tag == b"/room" else tag[1:].decode("us-ascii"), unescapeXML(text, True)
+					)
 		if appDataBuffer:
 			if outputFormat == "raw":
 				super().on_dataReceived(b"".join(appDataBuffer))
@@ -0,0 +1,157 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+
+# Future Modules:
+from __future__ import annotations
+
+# Built-in Modules:
+import threading
+from collections import Counter, OrderedDict, deque
+from queue import Empty
+
+# Local Modules:
+from . import MUD_DATA, QUEUE_POLICIES
+from .utils import decodeBytes, stripAnsi
+
+
+EVENT_QUEUE_SIZE = 4096  # The number of events which may wait before the overload policy applies.
+# Mud events which the mapper needs to stay synced, and which are never dropped.
+ESSENTIAL_MUD_EVENTS = frozenset(("description", "dynamic", "exits", "movement", "name", "prompt"))
+
+
+def isDroppable(event, isKeptLine=None):
+	"""
+	Returns True if an event may be dropped when the mapper falls behind, such as a line of output.
+	If given, isKeptLine is called with the text of a line, and returns True if the line must be kept.
+	"""
+	dataType, data = event
+	if dataType != MUD_DATA or data[0] in ESSENTIAL_MUD_EVENTS:
+		return False
+	elif data[0] == "line" and isKeptLine is not None:
+		return not isKeptLine(stripAnsi(decodeBytes(data[1])))
+	return True
+
+
+class BoundedEventQueue(object):
+	"""
+	The bookkeeping shared by the queues of events for the mapper.
+
+	Once `maxSize` events are waiting, the policy decides what happens to further mud events.
+	Under the 'block' policy, the reader of the game waits until the mapper catches up,
+	so that nothing is lost and the game is slowed down instead.
+	Under the 'drop' policy, low-value events such as lines of output are dropped,
+	while the events needed to stay synced, and the lines for which `isKeptLine` returns True, are always queued.
+	Events from the user, and results given back to the mapper, are always queued.
+	"""
+
+	def __init__(self, maxSize=EVENT_QUEUE_SIZE, policy=QUEUE_POLICIES[0], isKeptLine=None):
+		if policy not in QUEUE_POLICIES:
+			raise ValueError(f"{policy} not in {QUEUE_POLICIES}")
+		self.maxSize = maxSize
+		self.policy = policy
+		self.isKeptLine = isKeptLine
+		self._events = deque()
+		self.peak = 0
+		self.waits = 0  # The number of times the reader was held back under the 'block' policy.
+		self.dropped = Counter()  # The number of dropped events by event name.
+
+	@property
+	def isFull(self):
+		return len(self._events) >= self.maxSize
+
+	def empty(self):
+		return not self._events
+
+	def qsize(self):
+		return len(self._events)
+
+	def _admit(self, event):
+		# Returns False if the event is dropped.
+		if self.policy == "drop" and self.isFull and isDroppable(event, self.isKeptLine):
+			self.dropped[event[1][0]] += 1
+			return False
+		return True
+
+	def _append(self, event):
+		self._events.append(event)
+		if len(self._events) > self.peak:
+			self.peak = len(self._events)
+
+	def stats(self):
+		"""Returns a description of the queue depth and overload counters."""
+		result = [
+			f"{len(self._events)} of {self.maxSize} events waiting, at most {self.peak}. Policy: {self.policy}.",
+			f"The game was held back {self.waits} times.",
+		]
+		if self.dropped:
+			dropped = ", ".join(f"{count} {name}" for name, count in self.dropped.most_common())
+			result.append(f"Dropped {sum(self.dropped.values())} events: {dropped}.")
+		else:
+			result.append("No events were dropped.")
+		return result
+
+
+class ThreadEventQueue(BoundedEventQueue):
+	"""A queue of events for the mapper thread, which may be put from any thread."""
+
+	def __init__(self, maxSize=EVENT_QUEUE_SIZE, policy=QUEUE_POLICIES[0], isKeptLine=None):
+		super().__init__(maxSize, policy, isKeptLine)
+		self._condition = threading.Condition()
+
+	def put(self, event):
+		with self._condition:
+			if self.policy == "block" and event[0] == MUD_DATA and self.isFull:
+				# Mud events only come from the threads which read from the game, never from the mapper thread.
+				self.waits += 1
+				self._condition.wait_for(lambda: not self.isFull)
+			if self._admit(event):
+				self._append(event)
+				self._condition.notify_all()
+
+	def get(self, timeout=None):
+		with self._condition:
+			if not self._condition.wait_for(lambda: self._events, timeout):
+				raise Empty
+			event = self._events.popleft()
+			self._condition.notify_all()
+			return event
+
+
+class GUIQueue(object):
+	"""
+	A queue of messages for the GUI, which only keeps the latest message of each kind.
+
+	The GUI redraws the whole map for each message, so a message which is replaced by a later one of
+	the same kind, such as the current room changing again, need not be handled.
+	"""
+
+	def __init__(self):
+		self._messages = OrderedDict()
+		self._lock = threading.Lock()
+		self.coalesced = 0
+
+	def empty(self):
+		return not self._messages
+
+	def qsize(self):
+		return len(self._messages)
+
+	def put(self, message):
+		# The message None closes the GUI.
+		kind = None if message is None else message[0]
+		with self._lock:
+			if kind in self._messages:
+				self.coalesced += 1
+			self._messages[kind] = message
+
+	def get_nowait(self):
+		with self._lock:
+			if not self._messages:
+				raise Empty
+			kind, message = self._messages.popitem(last=False)
+			return message
+
+	def stats(self):
+		return [f"{len(self._messages)} GUI messages waiting, {self.coalesced} replaced by later messages."]
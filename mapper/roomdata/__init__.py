@@ -7,7 +7,7 @@
 from __future__ import annotations
 
 # Local Modules:
-from . import database, objects
+from . import database, distances, graph, objects, zones
 
 
-__all__ = ["database", "objects"]
+__all__ = ["database", "distances", "graph", "objects", "zones"]
@@ -26,11 +26,15 @@ LABELS_FILE = "room_labels.json"
 SAMPLE_LABELS_FILE = "room_labels.json.sample"
 LABELS_FILE_PATH = os.path.join(DATA_DIRECTORY, LABELS_FILE)
 SAMPLE_LABELS_FILE_PATH = os.path.join(DATA_DIRECTORY, SAMPLE_LABELS_FILE)
+LABEL_DISTANCES_FILE = "label_distances.json"
+LABEL_DISTANCES_FILE_PATH = os.path.join(DATA_DIRECTORY, LABEL_DISTANCES_FILE)
 MAP_FILE = "arda.json"
 SAMPLE_MAP_FILE = "arda.json.sample"
 MAP_DIRECTORY = getDirectoryPath("maps")
 MAP_FILE_PATH = os.path.join(MAP_DIRECTORY, MAP_FILE)
 SAMPLE_MAP_FILE_PATH = os.path.join(MAP_DIRECTORY, SAMPLE_MAP_FILE)
+ROUTE_USAGE_FILE = "route_usage.json"
+ROUTE_USAGE_FILE_PATH = os.path.join(DATA_DIRECTORY, ROUTE_USAGE_FILE)
 
 
 def _load(filePath):
@@ -76,6 +80,24 @@ def dumpLabels(labels):
 		json.dump(labels, fileObj, sort_keys=True, indent=2, separators=(",", ": "))
 
 
+def loadLabelDistances():
+	return _load(LABEL_DISTANCES_FILE_PATH)
+
+
+def dumpLabelDistances(data):
+	with codecs.open(LABEL_DISTANCES_FILE_PATH, "wb", encoding="utf-8") as fileObj:
+		json.dump(data, fileObj, sort_keys=True, separators=(",", ":"))
+
+
+def loadRouteUsage():
+	return _load(ROUTE_USAGE_FILE_PATH)
+
+
+def dumpRouteUsage(usage):
+	with codecs.open(ROUTE_USAGE_FILE_PATH, "wb", encoding="utf-8") as fileObj:
+		json.dump(usage, fileObj, sort_keys=True, indent=2, separators=(",", ": "))
+
+
 def loadRooms():
 	errorMessages = []
 	errors, result = _load(MAP_FILE_PATH)
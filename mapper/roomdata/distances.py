@@ -0,0 +1,337 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+
+# Future Modules:
+from __future__ import annotations
+
+# Built-in Modules:
+import base64
+import functools
+import hashlib
+import multiprocessing
+import zlib
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Sequence, Tuple, Union
+
+# Local Modules:
+from .graph import Graph, ShortestPathTree
+
+
+NO_HOP: int = 255
+POOL_MINIMUM_SEARCHES: int = 4
+# Searches between a few rooms stop early, so more of them are needed to make up for starting the workers.
+POOL_MINIMUM_ORIGINS: int = 16
+_workerGraph: Union[Graph, None] = None
+
+
+def graphFingerprint(graph: Graph) -> str:
+	"""
+	Calculates a fingerprint of the rooms and edge costs of a graph.
+
+	Graphs with the same fingerprint have the same room indices and lowest cost paths,
+	even if they were built in different sessions.
+
+	Args:
+		graph: The graph.
+
+	Returns:
+		The fingerprint, as a hexadecimal string.
+	"""
+	digest = hashlib.sha1("\n".join(graph.vnums).encode("utf-8"))
+	for values in (graph.offsets, graph.targets, graph.costs, graph.directions):
+		digest.update(values)  # type: ignore[arg-type]
+	return digest.hexdigest()
+
+
+def _destinationSearch(graph: Graph, destination: int, origins: Sequence[int]) -> Tuple[array, bytes]:
+	# Searches backwards from a destination, returning the costs of moving from each origin to the destination,
+	# and the next hop from every room towards it.
+	tree = ShortestPathTree(graph, destination, reverse=True)
+	tree.settle()
+	offsets = graph.offsets
+	nextHops = bytes(
+		NO_HOP if parent < 0 else parent - offsets[room] for room, parent in enumerate(tree.parents)
+	)
+	return array("d", [tree.distances[origin] for origin in origins]), nextHops
+
+
+def _originSearch(graph: Graph, origin: int, destinations: Sequence[int]) -> array:
+	# Searches forwards from an origin, returning the costs of moving from it to each destination.
+	# The search stops once every destination is reached.
+	tree = ShortestPathTree(graph, origin)
+	goals = set(destinations)
+	goals.discard(origin)
+	while goals:
+		found = tree.settle(goals)
+		if found is None:
+			break
+		goals.discard(found)
+	return array("d", [tree.distances[destination] for destination in destinations])
+
+
+def _initWorker(graph: Graph) -> None:
+	global _workerGraph
+	_workerGraph = graph
+
+
+def _inWorker(function: Callable[..., Any], *args: Any) -> Any:
+	# Calls a search function with the graph that was sent to the worker process.
+	return function(_workerGraph, *args)
+
+
+def _encode(values: Union[array, bytes]) -> str:
+	return base64.b64encode(zlib.compress(bytes(values))).decode("ascii")
+
+
+def _decode(text: str) -> bytes:
+	return zlib.decompress(base64.b64decode(text))
+
+
+class LabelDistances(object):
+	"""
+	The lowest costs of moving between labelled rooms, and the next hop from every room towards each of them.
+
+	Attributes:
+		fingerprint: The fingerprint of the graph the table was calculated from.
+		version: The map version that the table is valid for.
+		vnums: The vnums of the labelled rooms.
+		indices: A mapping of labelled vnums to their index in `vnums`.
+		distances: The cost of moving from each labelled room to a labelled destination, by destination vnum.
+			The costs are in the same order as `vnums`.
+		nextHops: For each labelled destination, the exit to take from every room in the graph
+			along the lowest cost path to the destination, as an offset into the exits of the room,
+			or `NO_HOP` if the destination can't be reached.
+	"""
+
+	def __init__(self, fingerprint: str, vnums: Iterable[str], version: int = 0) -> None:
+		self.fingerprint: str = fingerprint
+		self.version: int = version
+		self.vnums: List[str] = list(vnums)
+		self.indices: Dict[str, int] = {vnum: i for i, vnum in enumerate(self.vnums)}
+		self.distances: Dict[str, array] = {}
+		self.nextHops: Dict[str, bytes] = {}
+
+	def __len__(self) -> int:
+		return len(self.vnums)
+
+	def distance(self, origin: str, destination: str) -> Union[float, None]:
+		"""
+		Looks up the cost of moving between two labelled rooms.
+
+		Args:
+			origin: The vnum of the origin room.
+			destination: The vnum of the destination room.
+
+		Returns:
+			The cost, which is infinite if the destination can't be reached,
+			or None if either room is not in the table.
+		"""
+		if origin not in self.indices or destination not in self.distances:
+			return None
+		return self.distances[destination][self.indices[origin]]
+
+	def edgePath(self, graph: Graph, origin: int, destination: str) -> Union[List[int], None]:
+		"""
+		Follows the next hops from a room to a labelled destination.
+
+		Args:
+			graph: The graph the table was calculated from.
+			origin: The index of the origin room.
+			destination: The vnum of the destination room.
+
+		Returns:
+			The indices of the edges along the path, in the order that they should be walked,
+			or None if the destination can't be reached.
+		"""
+		nextHops = self.nextHops[destination]
+		offsets = graph.offsets
+		targets = graph.targets
+		goal = graph.indices[destination]
+		edges = []
+		room = origin
+		while room != goal:
+			hop = nextHops[room]
+			if hop == NO_HOP:
+				return None
+			edge = offsets[room] + hop
+			edges.append(edge)
+			room = targets[edge]
+		return edges
+
+	def toJSON(self) -> Dict[str, Any]:
+		"""Converts the table to a JSON compatible dict, as stored by `database.dumpLabelDistances`."""
+		return {
+			"fingerprint": self.fingerprint,
+			"vnums": self.vnums,
+			"distances": {vnum: _encode(values) for vnum, values in self.distances.items()},
+			"next_hops": {vnum: _encode(values) for vnum, values in self.nextHops.items()},
+		}
+
+	@classmethod
+	def fromJSON(cls, data: Mapping[str, Any], version: int = 0) -> LabelDistances:
+		"""Creates a table from the dict returned by `toJSON`."""
+		table = cls(data["fingerprint"], data["vnums"], version)
+		for vnum, text in data["distances"].items():
+			table.distances[vnum] = array("d", _decode(text))
+		for vnum, text in data["next_hops"].items():
+			table.nextHops[vnum] = _decode(text)
+		return table
+
+
+def _mapper(
+	graph: Graph, maxWorkers: Union[int, None], searches: int, minimum: int = POOL_MINIMUM_SEARCHES
+) -> Tuple[Callable[..., Iterator[Any]], Any]:
+	# Returns a function for mapping a search function over arguments, and the executor running the searches.
+	# Fewer than `minimum` searches are run in this process, since starting the workers would take longer.
+	if maxWorkers == 0 or maxWorkers is None and searches < minimum:
+		return lambda function, *args: map(functools.partial(function, graph), *args), None
+	executor = ProcessPoolExecutor(
+		max_workers=maxWorkers,
+		# Spawned processes don't inherit the threads and locks of the mapper.
+		mp_context=multiprocessing.get_context("spawn"),
+		initializer=_initWorker,
+		initargs=(graph,),
+	)
+	return lambda function, *args: executor.map(functools.partial(_inWorker, function), *args), executor
+
+
+def buildLabelDistances(
+	graph: Graph,
+	vnums: Iterable[str],
+	previous: Union[LabelDistances, None] = None,
+	maxWorkers: Union[int, None] = None,
+) -> LabelDistances:
+	"""
+	Calculates the table of costs between labelled rooms.
+
+	One search is run from each labelled room, on a pool of worker processes.
+	If a previous table was calculated from the same graph, only the rooms which were labelled since then
+	are searched.
+
+	Args:
+		graph: The graph to search.
+		vnums: The vnums of the labelled rooms. Vnums which are not in the graph are ignored.
+		previous: A previously calculated table, or None.
+		maxWorkers: The number of worker processes, None for one per processor, or 0 to search in this process.
+
+	Returns:
+		The new table.
+	"""
+	indices = graph.indices
+	vnums = sorted(set(vnum for vnum in vnums if vnum in indices))
+	fingerprint = graphFingerprint(graph)
+	table = LabelDistances(fingerprint, vnums, graph.version)
+	if previous is not None and previous.fingerprint == fingerprint:
+		kept = [vnum for vnum in vnums if vnum in previous.nextHops]
+	else:
+		kept = []
+	keptVnums = frozenset(kept)
+	added = [vnum for vnum in vnums if vnum not in keptVnums]
+	origins = [indices[vnum] for vnum in vnums]
+	keptIndices = [indices[vnum] for vnum in kept]
+	rows: Dict[str, array] = {}
+	if added:
+		addedIndices = [indices[vnum] for vnum in added]
+		mapSearch, executor = _mapper(graph, maxWorkers, len(added))
+		try:
+			columns = mapSearch(_destinationSearch, addedIndices, [origins] * len(added))
+			for vnum, (distances, nextHops) in zip(added, columns):
+				table.distances[vnum] = distances
+				table.nextHops[vnum] = nextHops
+			if kept:
+				# The costs from the added rooms to the kept rooms are found by searching forwards.
+				rows.update(zip(added, mapSearch(_originSearch, addedIndices, [keptIndices] * len(added))))
+		finally:
+			if executor is not None:
+				executor.shutdown()
+	for i, vnum in enumerate(kept):
+		table.distances[vnum] = array(
+			"d",
+			[
+				rows[origin][i] if origin in rows else previous.distance(origin, vnum)  # type: ignore[union-attr]
+				for origin in vnums
+			],
+		)
+		table.nextHops[vnum] = previous.nextHops[vnum]  # type: ignore[union-attr]
+	return table
+
+
+def pairwiseCosts(
+	graph: Graph, origins: Sequence[int], destinations: Sequence[int], maxWorkers: Union[int, None] = None
+) -> List[array]:
+	"""
+	Calculates the costs of moving from each of several rooms to each of several others.
+
+	Args:
+		graph: The graph to search.
+		origins: The indices of the origin rooms.
+		destinations: The indices of the destination rooms.
+		maxWorkers: The number of worker processes, None for one per processor, or 0 to search in this process.
+			With None, fewer than `POOL_MINIMUM_ORIGINS` origins are searched in this process.
+
+	Returns:
+		The costs from each origin to the destinations, in the same order as `destinations`.
+	"""
+	if not origins:
+		return []
+	mapSearch, executor = _mapper(graph, maxWorkers, len(origins), POOL_MINIMUM_ORIGINS)
+	try:
+		return list(mapSearch(_originSearch, origins, [destinations] * len(origins)))
+	finally:
+		if executor is not None:
+			executor.shutdown()
+
+
+def _tourCost(costs: Sequence[Sequence[float]], order: Sequence[int]) -> float:
+	return sum(costs[a][b] for a, b in zip(order, order[1:]))
+
+
+def _tourChanges(order: List[int]) -> Iterator[List[int]]:
+	# Yields the orders which differ from an order by a reversed section (2-opt),
+	# or a run of up to three rooms moved elsewhere (Or-opt). The first room is never moved.
+	for i in range(1, len(order) - 1):
+		for j in range(i + 1, len(order)):
+			yield order[:i] + order[i : j + 1][::-1] + order[j + 1 :]
+	for length in range(1, 4):
+		for i in range(1, len(order) - length + 1):
+			run = order[i : i + length]
+			rest = order[:i] + order[i + length :]
+			for j in range(1, len(rest) + 1):
+				if j != i:
+					yield rest[:j] + run + rest[j:]
+
+
+def shortestTour(costs: Sequence[Sequence[float]]) -> List[int]:
+	"""
+	Finds a short order in which to visit several rooms, starting from the first.
+
+	The order is built by repeatedly moving to the nearest unvisited room,
+	then improved by reversing sections of it (2-opt) and moving runs of up to three rooms elsewhere (Or-opt),
+	until neither finds a cheaper order. The costs do not need to be symmetric.
+
+	Args:
+		costs: The cost of moving from each room to each other room.
+
+	Returns:
+		The indices of the rooms in the order they should be visited, beginning with 0.
+	"""
+	unvisited = set(range(1, len(costs)))
+	order = [0]
+	while unvisited:
+		nearest = min(unvisited, key=lambda room: (costs[order[-1]][room], room))
+		order.append(nearest)
+		unvisited.remove(nearest)
+	bestCost = _tourCost(costs, order)
+	improved = True
+	while improved:
+		improved = False
+		for candidate in _tourChanges(order):
+			cost = _tourCost(costs, candidate)
+			if cost < bestCost:
+				order, bestCost = candidate, cost
+				improved = True
+				break
+	return order
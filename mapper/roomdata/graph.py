@@ -0,0 +1,518 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+
+# Future Modules:
+from __future__ import annotations
+
+# Built-in Modules:
+import heapq
+import itertools
+import threading
+from array import array
+from collections import OrderedDict
+from typing import (
+	AbstractSet,
+	Any,
+	Dict,
+	FrozenSet,
+	List,
+	Mapping,
+	MutableSequence,
+	Sequence,
+	Set,
+	Tuple,
+	Union,
+)
+
+# Local Modules:
+from .objects import VALID_EXIT_FLAGS, Room
+
+
+DIRECTIONS: Sequence[str] = ("north", "east", "south", "west", "up", "down")
+EXIT_FLAG_BITS: Mapping[str, int] = {flag: 1 << i for i, flag in enumerate(VALID_EXIT_FLAGS)}
+DOOR_OR_CLIMB: int = EXIT_FLAG_BITS["door"] | EXIT_FLAG_BITS["climb"]
+AVOID: int = EXIT_FLAG_BITS["avoid"]
+EDGE_COST_PROFILES: int = 8
+INFINITY: float = float("inf")
+# The extra cost of entering dark or evil aligned rooms at night.
+DARK_NIGHT_COST: float = 5.0
+EVIL_NIGHT_COST: float = 10.0
+# How much of the night costs apply at each time of day, as named by `MumeTime.dawnDuskState`.
+PERIOD_WEIGHTS: Mapping[str, float] = {"DAY": 0.0, "DAWN": 0.5, "NIGHT": 1.0}
+
+
+class Graph(object):
+	"""
+	A compressed sparse row (CSR) snapshot of the exits between rooms.
+
+	Rooms are numbered from 0 to `len(graph) - 1`, and the exits leading out of room `i` are
+	the edges from `offsets[i]` up to (but not including) `offsets[i + 1]`.
+	Exits which do not lead to a room in the map (undefined, death, or dangling vnums) are left out.
+
+	Attributes:
+		version: The map version that the graph was built from.
+		vnums: The vnum of each room, by room index.
+		rooms: The room object of each room, by room index. Room objects are not kept when the graph is pickled.
+		indices: A mapping of vnums to room indices.
+		terrains: The terrain of each room, by room index.
+		nightCosts: The extra cost of entering each room at night, by room index.
+		coordinates: The (x, y, z) coordinates of each room, by room index.
+		offsets: The index of the first edge of each room, plus a final sentinel.
+		sources: The index of the room each edge leads out of.
+		targets: The index of the room each edge leads to.
+		costs: The base movement cost of each edge, including the cost of the room it leads to.
+		flags: The exit flags of each edge, as a bit mask of `EXIT_FLAG_BITS`.
+		directions: The direction of each edge, as an index into `DIRECTIONS`.
+		doors: The door name of each edge.
+		edges: The edges leading out of each room, in the order given by `offsets`.
+		reverseOffsets: The index in `reverseEdges` of the first edge leading into each room, plus a sentinel.
+		reverseEdges: The edges leading into each room, grouped by the room they lead to.
+	"""
+
+	def __init__(self, rooms: Mapping[str, Room], version: int = 0) -> None:
+		self.version: int = version
+		self.vnums: List[str] = list(rooms)
+		self.rooms: List[Room] = list(rooms.values())
+		self.indices: Mapping[str, int] = {vnum: i for i, vnum in enumerate(self.vnums)}
+		self.terrains: List[str] = [roomObj.terrain for roomObj in self.rooms]
+		self.nightCosts: MutableSequence[float] = array(
+			"d",
+			(
+				(DARK_NIGHT_COST if roomObj.light == "dark" else 0.0)
+				+ (EVIL_NIGHT_COST if roomObj.align == "evil" else 0.0)
+				for roomObj in self.rooms
+			),
+		)
+		self.coordinates: List[Tuple[int, int, int]] = [
+			(roomObj.x, roomObj.y, roomObj.z) for roomObj in self.rooms
+		]
+		self.offsets: MutableSequence[int] = array("l", [0])
+		self.sources: MutableSequence[int] = array("l")
+		self.targets: MutableSequence[int] = array("l")
+		self.costs: MutableSequence[float] = array("d")
+		self.flags: MutableSequence[int] = array("H")
+		self.directions: MutableSequence[int] = array("B")
+		self.doors: List[str] = []
+		indices = self.indices
+		directionIndices = {direction: i for i, direction in enumerate(DIRECTIONS)}
+		for source, roomObj in enumerate(self.rooms):
+			for direction, exitObj in roomObj.exits.items():
+				target = indices.get(exitObj.to)
+				if target is None or direction not in directionIndices:
+					continue
+				flags = 0
+				for flag in exitObj.exitFlags:
+					flags |= EXIT_FLAG_BITS.get(flag, 0)
+				cost = self.rooms[target].cost
+				if flags & DOOR_OR_CLIMB:
+					cost += 5.0
+				if flags & AVOID:
+					cost += 1000.0
+				self.sources.append(source)
+				self.targets.append(target)
+				self.costs.append(cost)
+				self.flags.append(flags)
+				self.directions.append(directionIndices[direction])
+				self.doors.append(exitObj.door)
+			self.offsets.append(len(self.targets))
+		self.edges: Sequence[int] = range(len(self.targets))
+		# Group the edges by target, so that the graph can also be searched backwards.
+		counts = [0] * len(self.vnums)
+		for target in self.targets:
+			counts[target] += 1
+		self.reverseOffsets: MutableSequence[int] = array("l", [0])
+		self.reverseOffsets.extend(itertools.accumulate(counts))
+		self.reverseEdges: MutableSequence[int] = array("l", sorted(self.edges, key=self.targets.__getitem__))
+		# The edge costs of the most recently used sets of avoided terrains and times of day,
+		# least recently used first.
+		self._edgeCosts: OrderedDict[Tuple[FrozenSet[str], str], Sequence[float]] = OrderedDict()
+		# The graph may be searched by several threads at once, such as the sessions of a map server.
+		self._edgeCostsLock: threading.Lock = threading.Lock()
+
+	def __len__(self) -> int:
+		return len(self.vnums)
+
+	def __getstate__(self) -> Dict[str, Any]:
+		# The room objects are left out, so that the graph can be sent to worker processes cheaply.
+		state = self.__dict__.copy()
+		state["rooms"] = []
+		state["_edgeCosts"] = OrderedDict()
+		del state["_edgeCostsLock"]
+		return state
+
+	def __setstate__(self, state: Dict[str, Any]) -> None:
+		self.__dict__.update(state)
+		self._edgeCostsLock = threading.Lock()
+
+	def edgeCosts(self, avoidTerrains: FrozenSet[str], period: str = "DAY") -> Sequence[float]:
+		"""
+		Calculates the cost of each edge when avoiding certain terrains, at a time of day.
+
+		The costs of the last `EDGE_COST_PROFILES` combinations of terrains and times of day are kept,
+		so that switching between a few sets of path finding flags, or between day and night,
+		does not calculate the costs again.
+		The returned costs are shared, and must not be modified.
+
+		Args:
+			avoidTerrains: Terrains which add an extra cost to each edge leading into them.
+			period: The time of day, as a key of `PERIOD_WEIGHTS`, which scales the night cost of each room.
+
+		Returns:
+			The cost of each edge, in the same order as `costs`.
+		"""
+		weight = PERIOD_WEIGHTS[period]
+		if not avoidTerrains and not weight:
+			return self.costs
+		key = (avoidTerrains, period)
+		cache = self._edgeCosts
+		with self._edgeCostsLock:
+			costs = cache.get(key)
+			if costs is not None:
+				cache.move_to_end(key)
+				return costs
+			extra = [
+				(10.0 if terrain in avoidTerrains else 0.0) + weight * nightCost
+				for terrain, nightCost in zip(self.terrains, self.nightCosts)
+			]
+			costs = array("d", (cost + extra[target] for cost, target in zip(self.costs, self.targets)))
+			cache[key] = costs
+			if len(cache) > EDGE_COST_PROFILES:
+				cache.popitem(last=False)
+			return costs
+
+
+class Components(object):
+	"""
+	The strongly connected components of a `Graph`, and which components can be reached from each other.
+
+	Every room in a component can be reached from every other room in the same component.
+	Components are found with Tarjan's algorithm, which finds a component only after every component
+	that can be reached from it, so the reachable components can be combined in a single pass.
+
+	Attributes:
+		graph: The graph.
+		component: The component of each room, by room index.
+		members: The indices of the rooms in each component.
+		reachable: For each component, a bit mask of the components which can be reached from it,
+			including itself.
+	"""
+
+	def __init__(self, graph: Graph) -> None:
+		self.graph: Graph = graph
+		self.component: MutableSequence[int] = array("l", [-1]) * len(graph)
+		self.members: List[List[int]] = []
+		self.reachable: List[int] = []
+		offsets = graph.offsets
+		targets = graph.targets
+		order = [-1] * len(graph)
+		lowest = [0] * len(graph)
+		onStack = bytearray(len(graph))
+		stack: List[int] = []
+		counter = 0
+		for root in range(len(graph)):
+			if order[root] != -1:
+				continue
+			order[root] = lowest[root] = counter
+			counter += 1
+			stack.append(root)
+			onStack[root] = 1
+			# The depth first search is iterative, since the map is too deep for recursion.
+			work = [(root, offsets[root])]
+			while work:
+				room, edge = work[-1]
+				end = offsets[room + 1]
+				while edge < end:
+					target = targets[edge]
+					edge += 1
+					if order[target] == -1:
+						work[-1] = (room, edge)
+						order[target] = lowest[target] = counter
+						counter += 1
+						stack.append(target)
+						onStack[target] = 1
+						work.append((target, offsets[target]))
+						break
+					elif onStack[target] and order[target] < lowest[room]:
+						lowest[room] = order[target]
+				else:
+					work.pop()
+					if work and lowest[room] < lowest[work[-1][0]]:
+						lowest[work[-1][0]] = lowest[room]
+					if lowest[room] == order[room]:
+						self._addComponent(room, stack, onStack)
+
+	def _addComponent(self, root: int, stack: List[int], onStack: bytearray) -> None:
+		# Pops the rooms of a component off the stack, and combines the reachable components of its exits.
+		number = len(self.members)
+		rooms = []
+		while True:
+			room = stack.pop()
+			onStack[room] = 0
+			self.component[room] = number
+			rooms.append(room)
+			if room == root:
+				break
+		mask = 1 << number
+		offsets = self.graph.offsets
+		targets = self.graph.targets
+		component = self.component
+		reachable = self.reachable
+		for room in rooms:
+			for edge in range(offsets[room], offsets[room + 1]):
+				other = component[targets[edge]]
+				if other != number:
+					mask |= reachable[other]
+		self.members.append(rooms)
+		reachable.append(mask)
+
+	def __len__(self) -> int:
+		return len(self.members)
+
+	def isReachable(self, origin: int, destination: int) -> bool:
+		"""
+		Determines whether a room can be reached from another.
+
+		Args:
+			origin: The index of the origin room.
+			destination: The index of the destination room.
+
+		Returns:
+			True if there is a path from the origin to the destination, False otherwise.
+		"""
+		return bool(self.reachable[self.component[origin]] >> self.component[destination] & 1)
+
+	def traps(self) -> List[int]:
+		"""
+		Finds the one-way traps of the graph.
+
+		Returns:
+			The components which can be entered from another component, but have no exits leading out of them.
+		"""
+		entered = set()
+		graph = self.graph
+		component = self.component
+		for source, target in zip(graph.sources, graph.targets):
+			if component[source] != component[target]:
+				entered.add(component[target])
+		return [number for number in sorted(entered) if self.reachable[number] == 1 << number]
+
+	def orphans(self) -> List[int]:
+		"""
+		Finds the orphaned rooms of the graph.
+
+		Returns:
+			The indices of the rooms which have no exits leading into or out of them.
+		"""
+		graph = self.graph
+		return [
+			room
+			for room in range(len(graph))
+			if graph.offsets[room] == graph.offsets[room + 1]
+			and graph.reverseOffsets[room] == graph.reverseOffsets[room + 1]
+		]
+
+
+class ShortestPathTree(object):
+	"""
+	Dijkstra's algorithm over a `Graph`, rooted at an origin room.
+
+	The search can be advanced in steps; the state of the search is kept between calls to `settle`.
+	A reverse tree follows the edges backwards, finding the lowest cost of moving from each room *to* the origin,
+	so that a route to a fixed destination can be continued from any room the player ends up in.
+
+	Attributes:
+		graph: The graph being searched.
+		origin: The index of the origin room.
+		reverse: True if the tree follows the edges backwards.
+		costs: The cost of each edge in the graph.
+		distances: The lowest known cost of moving between the origin and each room.
+		parents: The index of the edge joining each room to the tree along the lowest cost path, or -1.
+		settled: A flag for each room, set once the distance of the room is final.
+		blocked: The indices of the edges which were blocked with `blockEdge`.
+	"""
+
+	def __init__(
+		self, graph: Graph, origin: int, costs: Union[Sequence[float], None] = None, reverse: bool = False
+	) -> None:
+		self.graph: Graph = graph
+		self.origin: int = origin
+		self.reverse: bool = reverse
+		self.costs: Sequence[float] = graph.costs if costs is None else costs
+		self.distances: List[float] = [INFINITY] * len(graph)
+		self.distances[origin] = 0.0
+		self.parents: List[int] = [-1] * len(graph)
+		self.settled: bytearray = bytearray(len(graph))
+		self.blocked: Set[int] = set()
+		# Using a binary heap for storing unvisited rooms significantly increases performance.
+		# https://en.wikipedia.org/wiki/Binary_heap
+		self._heap: List[Tuple[float, int]] = [(0.0, origin)]
+
+	def _adjacency(self, reverse: bool) -> Tuple[Sequence[int], Sequence[int], Sequence[int]]:
+		# Returns the offsets and edges of each room, and the rooms the edges lead to, in the given direction.
+		graph = self.graph
+		if reverse:
+			return graph.reverseOffsets, graph.reverseEdges, graph.sources
+		return graph.offsets, graph.edges, graph.targets
+
+	def settle(
+		self,
+		goals: Union[AbstractSet[int], None] = None,
+		cancelled: Union[threading.Event, None] = None,
+		budget: float = INFINITY,
+	) -> Union[int, None]:
+		"""
+		Advances the search until one of the goals is settled.
+
+		Args:
+			goals: The indices of the rooms to search for, or None to search the whole graph.
+			cancelled: An event which stops the search when set, for example by another thread.
+			budget: The search stops before settling any room which costs more than this to reach.
+
+		Returns:
+			The index of the first goal to be settled, or None if no goal could be reached
+			or the search was cancelled.
+		"""
+		heap = self._heap
+		distances = self.distances
+		parents = self.parents
+		settled = self.settled
+		offsets, edges, neighbors = self._adjacency(self.reverse)
+		costs = self.costs
+		heappop = heapq.heappop
+		heappush = heapq.heappush
+		isCancelled = cancelled.is_set if cancelled is not None else None
+		while heap:
+			if isCancelled is not None and isCancelled():
+				return None
+			elif heap[0][0] > budget:
+				return None
+			cost, room = heappop(heap)
+			if settled[room] or cost != distances[room]:
+				# A cheaper path to this room was already processed, or the entry is out of date.
+				continue
+			settled[room] = 1
+			for edge in edges[offsets[room] : offsets[room + 1]]:
+				neighbor = neighbors[edge]
+				neighborCost = cost + costs[edge]
+				if neighborCost < distances[neighbor]:
+					distances[neighbor] = neighborCost
+					parents[neighbor] = edge
+					heappush(heap, (neighborCost, neighbor))
+			# The neighbors of the goal are processed before returning, so that the search can be resumed.
+			if goals is not None and room in goals:
+				return room
+		return None
+
+	def within(self, budget: float) -> List[int]:
+		"""
+		Finds the rooms which can be reached within a cost budget, searching further if needed.
+
+		Args:
+			budget: The highest cost of moving from the origin.
+
+		Returns:
+			The indices of the rooms, in no particular order.
+		"""
+		self.settle(budget=budget)
+		distances = self.distances
+		return [room for room, isSettled in enumerate(self.settled) if isSettled and distances[room] <= budget]
+
+	def nearest(
+		self, goals: AbstractSet[int], cancelled: Union[threading.Event, None] = None
+	) -> Union[int, None]:
+		"""
+		Finds the goal with the lowest cost from the origin, reusing the rooms settled by previous searches.
+
+		Args:
+			goals: The indices of the rooms to search for.
+			cancelled: An event which stops the search when set.
+
+		Returns:
+			The index of the nearest goal, or None if no goal could be reached.
+		"""
+		settled = self.settled
+		distances = self.distances
+		found = [goal for goal in goals if settled[goal]]
+		if found:
+			# Rooms are settled in order of cost, so no unsettled room can be nearer than a settled one.
+			return min(found, key=distances.__getitem__)
+		return self.settle(goals, cancelled)
+
+	def blockEdge(self, edge: int) -> None:
+		"""
+		Prevents the search from using an edge, repairing the part of the tree which depended on it.
+
+		Only the rooms whose lowest cost path used the edge are searched again.
+
+		Args:
+			edge: The index of the edge to block.
+		"""
+		if edge in self.blocked:
+			return None
+		if not self.blocked:
+			# The costs may be shared with other searches, so they are copied before being modified.
+			self.costs = array("d", self.costs)
+		self.blocked.add(edge)
+		self.costs[edge] = INFINITY  # type: ignore[index]
+		child = self.graph.sources[edge] if self.reverse else self.graph.targets[edge]
+		if self.parents[child] != edge:
+			return None
+		distances = self.distances
+		parents = self.parents
+		settled = self.settled
+		# Collect the subtree below the edge by following the edges of the tree away from the origin.
+		offsets, edges, neighbors = self._adjacency(self.reverse)
+		subtree = {child}
+		stack = [child]
+		while stack:
+			room = stack.pop()
+			for treeEdge in edges[offsets[room] : offsets[room + 1]]:
+				neighbor = neighbors[treeEdge]
+				if parents[neighbor] == treeEdge and neighbor not in subtree:
+					subtree.add(neighbor)
+					stack.append(neighbor)
+		for room in subtree:
+			distances[room] = INFINITY
+			parents[room] = -1
+			settled[room] = 0
+		# Reconnect the subtree to the rest of the tree, through the edges leading towards the origin.
+		offsets, edges, neighbors = self._adjacency(not self.reverse)
+		costs = self.costs
+		heap = self._heap
+		for room in subtree:
+			for towardsEdge in edges[offsets[room] : offsets[room + 1]]:
+				neighbor = neighbors[towardsEdge]
+				if neighbor in subtree:
+					continue
+				cost = distances[neighbor] + costs[towardsEdge]
+				if cost < distances[room]:
+					distances[room] = cost
+					parents[room] = towardsEdge
+		for room in subtree:
+			if distances[room] < INFINITY:
+				heapq.heappush(heap, (distances[room], room))
+		return None
+
+	def edgePath(self, room: int) -> List[int]:
+		"""
+		Retrieves the edges along the lowest cost path between the origin and a room.
+
+		Args:
+			room: The index of a settled room.
+
+		Returns:
+			The indices of the edges, in the order that they should be walked.
+			A forward tree is walked from the origin to the room, and a reverse tree from the room to the origin.
+		"""
+		edges = []
+		graph = self.graph
+		parents = self.parents
+		while room != self.origin:
+			edge = parents[room]
+			edges.append(edge)
+			room = graph.targets[edge] if self.reverse else graph.sources[edge]
+		if not self.reverse:
+			edges.reverse()
+		return edges
@@ -138,17 +138,6 @@ class Room(object):
 		self.z = 0
 		self.exits = {}
 
-	def __lt__(self, other):
-		# Unlike in Python 2 where most objects are sortable by default, our
-		# Room class isn't automatically sortable in Python 3.
-		# If we don't override this method, the path finder will throw an
-		# exception in Python 3 because heapq.heappush requires that any object
-		# passed to it be sortable.
-		# We'll return False because we want heapq.heappush to sort the tuples
-		# of movement cost and room object by the first item in the tuple (room cost),
-		# and the order of rooms with the same movement cost is irrelevant.
-		return False
-
 	def calculateCost(self):
 		try:
 			self.cost = TERRAIN_COSTS[self.terrain]
@@ -191,3 +180,13 @@ class Exit(object):
 		self.exitFlags = set(["exit"])
 		self.door = ""
 		self.doorFlags = set()
+
+	@property
+	def to(self):
+		return self._to
+
+	@to.setter
+	def to(self, value):
+		# The room object the exit leads to is resolved again by World.exitTarget when it is next used.
+		self._to = value
+		self.target = None
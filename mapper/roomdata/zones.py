@@ -0,0 +1,293 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+
+# Future Modules:
+from __future__ import annotations
+
+# Built-in Modules:
+import heapq
+import threading
+from typing import Dict, Iterable, List, Mapping, Set, Tuple, Union
+
+# Local Modules:
+from .graph import INFINITY, Graph, ShortestPathTree
+from .objects import Room
+
+
+SPARSE_RATIO: int = 4
+ZONE_SIZE: int = 20
+Zone = Tuple[int, int, int]
+
+
+def zoneDistances(
+	graph: Graph, zoneOf: List[Zone], origin: int, goal: Union[int, None] = None
+) -> Tuple[Dict[int, float], Dict[int, int]]:
+	"""
+	Dijkstra's algorithm over the rooms in the same zone as an origin room, using the base edge costs.
+
+	Args:
+		graph: The graph to search.
+		zoneOf: The zone of each room in the graph, by room index.
+		origin: The index of the origin room.
+		goal: The index of a room to stop at, or None to search the whole zone.
+
+	Returns:
+		The lowest cost of moving from the origin to each settled room in the zone,
+		and the index of the edge used to enter each of those rooms.
+	"""
+	zone = zoneOf[origin]
+	offsets = graph.offsets
+	targets = graph.targets
+	costs = graph.costs
+	distances: Dict[int, float] = {origin: 0.0}
+	parents: Dict[int, int] = {}
+	settled: Set[int] = set()
+	heap = [(0.0, origin)]
+	while heap:
+		cost, room = heapq.heappop(heap)
+		if room in settled:
+			continue
+		settled.add(room)
+		if room == goal:
+			break
+		for edge in range(offsets[room], offsets[room + 1]):
+			neighbor = targets[edge]
+			if zoneOf[neighbor] != zone:
+				continue
+			neighborCost = cost + costs[edge]
+			if neighborCost < distances.get(neighbor, INFINITY):
+				distances[neighbor] = neighborCost
+				parents[neighbor] = edge
+				heapq.heappush(heap, (neighborCost, neighbor))
+	return {room: distances[room] for room in settled}, parents
+
+
+class ZoneLayout(object):
+	"""
+	The zones of the rooms in a graph, and the exits which lead between zones.
+
+	Attributes:
+		graph: The graph the layout was built from.
+		zoneOf: The zone of each room, by room index.
+		zoneExits: The indices of the rooms in each zone that have an exit leading to another zone.
+		crossings: The edges leading out of each of those rooms into another zone.
+		exitRows: The costs of crossing the zone of a room to each exit of the zone, by room index.
+		isSparse: True if there are few enough exits between zones for searching through the zones to be faster
+			than searching every room.
+	"""
+
+	def __init__(self, graph: Graph, size: int) -> None:
+		self.graph: Graph = graph
+		self.zoneOf: List[Zone] = [(x // size, y // size, z) for x, y, z in graph.coordinates]
+		self.zoneExits: Dict[Zone, List[int]] = {}
+		self.crossings: Dict[int, List[int]] = {}
+		self.exitRows: Dict[int, List[Tuple[int, float]]] = {}
+		zoneOf = self.zoneOf
+		targets = graph.targets
+		for room, zone in enumerate(zoneOf):
+			crossings = [
+				edge
+				for edge in range(graph.offsets[room], graph.offsets[room + 1])
+				if zoneOf[targets[edge]] != zone
+			]
+			if crossings:
+				self.crossings[room] = crossings
+				self.zoneExits.setdefault(zone, []).append(room)
+		# Every room where a path enters a zone is linked to every exit of the zone.
+		abstractEdges = sum(len(exits) ** 2 for exits in self.zoneExits.values())
+		self.isSparse: bool = abstractEdges * SPARSE_RATIO < len(targets)
+
+
+class Zones(object):
+	"""
+	Hierarchical path finding over zones of the map.
+
+	The map is divided into zones by the coordinates of the rooms.
+	The costs of moving through each zone are calculated when first needed, and kept until a room in the zone
+	is modified, so that long routes only need to search the rooms along the zone boundaries.
+	The results are the same as a search over every room, using the base edge costs.
+	"""
+
+	def __init__(self, size: int = ZONE_SIZE) -> None:
+		self.size: int = size
+		self._lock: threading.Lock = threading.Lock()
+		self._layout: Union[ZoneLayout, None] = None
+		self._roomZones: Dict[str, Zone] = {}
+		# The costs from a room to the other rooms of its zone, by vnum.
+		self._rows: Dict[str, Tuple[Zone, Dict[str, float]]] = {}
+		self._zoneRows: Dict[Zone, Set[str]] = {}
+		# The map version at which each zone, or the whole map, was last invalidated.
+		self._invalidated: Dict[Zone, int] = {}
+		self._allInvalidated: int = 0
+
+	def zoneOf(self, roomObj: Room) -> Zone:
+		return (roomObj.x // self.size, roomObj.y // self.size, roomObj.z)
+
+	def invalidate(self, version: int, vnums: Iterable[str], rooms: Mapping[str, Room]) -> None:
+		"""
+		Discards the cached costs of zones containing modified rooms.
+
+		Args:
+			version: The map version after the modification.
+			vnums: The vnums of the modified rooms, or an empty iterable if any room may have been modified.
+			rooms: The rooms of the map.
+		"""
+		vnums = list(vnums)
+		with self._lock:
+			if not vnums:
+				self._rows.clear()
+				self._zoneRows.clear()
+				self._invalidated.clear()
+				self._allInvalidated = version
+				return None
+			zones = set()
+			for vnum in vnums:
+				if vnum in self._roomZones:
+					# The zone the room was in when the costs were calculated.
+					zones.add(self._roomZones[vnum])
+				if vnum in rooms:
+					zones.add(self.zoneOf(rooms[vnum]))
+			for zone in zones:
+				self._invalidated[zone] = version
+				for vnum in self._zoneRows.pop(zone, ()):
+					del self._rows[vnum]
+
+	def layout(self, graph: Graph) -> ZoneLayout:
+		"""Returns the zone layout of a graph, building it if the graph changed."""
+		with self._lock:
+			layout = self._layout
+		if layout is None or layout.graph is not graph:
+			layout = ZoneLayout(graph, self.size)
+			with self._lock:
+				if self._layout is None or self._layout.graph.version <= graph.version:
+					self._layout = layout
+					self._roomZones = dict(zip(graph.vnums, layout.zoneOf))
+		return layout
+
+	def _row(self, layout: ZoneLayout, room: int) -> Dict[str, float]:
+		# Returns the costs from a room to the other rooms in its zone, by vnum.
+		graph = layout.graph
+		vnum = graph.vnums[room]
+		zone = layout.zoneOf[room]
+		with self._lock:
+			cached = self._rows.get(vnum)
+		if cached is not None and cached[0] == zone:
+			return cached[1]
+		distances = zoneDistances(graph, layout.zoneOf, room)[0]
+		vnums = graph.vnums
+		row = {vnums[target]: cost for target, cost in distances.items()}
+		with self._lock:
+			if graph.version >= max(self._invalidated.get(zone, 0), self._allInvalidated):
+				# The zone has not been modified since the graph was built.
+				self._rows[vnum] = (zone, row)
+				self._zoneRows.setdefault(zone, set()).add(vnum)
+		return row
+
+	def _exitRow(self, layout: ZoneLayout, room: int) -> List[Tuple[int, float]]:
+		# Returns the costs from a room to the exits of its zone, by room index.
+		exitRow = layout.exitRows.get(room)
+		if exitRow is None:
+			row = self._row(layout, room)
+			vnums = layout.graph.vnums
+			exitRow = [
+				(exitRoom, row[vnums[exitRoom]])
+				for exitRoom in layout.zoneExits.get(layout.zoneOf[room], ())
+				if exitRoom != room and vnums[exitRoom] in row
+			]
+			layout.exitRows[room] = exitRow
+		return exitRow
+
+	def findPath(
+		self, graph: Graph, origin: int, destination: int, cancelled: Union[threading.Event, None] = None
+	) -> Union[List[int], None]:
+		"""
+		Finds the lowest cost path between two rooms.
+
+		If the zones are too densely linked for the search through them to be faster,
+		every room is searched instead.
+
+		Args:
+			graph: The graph to search.
+			origin: The index of the origin room.
+			destination: The index of the destination room.
+			cancelled: An event which stops the search when set.
+
+		Returns:
+			The indices of the edges along the path, in the order that they should be walked,
+			or None if the destination could not be reached or the search was cancelled.
+		"""
+		layout = self.layout(graph)
+		if not layout.isSparse:
+			tree = ShortestPathTree(graph, origin)
+			if tree.settle(frozenset([destination]), cancelled) is None:
+				return None
+			return tree.edgePath(destination)
+		zoneOf = layout.zoneOf
+		crossings = layout.crossings
+		targets = graph.targets
+		costs = graph.costs
+		destinationVnum = graph.vnums[destination]
+		destinationZone = zoneOf[destination]
+		heappop = heapq.heappop
+		heappush = heapq.heappush
+		# Each abstract node is entered either through an edge between zones (a non-negative edge index),
+		# or by crossing its zone from another node (the bitwise complement of that node's index).
+		distances: Dict[int, float] = {origin: 0.0}
+		parents: Dict[int, int] = {}
+		settled: Set[int] = set()
+		heap = [(0.0, origin)]
+		while heap:
+			if cancelled is not None and cancelled.is_set():
+				return None
+			cost, node = heappop(heap)
+			if node in settled:
+				continue
+			settled.add(node)
+			if node == destination:
+				return self._refine(layout, origin, destination, parents)
+			if node == origin or parents[node] >= 0:
+				# The node is where the path enters its zone, so cross the zone to each of its exits.
+				for exitRoom, exitCost in self._exitRow(layout, node):
+					neighborCost = cost + exitCost
+					if neighborCost < distances.get(exitRoom, INFINITY):
+						distances[exitRoom] = neighborCost
+						parents[exitRoom] = ~node
+						heappush(heap, (neighborCost, exitRoom))
+				if zoneOf[node] == destinationZone:
+					row = self._row(layout, node)
+					neighborCost = cost + row.get(destinationVnum, INFINITY)
+					if neighborCost < distances.get(destination, INFINITY):
+						distances[destination] = neighborCost
+						parents[destination] = ~node
+						heappush(heap, (neighborCost, destination))
+			for edge in crossings.get(node, ()):
+				neighbor = targets[edge]
+				neighborCost = cost + costs[edge]
+				if neighborCost < distances.get(neighbor, INFINITY):
+					distances[neighbor] = neighborCost
+					parents[neighbor] = edge
+					heappush(heap, (neighborCost, neighbor))
+		return None
+
+	def _refine(self, layout: ZoneLayout, origin: int, destination: int, parents: Dict[int, int]) -> List[int]:
+		# Converts a path through the zones into the edges between rooms,
+		# by searching again inside each zone that the path crosses.
+		graph = layout.graph
+		edges: List[int] = []
+		node = destination
+		while node != origin:
+			parent = parents[node]
+			if parent >= 0:
+				edges.append(parent)
+				node = graph.sources[parent]
+			else:
+				start = ~parent
+				zoneParents = zoneDistances(graph, layout.zoneOf, start, node)[1]
+				while node != start:
+					edge = zoneParents[node]
+					edges.append(edge)
+					node = graph.sources[edge]
+		edges.reverse()
+		return edges
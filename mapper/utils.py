@@ -27,6 +27,12 @@ ESCAPE_XML_BYTES_ENTITIES = tuple(
 	(first.encode("us-ascii"), second.encode("us-ascii")) for first, second in ESCAPE_XML_STR_ENTITIES
 )
 UNESCAPE_XML_BYTES_ENTITIES = tuple((second, first) for first, second in ESCAPE_XML_BYTES_ENTITIES)
+UNESCAPE_XML_STR_REGEX = re.compile("|".join(re.escape(entity) for entity, char in UNESCAPE_XML_STR_ENTITIES))
+UNESCAPE_XML_BYTES_REGEX = re.compile(
+	b"|".join(re.escape(entity) for entity, char in UNESCAPE_XML_BYTES_ENTITIES)
+)
+_UNESCAPE_XML_STR_LOOKUP = dict(UNESCAPE_XML_STR_ENTITIES)
+_UNESCAPE_XML_BYTES_LOOKUP = dict(UNESCAPE_XML_BYTES_ENTITIES)
 
 
 def iterBytes(data):
@@ -201,8 +207,23 @@ def escapeXML(data, isbytes=False):
 	return multiReplace(data, ESCAPE_XML_BYTES_ENTITIES if isbytes else ESCAPE_XML_STR_ENTITIES)
 
 
+def _unescapeXMLStrEntity(match):
+	return _UNESCAPE_XML_STR_LOOKUP[match.group()]
+
+
+def _unescapeXMLBytesEntity(match):
+	return _UNESCAPE_XML_BYTES_LOOKUP[match.group()]
+
+
 def unescapeXML(data, isbytes=False):
-	return multiReplace(data, UNESCAPE_XML_BYTES_ENTITIES if isbytes else UNESCAPE_XML_STR_ENTITIES)
+	# The entities are replaced in a single pass, so that an escaped entity such as '&amp;lt;' becomes '&lt;'.
+	if isbytes:
+		if b"&" not in data:
+			return data
+		return UNESCAPE_XML_BYTES_REGEX.sub(_unescapeXMLBytesEntity, data)
+	elif "&" not in data:
+		return data
+	return UNESCAPE_XML_STR_REGEX.sub(_unescapeXMLStrEntity, data)
 
 
 def decodeBytes(data):
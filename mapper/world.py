@@ -8,17 +8,21 @@ from __future__ import annotations
 
 # Built-in Modules:
 import gc
-import heapq
 import itertools
 import operator
 import re
-from queue import SimpleQueue
+import threading
+import zlib
+from binascii import Error as BinasciiError
+from collections import OrderedDict, deque
+from timeit import default_timer
 
 # Third-party Modules:
 from fuzzywuzzy import fuzz
 
 # Local Modules:
 from . import roomdata
+from .queues import GUIQueue
 from .utils import regexFuzzy
 
 
@@ -33,6 +37,11 @@ DIRECTION_COORDINATES = {
 }
 LEAD_BEFORE_ENTERING_VNUMS = ["196", "3473", "3474", "12138", "12637"]
 LIGHT_SYMBOLS = {"@": "lit", "*": "lit", "!": "undefined", ")": "lit", "o": "dark"}
+MAPSTATS_EXAMPLES = 10
+NEAREST_SEARCH_REGEX = re.compile(r"(\w+):\s*(.*?)(?=\s+\w+:|$)")
+PATH_FLAGS = frozenset(f"no{terrain}" for terrain in roomdata.objects.TERRAIN_COSTS)
+PREFETCH_ROUTES = 5
+REACH_REGEX = re.compile(r"^(?P<budget>\d+(?:\.\d+)?)(?:\s+(?P<flags>\S+))?$")
 REVERSE_DIRECTIONS = {
 	"north": "south",
 	"south": "north",
@@ -60,24 +69,121 @@ TERRAIN_SYMBOLS = {
 	"U": "underwater",
 	"~": "water",
 }
+ZONE_SEARCH_DISTANCE = 2 * roomdata.zones.ZONE_SIZE
+
+
+class PathSearch(object):
+	"""
+	A path query which is ready to be run, possibly on another thread.
+
+	The search only uses the tree and graph it was given, so the map can keep changing while it runs.
+	"""
+
+	def __init__(self, cache, key, tree, goals):
+		self.cache = cache
+		self.key = key
+		self.tree = tree
+		self.goals = goals
+		self.goal = None
+		self.cancelled = threading.Event()
+
+	@property
+	def graph(self):
+		return self.tree.graph
+
+	@property
+	def isNearest(self):
+		# Forward searches are used for finding the nearest of several destinations.
+		return not self.tree.reverse
+
+	@property
+	def origin(self):
+		"""The index of the room which the path starts from."""
+		return next(iter(self.goals)) if self.tree.reverse else self.tree.origin
+
+	@property
+	def destination(self):
+		"""The index of the destination room, once the search has found a path."""
+		return self.tree.origin if self.tree.reverse else self.goal
+
+	def run(self):
+		self.goal = self.tree.nearest(self.goals, self.cancelled)
+		return self
+
+	def edgePath(self):
+		return self.tree.edgePath(self.goal)
+
+
+class ZoneSearch(PathSearch):
+	"""A search for a long path, which crosses the zones of the map rather than searching every room."""
+
+	def __init__(self, zones, key, graph, origin, destination):
+		super().__init__(None, key, None, frozenset([destination]))
+		self.zones = zones
+		self._graph = graph
+		self._origin = origin
+		self._destination = destination
+		self.edges = None
+
+	@property
+	def graph(self):
+		return self._graph
+
+	@property
+	def isNearest(self):
+		return False
+
+	@property
+	def origin(self):
+		return self._origin
+
+	@property
+	def destination(self):
+		return self._destination
+
+	def run(self):
+		self.edges = self.zones.findPath(self._graph, self._origin, self._destination, self.cancelled)
+		self.goal = None if self.edges is None else self._destination
+		return self
+
+	def edgePath(self):
+		return self.edges
 
 
 class World(object):
-	def __init__(self, interface="text"):
+	def __init__(self, interface="text", rooms=None):
 		self.isSynced = False
-		self.rooms = {}
+		self.rooms = {} if rooms is None else rooms
 		self.labels = {}
+		self.mapVersion = 0
+		self._graph = None
+		self._components = None
+		# Guards the data which is derived from the map when first used,
+		# since a map server shares it between the threads of its sessions.
+		self._derivedLock = threading.RLock()
+		self._nearestTree = None
+		self._routeTree = None
+		self._zones = roomdata.zones.Zones()
+		self._labelDistances = None
+		self._isLabelDistancesLoaded = False
+		self._pairCosts = (None, {})
+		self._prefetchedRoutes = OrderedDict()
+		self._routeUsage = None
+		self._isRouteUsageChanged = False
+		self.recentRoutes = deque(maxlen=PREFETCH_ROUTES)
+		self.lastRoute = None
 		self._interface = interface
 		if interface != "text":
-			self._gui_queue = SimpleQueue()
+			self._gui_queue = GUIQueue()
 			if interface == "hc":
 				from .gui.hc import Window
 			elif interface == "sighted":
 				from .gui.sighted import Window
 			self.window = Window(self)
 		self._currentRoom = None
-		self.loadRooms()
-		self.loadLabels()
+		if rooms is None:
+			self.loadRooms()
+			self.loadLabels()
 
 	@property
 	def currentRoom(self):
@@ -93,6 +199,41 @@ class World(object):
 	def currentRoom(self):
 		del self._currentRoom
 
+	@property
+	def graph(self):
+		"""The path finding graph, rebuilt if the map was modified since it was last used."""
+		with self._derivedLock:
+			if self._graph is None or self._graph.version != self.mapVersion:
+				self._graph = roomdata.graph.Graph(self.rooms, self.mapVersion)
+			return self._graph
+
+	@property
+	def components(self):
+		"""
+		The strongly connected components of the path finding graph.
+		The components are only found again if the exits between rooms changed.
+		"""
+		with self._derivedLock:
+			graph = self.graph
+			if self._components is None or self._components[0] is not graph:
+				previous = self._components[1] if self._components is not None else None
+				if (
+					previous is None
+					or previous.graph.offsets != graph.offsets
+					or previous.graph.targets != graph.targets
+				):
+					previous = roomdata.graph.Components(graph)
+				self._components = (graph, previous)
+			return self._components[1]
+
+	def mapChanged(self, *vnums):
+		"""
+		Signals that rooms or exits were modified, so that data derived from the map will be rebuilt.
+		If the vnums of the modified rooms are given, data which does not depend on them is kept.
+		"""
+		self.mapVersion += 1
+		self._zones.invalidate(self.mapVersion, vnums, self.rooms)
+
 	def GUIRefresh(self):
 		"""Trigger the clearing and redrawing of rooms by the GUI"""
 		if self._interface != "text":
@@ -163,9 +304,11 @@ class World(object):
 			self.rooms[vnum] = newRoom
 			roomDict.clear()
 			del roomDict
+		self.resolveExits()
 		self.currentRoom = self.rooms["0"]
 		self.emulationRoom = self.rooms["0"]
 		self.lastEmulatedJump = None
+		self.mapChanged()
 		if not gc.isenabled():
 			gc.enable()
 			gc.collect()
@@ -221,6 +364,124 @@ class World(object):
 	def saveLabels(self):
 		roomdata.database.dumpLabels(self.labels)
 
+	def loadLabelDistances(self):
+		self._isLabelDistancesLoaded = True
+		errors, data = roomdata.database.loadLabelDistances()
+		if data is None:
+			return None
+		try:
+			self._labelDistances = roomdata.distances.LabelDistances.fromJSON(data, version=-1)
+		except (BinasciiError, KeyError, TypeError, ValueError, zlib.error):
+			self.output("Error: the label distances file is corrupted. Use 'labeltable refresh' to recreate it.")
+
+	def saveLabelDistances(self):
+		if self._labelDistances is not None:
+			roomdata.database.dumpLabelDistances(self._labelDistances.toJSON())
+
+	@property
+	def labelDistances(self):
+		"""
+		The table of costs between labelled rooms, or None if the map has changed since it was calculated.
+		The table is loaded from disk when first used.
+		"""
+		with self._derivedLock:
+			if not self._isLabelDistancesLoaded:
+				self.loadLabelDistances()
+			table = self._labelDistances
+			if table is None:
+				return None
+			elif table.version != self.mapVersion:
+				# Changes to the map which do not affect any path, such as notes, keep the table valid.
+				if table.fingerprint != roomdata.distances.graphFingerprint(self.graph):
+					return None
+				table.version = self.mapVersion
+			return table
+
+	def labelDistancesRefreshed(self, table, elapsed):
+		"""Stores a newly calculated table of costs between labelled rooms, and returns a message for the user."""
+		self._labelDistances = table
+		self._isLabelDistancesLoaded = True
+		self.saveLabelDistances()
+		return f"Calculated the costs between {len(table)} labelled rooms in {elapsed:.1f} seconds."
+
+	def refreshLabelDistances(self):
+		"""Calculates the costs between labelled rooms, only searching from new labels if the map is unchanged."""
+		if not self._isLabelDistancesLoaded:
+			self.loadLabelDistances()
+		start = default_timer()
+		table = roomdata.distances.buildLabelDistances(self.graph, self.labels.values(), self._labelDistances)
+		return self.labelDistancesRefreshed(table, default_timer() - start)
+
+	def labeltable(self, *args):
+		argString = args[0].strip().lower() if args and args[0] else ""
+		if argString == "refresh":
+			return self.refreshLabelDistances()
+		table = self.labelDistances
+		if not argString:
+			if table is None:
+				return "The label table is not up to date. Use 'labeltable refresh' to calculate it."
+			missing = frozenset(self.labels.values()).intersection(self.rooms).difference(table.indices)
+			result = f"The label table contains the costs between {len(table)} labelled rooms."
+			if missing:
+				result += f" {len(missing)} labelled rooms were added since; use 'labeltable refresh' to add them."
+			return result
+		labels = argString.split()
+		if len(labels) != 2:
+			return "Syntax: 'labeltable [refresh | origin destination]'."
+		elif table is None:
+			return "The label table is not up to date. Use 'labeltable refresh' to calculate it."
+		vnums = []
+		for label in labels:
+			roomObj, error = self.getRoomFromLabel(label)
+			if error:
+				return error
+			vnums.append(roomObj.vnum)
+		cost = table.distance(*vnums)
+		if cost is None:
+			return "Both rooms must be labelled, and in the label table."
+		elif cost == roomdata.graph.INFINITY:
+			return "No routes found."
+		graph = self.graph
+		hop = table.nextHops[vnums[1]][graph.indices[vnums[0]]]
+		if hop == roomdata.distances.NO_HOP:
+			return f"Cost from '{labels[0]}' to '{labels[1]}': {cost:g}."
+		direction = roomdata.graph.DIRECTIONS[graph.directions[graph.offsets[graph.indices[vnums[0]]] + hop]]
+		return f"Cost from '{labels[0]}' to '{labels[1]}': {cost:g}, starting {direction}."
+
+	def sync(self, name=None, desc=None, exits=None, vnum=None):
+		if vnum:
+			if vnum in self.labels:
+				vnum = self.labels[vnum]
+			if vnum in self.rooms:
+				self.currentRoom = self.rooms[vnum]
+				self.isSynced = True
+				self.output(f"Synced to room {self.currentRoom.name} with vnum {self.currentRoom.vnum}")
+			else:
+				self.output(f"No such vnum or label: {vnum}.")
+		else:
+			nameVnums = []
+			descVnums = []
+			for vnum, roomObj in self.rooms.items():
+				if roomObj.name == name:
+					nameVnums.append(vnum)
+				if desc and roomObj.desc == desc:
+					descVnums.append(vnum)
+			if not nameVnums:
+				self.output("Current room not in the database. Unable to sync.")
+			elif len(descVnums) == 1:
+				self.currentRoom = self.rooms[descVnums[0]]
+				self.isSynced = True
+				self.output(f"Synced to room {self.currentRoom.name} with vnum {self.currentRoom.vnum}")
+			elif len(nameVnums) == 1:
+				self.currentRoom = self.rooms[nameVnums[0]]
+				self.isSynced = True
+				self.output(
+					f"Name-only synced to room {self.currentRoom.name} with vnum {self.currentRoom.vnum}"
+				)
+			else:
+				self.output("More than one room in the database matches current room. Unable to sync.")
+		return self.isSynced
+
 	def getNewExit(self, direction, to="undefined", parent=None):
 		newExit = roomdata.objects.Exit()
 		newExit.direction = direction
@@ -236,15 +497,32 @@ class World(object):
 			),
 		)
 
+	def exitTarget(self, exitObj):
+		"""
+		Returns the room object an exit leads to, or None if it leads to 'undefined', 'death',
+		or a vnum which is not in the database.
+		The room is looked up when the exit is first used, and kept on the exit until its destination changes.
+		"""
+		target = exitObj.target
+		if target is None and exitObj.to in self.rooms:
+			target = exitObj.target = self.rooms[exitObj.to]
+		return target
+
+	def resolveExits(self):
+		"""Stores the room object each exit leads to on the exit, for every room in the database."""
+		rooms = self.rooms
+		for roomObj in rooms.values():
+			for exitObj in roomObj.exits.values():
+				exitObj.target = rooms.get(exitObj.to)
+
 	def isBidirectional(self, exitObj):
 		"""
 		Returns True if an exit is bidirectional, False if unidirectional.
 		I.E. True if moving in a given direction then moving back in the direction
 		you just came from would put you back where you started, False otherwise.
 		"""
-		try:
-			dest = self.rooms[exitObj.to]
-		except KeyError:
+		dest = self.exitTarget(exitObj)
+		if dest is None:
 			return False
 		revdir = REVERSE_DIRECTIONS[exitObj.direction]
 		if revdir in dest.exits and dest.exits[revdir].to == exitObj.vnum:
@@ -344,15 +622,19 @@ class World(object):
 		else:
 			origin = matchDict["origin"]
 			self.output(f"Changing the Vnum '{origin}' to '{destination}'.")
+		linkedVnums = []
 		for roomVnum, roomObj in self.rooms.items():
 			for direction, exitObj in roomObj.exits.items():
 				if roomVnum == origin:
 					exitObj.vnum = destination
 				if exitObj.to == origin:
-					self.rooms[roomVnum].exits[direction].to = destination
+					exitObj.to = destination
+					exitObj.target = self.rooms[origin]
+					linkedVnums.append(roomVnum)
 		self.rooms[origin].vnum = destination
 		self.rooms[destination] = self.rooms[origin]
 		del self.rooms[origin]
+		self.mapChanged(origin, destination, *linkedVnums)
 
 	def rdelete(self, *args):
 		if args and args[0] is not None and args[0].strip().isdigit():
@@ -367,11 +649,15 @@ class World(object):
 		else:
 			return "Syntax: rdelete [vnum]"
 		output = f"Deleting room '{vnum}' with name '{self.rooms[vnum].name}'."
+		linkedVnums = []
 		for roomVnum, roomObj in self.rooms.items():
 			for direction, exitObj in roomObj.exits.items():
 				if exitObj.to == vnum:
-					self.rooms[roomVnum].exits[direction].to = "undefined"
+					# Clears the reference to the deleted room.
+					exitObj.to = "undefined"
+					linkedVnums.append(roomVnum)
 		del self.rooms[vnum]
+		self.mapChanged(vnum, *linkedVnums)
 		self.GUIRefresh()
 		return output
 
@@ -563,6 +849,7 @@ class World(object):
 				+ f"Use 'ralign [{' | '.join(validValues)}]' to change it."
 			)
 		self.currentRoom.align = args[0].strip().lower()
+		self.mapChanged(self.currentRoom.vnum)
 		return f"Setting room align to '{self.currentRoom.align}'."
 
 	def rlight(self, *args):
@@ -580,6 +867,7 @@ class World(object):
 			self.currentRoom.light = LIGHT_SYMBOLS[args[0].strip()]
 		except KeyError:
 			self.currentRoom.light = args[0].strip().lower()
+		self.mapChanged(self.currentRoom.vnum)
 		return f"Setting room light to '{self.currentRoom.light}'."
 
 	def rportable(self, *args):
@@ -601,6 +889,7 @@ class World(object):
 			)
 		self.currentRoom.ridable = args[0].strip().lower()
 		self.currentRoom.calculateCost()
+		self.mapChanged(self.currentRoom.vnum)
 		return f"Setting room ridable to '{self.currentRoom.ridable}'."
 
 	def ravoid(self, *args):
@@ -612,6 +901,7 @@ class World(object):
 			)
 		self.currentRoom.avoid = args[0].strip() == "+"
 		self.currentRoom.calculateCost()
+		self.mapChanged(self.currentRoom.vnum)
 		return f"{'Enabling' if self.currentRoom.avoid else 'Disabling'} room avoid."
 
 	def rterrain(self, *args):
@@ -630,6 +920,7 @@ class World(object):
 		except KeyError:
 			self.currentRoom.terrain = args[0].strip().lower()
 		self.currentRoom.calculateCost()
+		self.mapChanged(self.currentRoom.vnum)
 		self.GUIRefresh()
 		return f"Setting room terrain to '{self.currentRoom.terrain}'."
 
@@ -637,6 +928,7 @@ class World(object):
 		if args and args[0] and args[0].strip():
 			try:
 				self.currentRoom.x = int(args[0].strip())
+				self.mapChanged(self.currentRoom.vnum)
 				self.GUIRefresh()
 				return f"Setting room X coordinate to '{self.currentRoom.x}'."
 			except ValueError:
@@ -647,6 +939,7 @@ class World(object):
 		if args and args[0] and args[0].strip():
 			try:
 				self.currentRoom.y = int(args[0].strip())
+				self.mapChanged(self.currentRoom.vnum)
 				self.GUIRefresh()
 				return f"Setting room Y coordinate to '{self.currentRoom.y}'."
 			except ValueError:
@@ -657,6 +950,7 @@ class World(object):
 		if args and args[0] and args[0].strip():
 			try:
 				self.currentRoom.z = int(args[0].strip())
+				self.mapChanged(self.currentRoom.vnum)
 				self.GUIRefresh()
 				return f"Setting room Z coordinate to '{self.currentRoom.z}'."
 			except ValueError:
@@ -735,6 +1029,7 @@ class World(object):
 		elif "remove".startswith(matchDict["mode"]):
 			if matchDict["flag"] in self.currentRoom.exits[direction].exitFlags:
 				self.currentRoom.exits[direction].exitFlags.remove(matchDict["flag"])
+				self.mapChanged(self.currentRoom.vnum)
 				return f"Exit flag '{matchDict['flag']}' in direction '{direction}' removed."
 			else:
 				return f"Exit flag '{matchDict['flag']}' in direction '{direction}' not set."
@@ -743,6 +1038,7 @@ class World(object):
 				return f"Exit flag '{matchDict['flag']}' in direction '{direction}' already set."
 			else:
 				self.currentRoom.exits[direction].exitFlags.add(matchDict["flag"])
+				self.mapChanged(self.currentRoom.vnum)
 				return f"Exit flag '{matchDict['flag']}' in direction '{direction}' added."
 
 	def doorflags(self, *args):
@@ -795,6 +1091,7 @@ class World(object):
 			self.currentRoom.exits[direction].exitFlags.add("door")
 			self.currentRoom.exits[direction].doorFlags.add("hidden")
 			self.currentRoom.exits[direction].door = matchDict["name"]
+			self.mapChanged(self.currentRoom.vnum)
 			self.GUIRefresh()
 			return f"Adding secret '{matchDict['name']}' to direction '{direction}'."
 		elif direction not in self.currentRoom.exits:
@@ -807,6 +1104,7 @@ class World(object):
 			if "hidden" in self.currentRoom.exits[direction].doorFlags:
 				self.currentRoom.exits[direction].doorFlags.remove("hidden")
 			self.currentRoom.exits[direction].door = ""
+			self.mapChanged(self.currentRoom.vnum)
 			self.GUIRefresh()
 			return f"Secret {direction} removed."
 
@@ -831,6 +1129,8 @@ class World(object):
 			elif direction not in self.currentRoom.exits:
 				self.currentRoom.exits[direction] = self.getNewExit(direction)
 			self.currentRoom.exits[direction].to = matchDict["vnum"]
+			self.currentRoom.exits[direction].target = self.rooms.get(matchDict["vnum"])
+			self.mapChanged(self.currentRoom.vnum, matchDict["vnum"])
 			if matchDict["vnum"] == "undefined":
 				self.GUIRefresh()
 				return f"Direction {direction} now undefined."
@@ -873,6 +1173,7 @@ class World(object):
 			)
 		elif "remove".startswith(matchDict["mode"]):
 			del self.currentRoom.exits[direction]
+			self.mapChanged(self.currentRoom.vnum)
 			self.GUIRefresh()
 			return f"Exit {direction} removed."
 
@@ -947,6 +1248,25 @@ class World(object):
 			else:
 				self.output("\n".join(results))
 
+	def mapstats(self, *args):
+		graph = self.graph
+		components = self.components
+		largest = max(components.members, key=len, default=[])
+		traps = components.traps()
+		orphans = components.orphans()
+		result = [
+			f"Rooms: {len(graph)}, exits: {len(graph.targets)}.",
+			f"Strongly connected components: {len(components)}, the largest containing {len(largest)} rooms.",
+			f"One-way traps: {len(traps)}, containing {sum(len(components.members[i]) for i in traps)} rooms.",
+			f"Orphaned rooms: {len(orphans)}.",
+		]
+		for number in traps[:MAPSTATS_EXAMPLES]:
+			rooms = components.members[number]
+			result.append(f"Trap: {', '.join(graph.vnums[room] for room in rooms[:MAPSTATS_EXAMPLES])}")
+		if orphans:
+			result.append(f"Orphans: {', '.join(graph.vnums[room] for room in orphans[:MAPSTATS_EXAMPLES])}")
+		return result
+
 	def rinfo(self, *args):
 		if not args or not args[0]:
 			vnum = self.currentRoom.vnum
@@ -1034,11 +1354,127 @@ class World(object):
 		if result is not None:
 			return self.createSpeedWalk(result)
 
+	def route(self, *args):
+		stops, error = self.routeStops(*args)
+		if error:
+			return error
+		costs = self.pairCosts([roomObj.vnum for roomObj in (self.currentRoom, *stops)])
+		return self.routeTour(self.graph, self.labelDistances, self.currentRoom, stops, costs)
+
+	def routeStops(self, *args):
+		"""
+		Finds the rooms to be visited by the route command, other than the current room.
+		Returns a tuple of a mapping of the rooms to the labels they were given as and None,
+		or None and a human-readable error message.
+		"""
+		if not args or not args[0] or not args[0].strip():
+			return None, "Usage: route [label|vnum] [label|vnum] ..."
+		origin = self.currentRoom
+		if not origin:
+			return None, "Error! The mapper has no location. Please use the sync command then try again."
+		stops = {}
+		for label in args[0].split():
+			roomObj, error = self.getRoomFromLabel(label)
+			if error:
+				return None, error
+			elif roomObj is not origin:
+				stops.setdefault(roomObj, label)
+		if not stops:
+			return None, "You are already there!"
+		return stops, None
+
+	def routeTour(self, graph, table, origin, stops, costs):
+		"""
+		Finds the order to visit the stops of a route in, and the commands for walking it.
+		The costs are those between the origin room and each stop, as returned by pairCosts.
+		Only the given graph and label table are searched, so that the tour can be found on another thread.
+		"""
+		rooms = [origin, *stops]
+		order = [rooms[i] for i in roomdata.distances.shortestTour(costs)]
+		commands = []
+		for legOrigin, legDestination in zip(order, order[1:]):
+			edges = self.routeLeg(graph, table, legOrigin.vnum, legDestination.vnum)
+			if edges is None:
+				return f"Unable to find a route from '{legOrigin.name}' to '{legDestination.name}'."
+			# The commands are in reverse order, so the legs are added to the front.
+			commands[:0] = self.pathCommands(graph, edges)
+		return f"Visiting {', '.join(stops[roomObj] for roomObj in order[1:])}.\n{self.createSpeedWalk(commands)}"
+
+	def routeLeg(self, graph, table, origin, destination):
+		"""
+		Returns the edges of the path between two stops of a route, with the default costs as used by pairCosts,
+		or None if the destination can't be reached.
+		The path to a labelled room is read from the label table.
+		"""
+		originIndex = graph.indices[origin]
+		if table is not None and destination in table.nextHops:
+			return table.edgePath(graph, originIndex, destination)
+		tree = roomdata.graph.ShortestPathTree(graph, originIndex)
+		goal = tree.nearest(frozenset([graph.indices[destination]]))
+		return None if goal is None else tree.edgePath(goal)
+
+	def pairCosts(self, vnums):
+		"""
+		Returns the costs of moving between each pair of rooms, using the default costs.
+		Costs are read from the label table where possible, and otherwise calculated and cached
+		until the map changes.
+		"""
+		graph, missing = self.missingPairCosts(vnums)
+		rows = roomdata.distances.pairwiseCosts(
+			graph, [graph.indices[origin] for origin in missing], [graph.indices[vnum] for vnum in vnums]
+		)
+		return self.addPairCosts(graph, vnums, missing, rows)
+
+	def missingPairCosts(self, vnums):
+		"""
+		Finds the rooms whose costs of moving to the others still need to be calculated, as used by pairCosts.
+		Returns a tuple of the graph the costs are calculated from, and the vnums of the rooms.
+		"""
+		table = self.labelDistances
+		with self._derivedLock:
+			graph = self.graph
+			version, cache = self._pairCosts
+			if version != graph.version:
+				cache = {}
+				self._pairCosts = (graph.version, cache)
+			if table is not None:
+				for origin in vnums:
+					for destination in vnums:
+						cost = table.distance(origin, destination)
+						if cost is not None:
+							cache[(origin, destination)] = cost
+			return graph, [origin for origin in vnums if any((origin, other) not in cache for other in vnums)]
+
+	def addPairCosts(self, graph, vnums, missing, rows):
+		"""
+		Caches the costs calculated for the rooms returned by missingPairCosts,
+		and returns the costs of moving between each pair of rooms.
+		"""
+		with self._derivedLock:
+			version, cache = self._pairCosts
+			if version != graph.version:
+				raise ValueError(f"The costs are for map version {graph.version}, not {version}.")
+			for origin, row in zip(missing, rows):
+				for destination, cost in zip(vnums, row):
+					cache[(origin, destination)] = cost
+			return [[cache[(origin, destination)] for destination in vnums] for origin in vnums]
+
 	def pathFind(self, origin=None, destination=None, flags=None):
 		"""Find the path"""
+		search = self.pathSearch(origin, destination, flags)
+		if isinstance(search, PathSearch):
+			return self.searchResult(search.run())
+		return search
+
+	def pathSearch(self, origin=None, destination=None, flags=None):
+		"""
+		Prepares a search for the path to a destination.
+		Returns a PathSearch, or the result of the query if no search is needed.
+		"""
 		origin = origin or self.currentRoom
 		if not origin:
 			self.output("Error! The mapper has no location. Please use the sync command then try again.")
+			return None
 		destinationRoom, errorFindingDestination = self.getRoomFromLabel(destination)
 		if errorFindingDestination:
 			self.output(errorFindingDestination)
@@ -1046,99 +1482,379 @@ class World(object):
 		if origin is destinationRoom:
 			self.output("You are already there!")
 			return []
+		graph = self.graph
+		if not self.components.isReachable(graph.indices[origin.vnum], graph.indices[destinationRoom.vnum]):
+			self.output("No routes found.")
+			return None
+		avoidTerrains = self.avoidTerrains(flags)
+		table = self.labelDistances if not avoidTerrains and self.costPeriod() == "DAY" else None
+		if table is not None and destinationRoom.vnum in table.nextHops:
+			# The route to a labelled room is read from the label table.
+			edges = table.edgePath(graph, graph.indices[origin.vnum], destinationRoom.vnum)
+			if edges is None:
+				self.output("No routes found.")
+				return None
+			self.lastRoute = (destinationRoom.vnum, avoidTerrains)
+			return self.pathCommands(graph, edges)
+		return self._routeSearch(origin, destinationRoom.vnum, avoidTerrains)
+
+	def avoidTerrains(self, flags):
+		"""Returns the terrains to avoid, given a list of path finding flags such as 'noroad'"""
 		if flags:
-			avoidTerrains = frozenset(
-				terrain for terrain in roomdata.objects.TERRAIN_COSTS if f"no{terrain}" in flags
-			)
+			return frozenset(terrain for terrain in roomdata.objects.TERRAIN_COSTS if f"no{terrain}" in flags)
 		else:
-			avoidTerrains = frozenset()
-		ignoreVnums = frozenset(("undefined", "death"))
-		isDestinationFunc = lambda currentRoomObj: currentRoomObj is destinationRoom  # NOQA: E731
-		exitIgnoreFunc = lambda exitObj: exitObj.to in ignoreVnums  # NOQA: E731
-		exitCostFunc = lambda exitObj, neighborRoomObj: (  # NOQA: E731
-			(5 if "door" in exitObj.exitFlags or "climb" in exitObj.exitFlags else 0)
-			+ (1000 if "avoid" in exitObj.exitFlags else 0)
-			+ (10 if neighborRoomObj.terrain in avoidTerrains else 0)
+			return frozenset()
+
+	def costPeriod(self):
+		"""
+		Returns the time of day which path costs are calculated for, as named by MumeTime.dawnDuskState.
+		Night costs are only used when the time is known.
+		"""
+		return "DAY"
+
+	def _takeTree(self, attribute, key, reverse=False, keepBlocked=False):
+		# Takes a cached search tree, or creates a new one if the cached tree does not match.
+		# The key is a tuple of the root vnum, the terrains to avoid, the map version, and the time of day.
+		# The tree is removed from the cache until the search using it finishes,
+		# so that a search running on another thread is never given a tree which is in use.
+		cached = getattr(self, attribute)
+		setattr(self, attribute, None)
+		if cached is not None and cached[0] == key and (keepBlocked or not cached[1].blocked):
+			return cached[1]
+		root, avoidTerrains, version, period = key
+		graph = self.graph
+		return roomdata.graph.ShortestPathTree(
+			graph, graph.indices[root], graph.edgeCosts(avoidTerrains, period), reverse=reverse
 		)
-		exitDestinationFunc = None
-		return self._pathFind(origin, isDestinationFunc, exitIgnoreFunc, exitCostFunc, exitDestinationFunc)
-
-	def _pathFind(
-		self, origin, isDestinationFunc=None, exitIgnoreFunc=None, exitCostFunc=None, exitDestinationFunc=None
-	):
-		# Each key-value pare that gets added to this dict will be a parent room and child room respectively.
-		parents = {origin: origin}
-		# unprocessed rooms.
-		opened = []
-		# Using a binary heap for storing unvisited rooms significantly increases performance.
-		# https://en.wikipedia.org/wiki/Binary_heap
-		heapq.heapify(opened)
-		# Put the origin cost and origin room on the opened rooms heap to be processed first.
-		heapq.heappush(opened, (origin.cost, origin))
-		# previously processed rooms.
-		closed = {}
-		# Ignore the origin from the search by adding it to the closed rooms dict.
-		closed[origin] = origin.cost
-		# Search while there are rooms left in the opened heap.
-		while opened:
-			# Pop the last room cost and room object reference off the opened heap for processing.
-			currentRoomCost, currentRoomObj = heapq.heappop(opened)
-			if isDestinationFunc and isDestinationFunc(currentRoomObj):
-				# We successfully found a path from the origin to the destination.
+
+	def _routeSearch(self, origin, destination, avoidTerrains=frozenset(), isReplanning=False):
+		graph = self.graph
+		period = self.costPeriod()
+		key = (destination, avoidTerrains, graph.version, period)
+		prefetched = self._prefetchedRoutes.get(key)
+		if prefetched is not None and prefetched.settled[graph.indices[origin.vnum]] and not isReplanning:
+			# The route was found while the mapper was idle.
+			del self._prefetchedRoutes[key]
+			return PathSearch("_routeTree", key, prefetched, frozenset([graph.indices[origin.vnum]]))
+		if (
+			not avoidTerrains
+			and period == "DAY"
+			and not isReplanning
+			and origin.manhattanDistance(self.rooms[destination]) >= ZONE_SEARCH_DISTANCE
+		):
+			# Long routes with the default costs are found through the zones of the map.
+			return ZoneSearch(self._zones, key, graph, graph.indices[origin.vnum], graph.indices[destination])
+		# The search is rooted at the destination, so that it can be continued from any room
+		# if the player is moved off the route.
+		tree = self._takeTree("_routeTree", key, reverse=True, keepBlocked=isReplanning)
+		return PathSearch("_routeTree", key, tree, frozenset([graph.indices[origin.vnum]]))
+
+	@property
+	def routeUsage(self):
+		"""The number of times a route was requested to each destination vnum, loaded from disk when first used."""
+		if self._routeUsage is None:
+			errors, usage = roomdata.database.loadRouteUsage()
+			self._routeUsage = usage if isinstance(usage, dict) else {}
+		return self._routeUsage
+
+	def countRoute(self, destination, avoidTerrains=frozenset()):
+		"""
+		Records a run to a destination, so that the route can be prefetched from wherever the player is later.
+		The usage is written to disk by saveRouteUsage.
+		"""
+		route = (destination, avoidTerrains)
+		if route in self.recentRoutes:
+			self.recentRoutes.remove(route)
+		self.recentRoutes.append(route)
+		usage = self.routeUsage
+		usage[destination] = usage.get(destination, 0) + 1
+		self._isRouteUsageChanged = True
+
+	def saveRouteUsage(self):
+		"""Writes the route usage to disk, if it changed since it was last written."""
+		if self._isRouteUsageChanged:
+			roomdata.database.dumpRouteUsage(self.routeUsage)
+			self._isRouteUsageChanged = False
+
+	def likelyRoutes(self):
+		"""
+		Returns the routes which are most likely to be requested next, as tuples of the destination vnum
+		and the terrains to avoid. Recent routes come first, followed by the most used destinations.
+		"""
+		routes = list(reversed(self.recentRoutes))
+		usage = self.routeUsage
+		for destination in sorted(usage, key=lambda vnum: (-usage[vnum], vnum)):
+			route = (destination, frozenset())
+			if route not in routes:
+				routes.append(route)
+		return routes
+
+	def prefetchRoutes(self, cancelled=None):
+		"""
+		Searches for the likely routes from the current room, so that the next request is answered instantly.
+		Routes to labelled rooms are skipped while the label table can answer them.
+		Searches which are cancelled keep their progress, and are resumed by the next call.
+
+		Returns:
+			True if every route was found, or False if the search was cancelled.
+		"""
+		origin = self.currentRoom
+		graph = self.graph
+		originIndex = graph.indices[origin.vnum]
+		period = self.costPeriod()
+		table = self.labelDistances if period == "DAY" else None
+		components = self.components
+		prefetched = OrderedDict()
+		for destination, avoidTerrains in self.likelyRoutes():
+			if len(prefetched) >= PREFETCH_ROUTES:
 				break
-			# Loop through the exits, and process each room linked to the current room.
-			for exitDirection, exitObj in currentRoomObj.exits.items():
-				if exitIgnoreFunc and exitIgnoreFunc(exitObj):
-					continue
-				# Get a reference to the room object that the exit leads to using the room's vnum.
-				neighborRoomObj = self.rooms[exitObj.to]
-				# The neighbor room cost should be the sum of all movement costs
-				# to get to the neighbor room from the origin room.
-				neighborRoomCost = (
-					currentRoomCost + neighborRoomObj.cost + exitCostFunc(exitObj, neighborRoomObj)
-					if exitCostFunc
-					else 0
+			elif (
+				destination not in graph.indices
+				or destination == origin.vnum
+				or not avoidTerrains
+				and table is not None
+				and destination in table.nextHops
+				or not components.isReachable(originIndex, graph.indices[destination])
+			):
+				continue
+			key = (destination, avoidTerrains, graph.version, period)
+			tree = self._prefetchedRoutes.get(key)
+			if tree is None:
+				tree = roomdata.graph.ShortestPathTree(
+					graph, graph.indices[destination], graph.edgeCosts(avoidTerrains, period), reverse=True
 				)
-				# We're only interested in the neighbor room if it hasn't been encountered yet,
-				# or if the cost of moving from the current room to the neighbor room is less than
-				# the cost of moving to the neighbor room from a previously discovered room.
-				if neighborRoomObj not in closed or closed[neighborRoomObj] > neighborRoomCost:
-					# Add the room object and room cost to the dict of closed rooms,
-					# and put it on the opened rooms heap to be processed.
-					closed[neighborRoomObj] = neighborRoomCost
-					heapq.heappush(opened, (neighborRoomCost, neighborRoomObj))
-					# Since the current room is so far the most optimal way into the neighbor room,
-					# set it as the parent of the neighbor room.
-					parents[neighborRoomObj] = (currentRoomObj, exitDirection)
-					if exitDestinationFunc and exitDestinationFunc(exitObj, neighborRoomObj):
-						break
+			prefetched[key] = tree
+		# Trees for routes which are no longer likely are dropped.
+		self._prefetchedRoutes = prefetched
+		for tree in prefetched.values():
+			if tree.nearest(frozenset([originIndex]), cancelled) is None:
+				return False
+		return True
+
+	def releaseSearch(self, search):
+		"""Returns the tree of a finished search to the cache."""
+		if search.cache is not None:
+			setattr(self, search.cache, (search.key, search.tree))
+
+	def searchResult(self, search):
+		"""Returns the tree of a finished search to the cache, and converts the result to a list of commands."""
+		self.releaseSearch(search)
+		if search.goal is None:
+			# The search exhausted every room that could be reached, and no goal was found.
+			self.output("No routes found.")
+			return None
+		graph = search.graph
+		destinationRoom = graph.rooms[search.destination]
+		self.lastRoute = (destinationRoom.vnum, search.key[1])
+		if search.isNearest:
+			if search.destination == search.tree.origin:
+				self.output("You are already there!")
+				return []
+			self.output(f"Nearest match is '{destinationRoom.name}' with vnum '{destinationRoom.vnum}'.")
+		return self.pathCommands(graph, search.edgePath())
+
+	def retargetSearch(self, search, origin):
+		"""
+		Prepares a search for the same destinations as a finished search, but from another origin room.
+		Used when the player moved while the search was running.
+		The tree of a route search is rooted at the destination, so it is continued from the new room
+		rather than searched again.
+		"""
+		self.releaseSearch(search)
+		if not search.isNearest:
+			destination, avoidTerrains = search.key[:2]
+			return self.replanSearch((destination, avoidTerrains), origin)
+		# The map may have changed since the search was prepared, so the goals are found again by vnum.
+		vnums = search.graph.vnums
+		graph = self.graph
+		components = self.components
+		originIndex = graph.indices[origin.vnum]
+		goals = frozenset(
+			graph.indices[vnums[goal]]
+			for goal in search.goals
+			if vnums[goal] in graph.indices
+			and components.isReachable(originIndex, graph.indices[vnums[goal]])
+		)
+		if not goals:
+			self.output("No routes found.")
+			return None
+		key = (origin.vnum, search.key[1], graph.version, self.costPeriod())
+		tree = self._takeTree("_nearestTree", key)
+		return PathSearch("_nearestTree", key, tree, goals)
+
+	def replan(self, route, origin=None):
+		"""
+		Find the path along a previous route from a new room.
+		Exits which were blocked during the route remain blocked.
+		The route is a tuple of the destination vnum and the terrains to avoid, as stored in lastRoute.
+		"""
+		search = self.replanSearch(route, origin)
+		if isinstance(search, PathSearch):
+			return self.searchResult(search.run())
+		return search
+
+	def replanSearch(self, route, origin=None):
+		"""Prepares a search for the path along a previous route, as used by replan."""
+		origin = origin or self.currentRoom
+		destination, avoidTerrains = route
+		if destination not in self.rooms:
+			self.output(f"Error: the destination vnum '{destination}' no longer exists.")
+			return None
+		elif origin.vnum == destination:
+			return []
+		graph = self.graph
+		if not self.components.isReachable(graph.indices[origin.vnum], graph.indices[destination]):
+			self.output("No routes found.")
+			return None
+		return self._routeSearch(origin, destination, avoidTerrains, isReplanning=True)
+
+	def blockExit(self, route, roomObj, direction):
+		"""
+		Prevent a route from using an exit, such as a door which turned out to be locked.
+		Routes which were found through the zones of the map, or read from the label table, have no cached
+		search tree, so a tree is created for the route, and kept for replanning it.
+		"""
+		graph = self.graph
+		source = graph.indices.get(roomObj.vnum)
+		if source is None or route[0] not in graph.indices:
+			return None
+		key = (*route, graph.version, self.costPeriod())
+		tree = self._takeTree("_routeTree", key, reverse=True, keepBlocked=True)
+		try:
+			for edge in range(graph.offsets[source], graph.offsets[source + 1]):
+				if roomdata.graph.DIRECTIONS[graph.directions[edge]] == direction:
+					tree.blockEdge(edge)
+		finally:
+			self._routeTree = (key, tree)
+
+	def nearestRooms(self, query):
+		"""
+		Returns the rooms matching a query for the nearest room.
+		The query can be a mob or load flag, one or more 'key:value' pairs as accepted by searchRooms,
+		or the beginning of a label.
+		"""
+		query = query.strip()
+		if ":" in query:
+			return self.searchRooms(**dict(NEAREST_SEARCH_REGEX.findall(query)))
+		query = query.lower()
+		if query in roomdata.objects.VALID_MOB_FLAGS:
+			return [roomObj for roomObj in self.rooms.values() if query in roomObj.mobFlags]
+		elif query in roomdata.objects.VALID_LOAD_FLAGS:
+			return [roomObj for roomObj in self.rooms.values() if query in roomObj.loadFlags]
+		return [
+			self.rooms[vnum]
+			for label, vnum in self.labels.items()
+			if label.startswith(query) and vnum in self.rooms
+		]
+
+	def nearestFind(self, query, origin=None):
+		"""
+		Find the path to the nearest room matching a query.
+		The search from the current room is kept, so that later queries only need to search further
+		than the rooms which were already reached.
+		"""
+		search = self.nearestSearch(query, origin)
+		if isinstance(search, PathSearch):
+			return self.searchResult(search.run())
+		return search
+
+	def nearestSearch(self, query, origin=None):
+		"""Prepares a search for the nearest room matching a query, as used by nearestFind."""
+		origin = origin or self.currentRoom
+		if not origin:
+			self.output("Error! The mapper has no location. Please use the sync command then try again.")
+			return None
+		terms = query.split()
+		if len(terms) > 1 and all(flag in PATH_FLAGS for flag in terms[-1].lower().split("|")):
+			flags = terms.pop().lower().split("|")
 		else:
-			# The while loop terminated normally (I.E. without encountering a break statement),
-			# and the destination was *not* found.
+			flags = None
+		destinations = self.nearestRooms(" ".join(terms))
+		if not destinations:
+			self.output(f"No rooms match '{' '.join(terms)}'.")
+			return None
+		graph = self.graph
+		components = self.components
+		originIndex = graph.indices[origin.vnum]
+		goals = frozenset(
+			graph.indices[roomObj.vnum]
+			for roomObj in destinations
+			if components.isReachable(originIndex, graph.indices[roomObj.vnum])
+		)
+		if not goals:
 			self.output("No routes found.")
 			return None
-		# The while statement was broken prematurely, meaning that the destination was found.
-		# Find the path from the origin to the destination by traversing the hierarchy
-		# of room parents, starting with the current room.
+		avoidTerrains = self.avoidTerrains(flags)
+		key = (origin.vnum, avoidTerrains, graph.version, self.costPeriod())
+		tree = self._takeTree("_nearestTree", key)
+		return PathSearch("_nearestTree", key, tree, goals)
+
+	def reach(self, *args):
+		"""
+		Finds the rooms which can be reached from the current room within a movement cost budget.
+		The rooms are tinted in the hc GUI.
+		"""
+		message, vnums = self.reachableRooms(*args)
+		if vnums is not None and self._interface == "hc":
+			self._gui_queue.put(("on_reach", vnums))
+		return message
+
+	def reachableRooms(self, *args):
+		"""
+		Finds the rooms for the reach command.
+		Returns a tuple of a message for the user, and the vnums of the reachable rooms,
+		which are empty for 'reach off', or None if the command failed.
+		The search from the current room is shared with nearestFind, so it is kept until the player moves
+		or the map changes, and larger budgets only need to search further than the rooms already reached.
+		"""
+		argString = args[0].strip().lower() if args and args[0] else ""
+		if argString == "off":
+			return "Reachable rooms cleared.", frozenset()
+		match = REACH_REGEX.match(argString)
+		if match is None:
+			return "Usage: reach [cost] [flags] | reach off", None
+		origin = self.currentRoom
+		if not origin:
+			return "Error! The mapper has no location. Please use the sync command then try again.", None
+		budget = float(match.group("budget"))
+		flags = match.group("flags")
+		avoidTerrains = self.avoidTerrains(flags.split("|") if flags else None)
+		graph = self.graph
+		key = (origin.vnum, avoidTerrains, graph.version, self.costPeriod())
+		tree = self._takeTree("_nearestTree", key)
+		try:
+			rooms = tree.within(budget)
+		finally:
+			self._nearestTree = (key, tree)
+		vnums = frozenset(graph.vnums[room] for room in rooms)
+		return f"{len(vnums)} rooms reachable within a cost of {budget:g}.", vnums
+
+	def pathCommands(self, graph, edges):
+		"""
+		Converts the edges of a path into a list of commands for walking it.
+		The list is in reverse order, so that the next command can be popped off the end.
+		"""
 		results = []
-		while currentRoomObj is not origin:
-			currentRoomObj, direction = parents[currentRoomObj]
+		vnums = graph.vnums
+		origin = graph.sources[edges[0]] if edges else None
+		for edge in reversed(edges):
+			source = graph.sources[edge]
+			sourceVnum = vnums[source]
+			targetVnum = vnums[graph.targets[edge]]
+			direction = roomdata.graph.DIRECTIONS[graph.directions[edge]]
 			if (
-				currentRoomObj.vnum in LEAD_BEFORE_ENTERING_VNUMS
-				and currentRoomObj.exits[direction].to not in LEAD_BEFORE_ENTERING_VNUMS
-				and currentRoomObj is not origin
+				sourceVnum in LEAD_BEFORE_ENTERING_VNUMS
+				and targetVnum not in LEAD_BEFORE_ENTERING_VNUMS
+				and source != origin
 			):
 				results.append("ride")
 			results.append(direction)
-			if currentRoomObj.exits[direction].to in LEAD_BEFORE_ENTERING_VNUMS and (
-				currentRoomObj.vnum not in LEAD_BEFORE_ENTERING_VNUMS or currentRoomObj is origin
+			if targetVnum in LEAD_BEFORE_ENTERING_VNUMS and (
+				sourceVnum not in LEAD_BEFORE_ENTERING_VNUMS or source == origin
 			):
 				results.append("lead")
-			if "door" in currentRoomObj.exits[direction].exitFlags:
-				results.append(
-					f"open {currentRoomObj.exits[direction].door if currentRoomObj.exits[direction].door else 'exit'} "
-					+ f"{direction}"
-				)
+			if graph.flags[edge] & roomdata.graph.EXIT_FLAG_BITS["door"]:
+				results.append(f"open {graph.doors[edge] if graph.doors[edge] else 'exit'} {direction}")
 		return results
 
 	def getRoomFromLabel(self, label):
@@ -11,12 +11,14 @@ from __future__ import annotations
 # Built-in Modules:
 import argparse
 import logging
+import multiprocessing
 import sys
 import traceback
 
 # Mapper Modules:
 import mapper.main
-from mapper import INTERFACES, OUTPUT_FORMATS
+import mapper.mapserver
+from mapper import INTERFACES, OUTPUT_FORMATS, QUEUE_POLICIES, TRANSPORTS, VIEWER_POLICIES
 
 
 try:
@@ -28,6 +30,8 @@ finally:
 
 
 if __name__ == "__main__":
+	# Needed by the worker processes which calculate the label table, when running from a frozen executable.
+	multiprocessing.freeze_support()
 	parser = argparse.ArgumentParser(description="The accessible Mume mapper.")
 	parser.add_argument("-v", "--version", action="version", version=VERSION)
 	parser.add_argument("-e", "--emulation", help="Start in emulation mode.", action="store_true")
@@ -74,6 +78,71 @@ if __name__ == "__main__":
 		action="store_true",
 	)
 	parser.add_argument("-gp", "--gag-prompts", help="Gag emulated prompts.", action="store_true")
+	parser.add_argument(
+		"-fp",
+		"--fused-parser",
+		help="Parse Telnet, MPI, and XML data from the server in a single protocol handler.",
+		action="store_true",
+	)
+	parser.add_argument(
+		"-t",
+		"--transport",
+		help=(
+			"Select how network data is proxied: on separate threads, on an asyncio event loop, "
+			+ "or on a single selector loop."
+		),
+		choices=TRANSPORTS,
+		default="threads",
+	)
+	parser.add_argument(
+		"-mv",
+		"--max-viewers",
+		metavar="number",
+		type=int,
+		help=(
+			"The number of additional local clients which may connect to view the game output. "
+			+ "Only the first client to connect sends commands."
+		),
+		default=0,
+	)
+	parser.add_argument(
+		"-vp",
+		"--viewer-policy",
+		help="Select what happens to viewers which fall behind the output: disconnect them, or drop output.",
+		choices=VIEWER_POLICIES,
+		default="disconnect",
+	)
+	parser.add_argument(
+		"-qp",
+		"--queue-policy",
+		help=(
+			"Select what happens when the mapper falls behind the game: hold back the game until it catches up, "
+			+ "or drop events which aren't needed to stay synced, such as lines of output."
+		),
+		choices=QUEUE_POLICIES,
+		default="block",
+	)
+	parser.add_argument(
+		"-ms",
+		"--map-server",
+		metavar="path",
+		nargs="?",
+		const=mapper.mapserver.MAP_SERVER_ADDRESS,
+		help=(
+			"Use the map of a map server listening at the given socket path, "
+			+ "rather than loading a separate copy of the map."
+		),
+		default=None,
+	)
+	parser.add_argument(
+		"-sm",
+		"--serve-map",
+		help=(
+			"Run a map server, which owns the map for every proxy started with --map-server. "
+			+ "The socket path is given with --map-server, or the default path in the data directory is used."
+		),
+		action="store_true",
+	)
 	parser.add_argument(
 		"-ff",
 		"--find-format",
@@ -87,19 +156,28 @@ if __name__ == "__main__":
 	)
 	args = parser.parse_args()
 	try:
-		mapper.main.main(
-			outputFormat=args.format,
-			interface=args.interface if mapper.main.pyglet is not None else "text",
-			isEmulatingOffline=args.emulation,
-			promptTerminator=b"\r\n" if args.prompt_terminator_lf else None,
-			gagPrompts=args.gag_prompts,
-			findFormat=args.find_format,
-			localHost=args.local_host,
-			localPort=args.local_port,
-			remoteHost=args.remote_host,
-			remotePort=args.remote_port,
-			noSsl=args.no_ssl,
-		)
+		if args.serve_map:
+			mapper.mapserver.main(args.map_server)
+		else:
+			mapper.main.main(
+				outputFormat=args.format,
+				interface=args.interface if mapper.main.pyglet is not None else "text",
+				isEmulatingOffline=args.emulation,
+				promptTerminator=b"\r\n" if args.prompt_terminator_lf else None,
+				gagPrompts=args.gag_prompts,
+				findFormat=args.find_format,
+				localHost=args.local_host,
+				localPort=args.local_port,
+				remoteHost=args.remote_host,
+				remotePort=args.remote_port,
+				noSsl=args.no_ssl,
+				fusedParser=args.fused_parser,
+				transport=args.transport,
+				maxViewers=args.max_viewers,
+				viewerPolicy=args.viewer_policy,
+				mapServer=args.map_server,
+				queuePolicy=args.queue_policy,
+			)
 	except Exception:
 		traceback.print_exception(*sys.exc_info())
 		logging.exception("OOPS!")
@@ -0,0 +1,98 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+
+# Future Modules:
+from __future__ import annotations
+
+# Built-in Modules:
+from unittest import TestCase
+from unittest.mock import patch
+
+# Mapper Modules:
+from mapper.protocols.fused import FusedProtocol, FusedTelnetProtocol
+from mapper.protocols.manager import Manager
+from mapper.protocols.mpi import MPI_INIT, MPIProtocol
+from mapper.protocols.telnet import TelnetProtocol
+from mapper.protocols.telnet_constants import CR, CR_LF, CR_NULL, ECHO, GA, IAC, SB, SE, WILL
+from mapper.protocols.xml import XMLProtocol
+
+
+BODY = b"Line one\r\n<b>Line &amp; two</b>"
+TELNET_DATA = (
+	IAC + WILL + ECHO + IAC + SB + b"\xc9Core.Hello {}" + IAC + SE
+	+ b"<prompt>*%&gt;</prompt>" + IAC + GA
+	+ IAC + SB + b"\xc9Escaped " + IAC + IAC + b" byte" + IAC + SE
+	+ b"Carriage" + CR_NULL + b"return" + CR + b"and bare" + CR_LF
+	+ b"Escaped " + IAC + IAC + b" byte" + CR_LF
+	+ b"~Not an MPI frame." + CR_LF + IAC + GA + b"~Nor this." + CR_LF
+	+ b"<movement dir=north/><room><name>Bag End</name>" + CR_LF
+	+ b"<gratuitous><description>A hobbit hole." + CR_LF + b"</description></gratuitous>"
+	+ b"<exits>Exits: west.</exits>" + CR_LF + b"</room>"
+	+ b"<tell>Bilbo tells you 'Hello &lt;friend&gt;.'</tell>" + CR_LF
+	+ b"<prompt>o&gt;</prompt>" + IAC + GA
+)  # fmt: skip
+
+
+class TestFusedTelnetProtocol(TestCase):
+	def setUp(self):
+		self.data = (
+			b"<prompt>Hungry&gt;</prompt>" + IAC + GA
+			+ b"Some text~" + CR_LF
+			+ MPI_INIT + b"Z" + b"%d" % len(BODY.replace(CR_LF, b"\n")) + CR_LF + BODY
+			+ b"~$#Q not an MPI command." + CR_LF
+			+ b"<room><name>Lower Flet</name>" + CR_LF + b"<exits>Exits: north.</exits>" + CR_LF + b"</room>"
+			+ b"<prompt>!f CW&gt;</prompt>" + IAC + GA
+		)  # fmt: skip
+
+	def parse(self, isFused, chunkSize, data=None, outputFormat="tintin"):
+		data = self.data if data is None else data
+		writes = []
+		received = []
+		events = []
+		manager = Manager(writes.append, received.append)
+		manager.connect()
+		if isFused:
+			manager.register(FusedTelnetProtocol, outputFormat=outputFormat, eventCaller=events.append)
+		else:
+			manager.register(TelnetProtocol)
+			manager.register(MPIProtocol, outputFormat=outputFormat)
+			manager.register(XMLProtocol, outputFormat=outputFormat, eventCaller=events.append)
+		for i in range(0, len(data), chunkSize):
+			manager.parse(data[i : i + chunkSize])
+		manager.disconnect()
+		return sorted(writes), b"".join(received), events
+
+	def testFusedTelnetProtocolMatchesLayeredProtocols(self):
+		for chunkSize in range(1, len(self.data) + 1):
+			with self.assertLogs("mapper.protocols.mpi", "WARNING"):
+				expected = self.parse(False, chunkSize)
+			with self.assertLogs("mapper.protocols.mpi", "WARNING"):
+				self.assertEqual(self.parse(True, chunkSize), expected)
+		writes, received, events = expected
+		self.assertIn(MPI_INIT + b"Z", received)
+		self.assertEqual(
+			[name for eventType, (name, payload) in events],
+			["prompt", "line", "line", "line", "line", "name", "exits", "dynamic", "prompt"],
+		)
+
+	def testFusedTelnetProtocolMatchesLayeredProtocolsWithTelnetCommands(self):
+		for outputFormat in (None, "normal", "raw", "tintin"):
+			for chunkSize in range(1, len(TELNET_DATA) + 1):
+				with self.subTest(outputFormat=outputFormat, chunkSize=chunkSize):
+					self.assertEqual(
+						self.parse(True, chunkSize, TELNET_DATA, outputFormat),
+						self.parse(False, chunkSize, TELNET_DATA, outputFormat),
+					)
+
+	def testFusedTelnetProtocolParsesInOnePass(self):
+		data = TELNET_DATA[TELNET_DATA.index(b"<movement") :]
+		with patch.object(FusedProtocol, "on_dataReceived") as mockOnDataReceived:
+			writes, received, events = self.parse(True, len(data), data)
+		mockOnDataReceived.assert_not_called()
+		self.assertIn(b"TELL:Bilbo tells you 'Hello <friend>.':TELL", received)
+		self.assertEqual(
+			[name for eventType, (name, payload) in events],
+			["movement", "name", "description", "exits", "dynamic", "line", "prompt"],
+		)
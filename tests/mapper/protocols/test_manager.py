@@ -7,6 +7,7 @@
 from __future__ import annotations
 
 # Built-in Modules:
+import threading
 from unittest import TestCase, mock
 
 # Mapper Modules:
@@ -49,17 +50,18 @@ class TestManager(TestCase):
 		self.gameReceives.clear()
 		return playerReceives, gameReceives
 
-	@mock.patch("mapper.protocols.manager.Manager.disconnect")
-	@mock.patch("mapper.protocols.manager.Manager.connect")
-	def testManagerAsContextManager(self, mockConnect, mockDisconnect):
-		with self.manager:
-			self.manager.connect.assert_called_once()
-		self.manager.disconnect.assert_called_once()
+	# The instance is patched rather than the class, so that other managers
+	# being garbage collected during the test don't call the mocks.
+	def testManagerAsContextManager(self):
+		with mock.patch.object(self.manager, "connect"), mock.patch.object(self.manager, "disconnect"):
+			with self.manager:
+				self.manager.connect.assert_called_once()
+			self.manager.disconnect.assert_called_once()
 
-	@mock.patch("mapper.protocols.manager.Manager.disconnect")
-	def testManagerClose(self, mockDisconnect):
-		self.manager.close()
-		self.manager.disconnect.assert_called_once()
+	def testManagerClose(self):
+		with mock.patch.object(self.manager, "disconnect"):
+			self.manager.close()
+			self.manager.disconnect.assert_called_once()
 
 	def testManagerParse(self):
 		data = b"Hello World!"
@@ -115,3 +117,67 @@ class TestManager(TestCase):
 		self.manager.unregister(instance)
 		self.assertIs(self.manager._handlers[0]._receiver, instance._receiver)
 		instance.on_connectionLost.assert_called_once()
+
+
+class TestManagerCoalescing(TestCase):
+	def setUp(self):
+		self.gameReceives = []
+		self.vectorReceives = []
+		self.manager = Manager(
+			self.gameReceives.append, lambda *args: None, flushDelay=60.0, vectorWriter=self.vectorReceives.append
+		)
+		self.manager.connect()
+		self.manager.register(Protocol)
+
+	def tearDown(self):
+		self.manager.disconnect()
+		del self.manager
+
+	def testManagerFlush(self):
+		self.manager.write(b"Hello")
+		self.assertEqual(self.gameReceives, [])
+		self.manager.flush()
+		self.assertEqual(self.gameReceives, [b"Hello"])
+		# Multiple writes are sent to the vector writer in a single call.
+		self.manager.write(b"Hello ")
+		self.manager.write(b"World!")
+		self.manager.flush()
+		self.assertEqual(self.gameReceives, [b"Hello"])
+		self.assertEqual(self.vectorReceives, [[b"Hello ", b"World!"]])
+		self.assertEqual(
+			(self.manager.writesRequested, self.manager.writesIssued, self.manager.bytesSent), (3, 2, 17)
+		)
+		# Flushing with nothing pending doesn't call the writer.
+		self.manager.flush()
+		self.assertEqual(self.manager.writesIssued, 2)
+
+	def testManagerFlushWithoutVectorWriter(self):
+		self.manager._vectorWriter = None
+		self.manager.write(b"Hello ")
+		self.manager.write(b"World!")
+		self.manager.flush()
+		self.assertEqual(self.gameReceives, [b"Hello World!"])
+
+	def testManagerParseFlushes(self):
+		onParsed = mock.Mock()
+		self.manager._onParsed = onParsed
+		with mock.patch.object(self.manager._handlers[0], "on_dataReceived") as mockOn_dataReceived:
+			mockOn_dataReceived.side_effect = lambda data: self.manager.write(data.upper())
+			self.manager.parse(b"hello")
+		self.assertEqual(self.gameReceives, [b"HELLO"])
+		onParsed.assert_called_once_with()
+
+	def testManagerDisconnectFlushes(self):
+		self.manager.write(b"Hello")
+		self.manager.disconnect()
+		self.assertEqual(self.gameReceives, [b"Hello"])
+
+	def testManagerFlushDelay(self):
+		written = threading.Event()
+		self.manager.disconnect()
+		self.manager = Manager(lambda data: written.set(), lambda *args: None, flushDelay=0.01)
+		self.manager.connect()
+		self.manager.register(Protocol)
+		self.manager.write(b"Hello")
+		self.assertTrue(written.wait(5.0))
+		self.assertEqual(self.manager.writesIssued, 1)
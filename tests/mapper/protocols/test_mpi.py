@@ -98,6 +98,19 @@ class TestMPIProtocol(TestCase):
 			target=self.mpi.commandMap[b"V"], args=(data,), daemon=True
 		)
 
+	@mock.patch("mapper.protocols.mpi.threading")
+	def testMPIOn_dataReceivedInChunks(self, mockThreading):
+		# The length and body of a message can be split across several chunks of data.
+		body = BODY * 100
+		data = BODY + LF + MPI_INIT + b"V" + b"%d" % len(body) + LF + body + BODY + LF
+		for i in range(len(data)):
+			self.mpi.on_dataReceived(data[i : i + 1])
+		self.assertEqual((self.playerReceives, self.mpi.state), (BODY + LF + BODY + LF, "newline"))
+		mockThreading.Thread.assert_called_once_with(
+			target=self.mpi.commandMap[b"V"], args=(body,), daemon=True
+		)
+		self.assertEqual(self.mpi._MPIBody, b"")
+
 	@mock.patch("mapper.protocols.mpi.removeFile")
 	@mock.patch("mapper.protocols.mpi.subprocess.Popen")
 	@mock.patch("mapper.protocols.mpi.tempfile.NamedTemporaryFile")
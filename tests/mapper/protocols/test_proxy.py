@@ -11,9 +11,10 @@ import socket
 from unittest import TestCase, mock
 
 # Mapper Modules:
-from mapper import USER_DATA
-from mapper.protocols.mpi import MPI_INIT
-from mapper.protocols.proxy import Game, Player, ProxyHandler, Telnet
+from mapper import MUD_DATA, USER_DATA
+from mapper.protocols.fused import FusedProtocol
+from mapper.protocols.mpi import MPI_INIT, MPIProtocol
+from mapper.protocols.proxy import FusedGame, Game, Player, ProxyHandler, Telnet
 from mapper.protocols.telnet_constants import (
 	CHARSET,
 	CHARSET_ACCEPTED,
@@ -29,6 +30,7 @@ from mapper.protocols.telnet_constants import (
 	SE,
 	WILL,
 )
+from mapper.protocols.xml import XMLProtocol
 
 
 class TestTelnet(TestCase):
@@ -235,6 +237,26 @@ class TestProxyHandler(TestCase):
 		self.proxy.close()
 		self.proxy.disconnect.assert_called_once()
 
+	def testProxyHandlerFusedParser(self):
+		self.assertEqual([type(handler) for handler in self.proxy.game._handlers][1:], [MPIProtocol, XMLProtocol])
+		proxy = ProxyHandler(
+			mock.Mock(spec=socket.socket),
+			mock.Mock(spec=socket.socket),
+			outputFormat="normal",
+			promptTerminator=IAC + GA,
+			isEmulatingOffline=False,
+			isFusedParser=True,
+			mapperCommands=[],
+			eventCaller=self.mapperEvents.append,
+		)
+		self.assertEqual(len(proxy.game._handlers), 1)
+		self.assertIsInstance(proxy.game._handlers[0], FusedGame)
+		self.assertIsInstance(proxy.game._handlers[0], FusedProtocol)
+		proxy.connect()
+		proxy.game.parse(b"<prompt>Hungry&gt;</prompt>" + IAC + GA)
+		self.assertEqual(self.mapperEvents, [(MUD_DATA, ("prompt", b"Hungry>"))])
+		proxy.disconnect()
+
 	def testProxyHandlerOn_playerReceived(self):
 		data = b"Hello world!"
 		self.proxy.isEmulatingOffline = False
@@ -0,0 +1,124 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+
+# Future Modules:
+from __future__ import annotations
+
+# Built-in Modules:
+import itertools
+import json
+import pickle
+import random
+from unittest import TestCase
+from unittest.mock import patch
+
+# Mapper Modules:
+from mapper.roomdata.distances import (
+	NO_HOP,
+	LabelDistances,
+	buildLabelDistances,
+	graphFingerprint,
+	pairwiseCosts,
+	shortestTour,
+)
+from mapper.roomdata.graph import INFINITY, Graph, ShortestPathTree
+
+# Local Modules:
+from .test_zones import createGrid
+
+
+class TestLabelDistances(TestCase):
+	def setUp(self):
+		self.rooms = createGrid(12, 10)
+		self.graph = Graph(self.rooms, version=3)
+		self.vnums = ["0", "17", "55", "119", "64"]
+
+	def assertMatchesDijkstra(self, table):
+		graph = self.graph
+		for origin in table.vnums:
+			tree = ShortestPathTree(graph, graph.indices[origin])
+			tree.settle()
+			for destination in table.vnums:
+				expected = tree.distances[graph.indices[destination]]
+				self.assertAlmostEqual(table.distance(origin, destination), expected)
+				edges = table.edgePath(graph, graph.indices[origin], destination)
+				if expected == INFINITY:
+					self.assertIsNone(edges)
+				else:
+					self.assertAlmostEqual(sum(graph.costs[edge] for edge in edges), expected)
+
+	def testBuildLabelDistances(self):
+		table = buildLabelDistances(self.graph, self.vnums + ["0", "nonexistent"], maxWorkers=0)
+		self.assertEqual(table.vnums, sorted(self.vnums))
+		self.assertEqual(table.version, 3)
+		self.assertEqual(table.fingerprint, graphFingerprint(self.graph))
+		self.assertIsNone(table.distance("0", "1"))
+		self.assertEqual(table.nextHops["0"][self.graph.indices["0"]], NO_HOP)
+		self.assertMatchesDijkstra(table)
+
+	def testBuildLabelDistancesInWorkers(self):
+		table = buildLabelDistances(self.graph, self.vnums, maxWorkers=2)
+		self.assertEqual(table.toJSON(), buildLabelDistances(self.graph, self.vnums, maxWorkers=0).toJSON())
+
+	def testIncrementalRefresh(self):
+		previous = buildLabelDistances(self.graph, self.vnums[:3], maxWorkers=0)
+		table = buildLabelDistances(self.graph, self.vnums[1:], previous, maxWorkers=0)
+		self.assertIs(table.nextHops["17"], previous.nextHops["17"])
+		self.assertMatchesDijkstra(table)
+		# A modified map invalidates every row of the table.
+		self.rooms["17"].exits.clear()
+		self.graph = Graph(self.rooms, version=4)
+		self.assertNotEqual(graphFingerprint(self.graph), previous.fingerprint)
+		table = buildLabelDistances(self.graph, self.vnums, table, maxWorkers=0)
+		self.assertIsNot(table.nextHops["17"], previous.nextHops["17"])
+		self.assertMatchesDijkstra(table)
+
+	def testJSON(self):
+		table = buildLabelDistances(self.graph, self.vnums, maxWorkers=0)
+		loaded = LabelDistances.fromJSON(json.loads(json.dumps(table.toJSON())), version=5)
+		self.assertEqual(loaded.version, 5)
+		self.assertEqual(loaded.vnums, table.vnums)
+		self.assertEqual(loaded.distances, table.distances)
+		self.assertEqual(loaded.nextHops, table.nextHops)
+
+	def testPickledGraph(self):
+		graph = pickle.loads(pickle.dumps(self.graph))
+		self.assertEqual(graph.rooms, [])
+		self.assertEqual(graphFingerprint(graph), graphFingerprint(self.graph))
+
+	def testPairwiseCosts(self):
+		table = buildLabelDistances(self.graph, self.vnums, maxWorkers=0)
+		indices = [self.graph.indices[vnum] for vnum in table.vnums]
+		rows = pairwiseCosts(self.graph, indices, indices, maxWorkers=0)
+		for origin, row in zip(table.vnums, rows):
+			for destination, cost in zip(table.vnums, row):
+				self.assertAlmostEqual(cost, table.distance(origin, destination))
+		# A few origins are searched without starting the worker processes.
+		with patch("mapper.roomdata.distances.ProcessPoolExecutor") as executor:
+			self.assertEqual(pairwiseCosts(self.graph, indices, indices), rows)
+		executor.assert_not_called()
+
+
+class TestShortestTour(TestCase):
+	def testShortestTour(self):
+		rng = random.Random(0)
+		for size in range(1, 8):
+			costs = [[0.0 if i == j else rng.uniform(1, 100) for j in range(size)] for i in range(size)]
+			order = shortestTour(costs)
+			self.assertEqual(order[0], 0)
+			self.assertEqual(sorted(order), list(range(size)))
+			cost = sum(costs[a][b] for a, b in zip(order, order[1:]))
+			best = min(
+				sum(costs[a][b] for a, b in zip((0, *rest), rest))
+				for rest in itertools.permutations(range(1, size))
+			)
+			# Local search is not guaranteed to find the best order, but should come close on small inputs.
+			self.assertLessEqual(cost, best * 1.2)
+
+	def testShortestTourImprovesNearestNeighbour(self):
+		# Going to the nearest room first leaves a long trip back across the line.
+		positions = [0, 1, -2, 10]
+		costs = [[abs(a - b) for b in positions] for a in positions]
+		self.assertEqual(shortestTour(costs), [0, 2, 1, 3])
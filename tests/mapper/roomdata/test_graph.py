@@ -0,0 +1,259 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+
+# Future Modules:
+from __future__ import annotations
+
+# Built-in Modules:
+import random
+from array import array
+from unittest import TestCase
+
+# Mapper Modules:
+from mapper.roomdata.graph import (
+	DARK_NIGHT_COST,
+	DIRECTIONS,
+	EDGE_COST_PROFILES,
+	EVIL_NIGHT_COST,
+	EXIT_FLAG_BITS,
+	INFINITY,
+	Components,
+	Graph,
+	ShortestPathTree,
+)
+from mapper.roomdata.objects import TERRAIN_COSTS, Exit, Room
+
+
+def createRooms(*links, terrain="road"):
+	"""Creates rooms from (vnum, direction, to, exitFlags) tuples."""
+	rooms = {}
+	for vnum, direction, to, exitFlags in links:
+		for item in (vnum, to):
+			if item.isdigit() and item not in rooms:
+				rooms[item] = Room(item)
+				rooms[item].terrain = terrain
+				rooms[item].calculateCost()
+		exitObj = Exit()
+		exitObj.direction = direction
+		exitObj.vnum = vnum
+		exitObj.to = to
+		exitObj.exitFlags.update(exitFlags)
+		rooms[vnum].exits[direction] = exitObj
+	return rooms
+
+
+class TestGraph(TestCase):
+	def setUp(self):
+		self.rooms = createRooms(
+			("0", "east", "1", ()),
+			("1", "west", "0", ()),
+			("1", "north", "2", ("door",)),
+			("2", "south", "1", ("door",)),
+			("2", "east", "undefined", ()),
+			("2", "up", "death", ()),
+			("0", "down", "99", ()),
+		)
+		del self.rooms["99"]  # Leave a dangling exit.
+		self.rooms["2"].terrain = "water"
+		self.rooms["2"].calculateCost()
+		self.graph = Graph(self.rooms, version=7)
+
+	def testGraphLayout(self):
+		graph = self.graph
+		self.assertEqual(len(graph), 3)
+		self.assertEqual(graph.version, 7)
+		self.assertEqual(graph.vnums, ["0", "1", "2"])
+		self.assertEqual(list(graph.offsets), [0, 1, 3, 4])
+		self.assertEqual(list(graph.sources), [0, 1, 1, 2])
+		self.assertEqual(list(graph.targets), [1, 0, 2, 1])
+		self.assertEqual([DIRECTIONS[i] for i in graph.directions], ["east", "west", "north", "south"])
+		self.assertTrue(graph.flags[2] & EXIT_FLAG_BITS["door"])
+		self.assertFalse(graph.flags[0] & EXIT_FLAG_BITS["door"])
+		self.assertEqual(list(graph.reverseOffsets), [0, 1, 3, 4])
+		self.assertEqual([graph.targets[edge] for edge in graph.reverseEdges], [0, 1, 1, 2])
+
+	def testGraphCosts(self):
+		graph = self.graph
+		road = self.rooms["0"].cost
+		water = self.rooms["2"].cost
+		self.assertEqual(list(graph.costs), [road, road, water + 5.0, road + 5.0])
+		self.assertIs(graph.edgeCosts(frozenset()), graph.costs)
+		self.assertEqual(list(graph.edgeCosts(frozenset(["water"]))), [road, road, water + 15.0, road + 5.0])
+
+	def testEdgeCostsAtNight(self):
+		self.rooms["0"].light = "dark"
+		self.rooms["2"].align = "evil"
+		graph = Graph(self.rooms)
+		self.assertEqual(list(graph.nightCosts), [DARK_NIGHT_COST, 0.0, EVIL_NIGHT_COST])
+		self.assertIs(graph.edgeCosts(frozenset(), "DAY"), graph.costs)
+		night = graph.edgeCosts(frozenset(), "NIGHT")
+		self.assertIs(graph.edgeCosts(frozenset(), "NIGHT"), night)
+		self.assertEqual(
+			list(night), [cost + graph.nightCosts[target] for cost, target in zip(graph.costs, graph.targets)]
+		)
+		dawn = graph.edgeCosts(frozenset(["water"]), "DAWN")
+		self.assertEqual(dawn[2], graph.costs[2] + 10.0 + EVIL_NIGHT_COST / 2)
+		self.assertEqual(dawn[1], graph.costs[1] + DARK_NIGHT_COST / 2)
+
+	def testEdgeCostsCache(self):
+		graph = self.graph
+		profiles = [frozenset([terrain]) for terrain in list(TERRAIN_COSTS)[: EDGE_COST_PROFILES + 1]]
+		costs = graph.edgeCosts(profiles[0])
+		self.assertIs(graph.edgeCosts(frozenset(profiles[0])), costs)
+		for profile in profiles[1:-1]:
+			graph.edgeCosts(profile)
+		# Using the first profile again keeps it from being the least recently used.
+		self.assertIs(graph.edgeCosts(profiles[0]), costs)
+		graph.edgeCosts(profiles[-1])
+		self.assertIs(graph.edgeCosts(profiles[0]), costs)
+		self.assertNotIn((profiles[1], "DAY"), graph._edgeCosts)
+		self.assertEqual(len(graph._edgeCosts), EDGE_COST_PROFILES)
+
+
+class TestComponents(TestCase):
+	def testComponents(self):
+		# Rooms 0, 1, and 2 form a loop, with a one-way exit into 3 and 4, which lead to each other.
+		rooms = createRooms(
+			("0", "east", "1", ()),
+			("1", "east", "2", ()),
+			("2", "east", "0", ()),
+			("2", "down", "3", ()),
+			("3", "east", "4", ()),
+			("4", "west", "3", ()),
+			("5", "north", "0", ()),
+		)
+		rooms["6"] = Room("6")
+		graph = Graph(rooms)
+		components = Components(graph)
+		self.assertEqual(len(components), 4)
+		self.assertEqual(components.component[0], components.component[2])
+		self.assertNotEqual(components.component[2], components.component[3])
+		self.assertTrue(components.isReachable(5, 4))
+		self.assertTrue(components.isReachable(3, 3))
+		self.assertFalse(components.isReachable(3, 0))
+		self.assertFalse(components.isReachable(0, 5))
+		self.assertEqual([sorted(components.members[number]) for number in components.traps()], [[3, 4]])
+		self.assertEqual(components.orphans(), [6])
+
+	def testComponentsMatchSearch(self):
+		rng = random.Random(1)
+		links = [
+			(str(i), direction, str(rng.randrange(80)), ())
+			for i in range(80)
+			for direction in DIRECTIONS
+			if rng.random() < 0.25
+		]
+		graph = Graph(createRooms(*links))
+		components = Components(graph)
+		for origin in range(len(graph)):
+			tree = ShortestPathTree(graph, origin)
+			tree.settle()
+			for destination in range(len(graph)):
+				self.assertEqual(components.isReachable(origin, destination), bool(tree.settled[destination]))
+
+	def testLongChain(self):
+		# The depth of the search is not limited by the recursion limit.
+		links = [(str(i), "north", str(i + 1), ()) for i in range(5000)]
+		components = Components(Graph(createRooms(*links)))
+		self.assertEqual(len(components), 5001)
+		self.assertTrue(components.isReachable(0, 5000))
+		self.assertFalse(components.isReachable(5000, 0))
+
+
+class TestShortestPathTree(TestCase):
+	def setUp(self):
+		# Two routes from 0 to 3: 0 -> 1 -> 3 through a door, or 0 -> 2 -> 4 -> 3.
+		rooms = createRooms(
+			("0", "north", "1", ()),
+			("1", "north", "3", ("door",)),
+			("0", "east", "2", ()),
+			("2", "north", "4", ()),
+			("4", "west", "3", ()),
+			("5", "south", "0", ()),
+		)
+		self.graph = Graph(rooms)
+
+	def testSettle(self):
+		graph = self.graph
+		tree = ShortestPathTree(graph, graph.indices["0"])
+		goal = tree.settle(frozenset([graph.indices["3"]]))
+		self.assertEqual(graph.vnums[goal], "3")
+		edges = tree.edgePath(goal)
+		self.assertEqual([DIRECTIONS[graph.directions[edge]] for edge in edges], ["east", "north", "west"])
+		self.assertAlmostEqual(tree.distances[goal], sum(graph.costs[edge] for edge in edges))
+
+	def testSettleUnreachable(self):
+		graph = self.graph
+		tree = ShortestPathTree(graph, graph.indices["0"])
+		self.assertIsNone(tree.settle(frozenset([graph.indices["5"]])))
+		self.assertFalse(tree.settled[graph.indices["5"]])
+		self.assertTrue(all(tree.settled[graph.indices[vnum]] for vnum in ("0", "1", "2", "3", "4")))
+
+	def testWithin(self):
+		graph = self.graph
+		tree = ShortestPathTree(graph, graph.indices["0"])
+		cost = graph.rooms[0].cost
+		self.assertEqual(sorted(graph.vnums[room] for room in tree.within(cost)), ["0", "1", "2"])
+		# Rooms beyond the budget are left for later searches.
+		self.assertFalse(tree.settled[graph.indices["4"]])
+		self.assertEqual(sorted(graph.vnums[room] for room in tree.within(2 * cost)), ["0", "1", "2", "4"])
+		self.assertEqual(len(tree.within(INFINITY)), 5)
+		self.assertEqual(tree.within(-1), [])
+
+	def testNearest(self):
+		graph = self.graph
+		tree = ShortestPathTree(graph, graph.indices["0"])
+		self.assertEqual(graph.vnums[tree.nearest(frozenset([graph.indices["4"]]))], "4")
+		# Both goals are already settled, so the nearest is chosen by distance rather than settle order.
+		goals = frozenset([graph.indices["4"], graph.indices["1"]])
+		self.assertEqual(graph.vnums[tree.nearest(goals)], "1")
+		self.assertEqual(graph.vnums[tree.nearest(frozenset([graph.indices["3"]]))], "3")
+		self.assertIsNone(tree.nearest(frozenset([graph.indices["5"]])))
+
+	def testReverseSettle(self):
+		graph = self.graph
+		tree = ShortestPathTree(graph, graph.indices["3"], reverse=True)
+		goal = tree.nearest(frozenset([graph.indices["0"]]))
+		self.assertEqual(graph.vnums[goal], "0")
+		edges = tree.edgePath(goal)
+		self.assertEqual([DIRECTIONS[graph.directions[edge]] for edge in edges], ["east", "north", "west"])
+		self.assertEqual(graph.sources[edges[0]], graph.indices["0"])
+		self.assertEqual(graph.targets[edges[-1]], graph.indices["3"])
+
+	def testBlockEdge(self):
+		graph = self.graph
+		tree = ShortestPathTree(graph, graph.indices["3"], reverse=True)
+		origin = tree.nearest(frozenset([graph.indices["0"]]))
+		# Block the exit west from 4 to 3, forcing the route through the door.
+		edge = graph.reverseEdges[graph.reverseOffsets[graph.indices["3"]] + 1]
+		self.assertEqual(graph.vnums[graph.sources[edge]], "4")
+		tree.blockEdge(edge)
+		self.assertIsNot(tree.costs, graph.costs)
+		self.assertEqual(tree.costs[edge], INFINITY)
+		self.assertLess(graph.costs[edge], INFINITY)
+		goal = tree.nearest(frozenset([origin]))
+		edges = tree.edgePath(goal)
+		self.assertEqual([DIRECTIONS[graph.directions[edge]] for edge in edges], ["north", "north"])
+
+	def testBlockEdgeMatchesNewSearch(self):
+		rng = random.Random(0)
+		links = []
+		for i in range(60):
+			for direction in DIRECTIONS:
+				if rng.random() < 0.5:
+					links.append((str(i), direction, str(rng.randrange(60)), ("door",) if rng.random() < 0.2 else ()))
+		graph = Graph(createRooms(*links))
+		for reverse in (False, True):
+			tree = ShortestPathTree(graph, 0, reverse=reverse)
+			costs = array("d", graph.costs)
+			for _ in range(20):
+				tree.settle(frozenset([rng.randrange(len(graph))]))
+				edge = rng.randrange(len(costs))
+				tree.blockEdge(edge)
+				costs[edge] = INFINITY
+			tree.settle()
+			expected = ShortestPathTree(graph, 0, costs, reverse=reverse)
+			expected.settle()
+			self.assertEqual(tree.distances, expected.distances)
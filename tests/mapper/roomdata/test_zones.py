@@ -0,0 +1,116 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+
+# Future Modules:
+from __future__ import annotations
+
+# Built-in Modules:
+import random
+from unittest import TestCase
+
+# Mapper Modules:
+from mapper.roomdata.graph import Graph, ShortestPathTree
+from mapper.roomdata import zones
+from mapper.roomdata.objects import TERRAIN_COSTS, Exit, Room
+from mapper.roomdata.zones import Zones
+
+
+def createGrid(width, height, seed=0):
+	"""Creates a grid of rooms with random terrains, and some missing or one way exits."""
+	rng = random.Random(seed)
+	terrains = list(TERRAIN_COSTS)
+	rooms = {}
+	for y in range(height):
+		for x in range(width):
+			roomObj = Room(str(y * width + x))
+			roomObj.x, roomObj.y = x, y
+			roomObj.terrain = rng.choice(terrains)
+			roomObj.calculateCost()
+			rooms[roomObj.vnum] = roomObj
+	for roomObj in rooms.values():
+		for direction, dx, dy in (("north", 0, 1), ("east", 1, 0), ("south", 0, -1), ("west", -1, 0)):
+			x, y = roomObj.x + dx, roomObj.y + dy
+			if 0 <= x < width and 0 <= y < height and rng.random() < 0.85:
+				exitObj = Exit()
+				exitObj.direction = direction
+				exitObj.vnum = roomObj.vnum
+				exitObj.to = str(y * width + x)
+				if rng.random() < 0.1:
+					exitObj.exitFlags.add("door")
+				roomObj.exits[direction] = exitObj
+	return rooms
+
+
+class TestZones(TestCase):
+	def setUp(self):
+		self.sparseRatio = zones.SPARSE_RATIO
+		self.rooms = createGrid(24, 18)
+		self.zones = Zones(size=5)
+		zones.SPARSE_RATIO = 0  # Always search through the zones.
+
+	def tearDown(self):
+		zones.SPARSE_RATIO = self.sparseRatio
+
+	def assertMatchesDijkstra(self, graph, pairs):
+		for origin, destination in pairs:
+			tree = ShortestPathTree(graph, origin)
+			found = tree.settle(frozenset([destination]))
+			edges = self.zones.findPath(graph, origin, destination)
+			if found is None:
+				self.assertIsNone(edges)
+				continue
+			self.assertIsNotNone(edges)
+			self.assertEqual(graph.sources[edges[0]], origin)
+			self.assertEqual(graph.targets[edges[-1]], destination)
+			for edge, nextEdge in zip(edges, edges[1:]):
+				self.assertEqual(graph.targets[edge], graph.sources[nextEdge])
+			self.assertAlmostEqual(sum(graph.costs[edge] for edge in edges), tree.distances[destination])
+
+	def testFindPath(self):
+		graph = Graph(self.rooms)
+		rng = random.Random(1)
+		pairs = [(rng.randrange(len(graph)), rng.randrange(len(graph))) for _ in range(40)]
+		self.assertMatchesDijkstra(graph, pairs)
+		# Searching again uses the cached costs.
+		self.assertMatchesDijkstra(graph, pairs)
+
+	def testInvalidate(self):
+		graph = Graph(self.rooms, version=1)
+		self.zones.findPath(graph, 0, len(graph) - 1)
+		cached = dict(self.zones._rows)
+		self.assertTrue(cached)
+		modified = self.rooms["130"]
+		modified.terrain = "deathtrap"
+		modified.calculateCost()
+		self.zones.invalidate(2, ["130"], self.rooms)
+		modifiedZone = self.zones.zoneOf(modified)
+		self.assertFalse(any(zone == modifiedZone for zone, row in self.zones._rows.values()))
+		self.assertTrue(any(zone != modifiedZone for zone, row in self.zones._rows.values()))
+		graph = Graph(self.rooms, version=2)
+		rng = random.Random(2)
+		pairs = [(rng.randrange(len(graph)), rng.randrange(len(graph))) for _ in range(20)]
+		self.assertMatchesDijkstra(graph, pairs)
+		self.zones.invalidate(3, [], self.rooms)
+		self.assertFalse(self.zones._rows)
+
+	def testInvalidateMovedRoom(self):
+		graph = Graph(self.rooms, version=1)
+		self.zones.findPath(graph, 0, len(graph) - 1)
+		moved = self.rooms["0"]
+		oldZone = self.zones.zoneOf(moved)
+		moved.x = 12
+		self.zones.invalidate(2, ["0"], self.rooms)
+		cachedZones = {zone for zone, row in self.zones._rows.values()}
+		self.assertNotIn(oldZone, cachedZones)
+		self.assertNotIn(self.zones.zoneOf(moved), cachedZones)
+
+	def testDenseZones(self):
+		# Zones of a single room are linked too densely for searching through them to be worthwhile.
+		zones.SPARSE_RATIO = self.sparseRatio
+		self.zones = Zones(size=1)
+		graph = Graph(self.rooms)
+		self.assertFalse(self.zones.layout(graph).isSparse)
+		self.assertMatchesDijkstra(graph, [(0, len(graph) - 1), (5, 200)])
+		self.assertFalse(self.zones._rows)
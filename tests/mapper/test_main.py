@@ -7,14 +7,24 @@
 from __future__ import annotations
 
 # Built-in Modules:
+import asyncio
 import socket
+import threading
 import unittest
 from queue import Empty, Queue
 from unittest.mock import Mock, call
 
 # Mapper Modules:
 from mapper import MUD_DATA
-from mapper.main import Game
+from mapper.main import (
+	ClientFanOut,
+	EventQueue,
+	Game,
+	ProxyProtocol,
+	SelectorConnection,
+	SelectorLoop,
+	Viewer,
+)
 from mapper.protocols.mpi import MPI_INIT
 from mapper.protocols.proxy import ProxyHandler
 from mapper.protocols.telnet_constants import (
@@ -261,3 +271,239 @@ class TestGameThreadThroughput(unittest.TestCase):
 		]
 		inputDescription = "moving into a room"
 		self.runThroughput(threadInput, expectedOutput, expectedData, inputDescription)
+
+
+class TestEventQueue(unittest.TestCase):
+	def setUp(self):
+		self.loop = asyncio.new_event_loop()
+		self.queue = EventQueue(self.loop)
+
+	def tearDown(self):
+		self.loop.close()
+
+	def testEventQueueGet(self):
+		self.assertTrue(self.queue.empty())
+		self.queue.put("event 1")
+		self.queue.put("event 2")
+		self.assertFalse(self.queue.empty())
+		self.assertEqual(self.loop.run_until_complete(self.queue.get()), "event 1")
+		self.assertEqual(self.loop.run_until_complete(self.queue.get()), "event 2")
+		with self.assertRaises(Empty):
+			self.loop.run_until_complete(self.queue.get(timeout=0.01))
+
+	def testEventQueuePutFromThread(self):
+		thread = threading.Timer(0.01, self.queue.put, args=("event",))
+		thread.start()
+		self.assertEqual(self.loop.run_until_complete(asyncio.wait_for(self.queue.get(), 5.0)), "event")
+		thread.join()
+
+	def testEventQueuePausesReader(self):
+		reader = Mock()
+		queue = EventQueue(self.loop, maxSize=4, policy="block", reader=reader)
+		for i in range(4):
+			queue.put((MUD_DATA, ("line", i)))
+		reader.transport.pause_reading.assert_called_once_with()
+		queue.put((MUD_DATA, ("prompt", b">")))
+		self.assertEqual(queue.qsize(), 5)
+		self.assertEqual(queue.waits, 1)
+		for i in range(2):
+			self.loop.run_until_complete(queue.get())
+		reader.transport.resume_reading.assert_not_called()
+		self.loop.run_until_complete(queue.get())
+		reader.transport.resume_reading.assert_called_once_with()
+
+	def testEventQueueDropsLines(self):
+		queue = EventQueue(self.loop, maxSize=1, policy="drop")
+		queue.put((MUD_DATA, ("line", b"first")))
+		queue.put((MUD_DATA, ("line", b"second")))
+		queue.put((MUD_DATA, ("prompt", b">")))
+		self.assertEqual(self.loop.run_until_complete(queue.get()), (MUD_DATA, ("line", b"first")))
+		self.assertEqual(self.loop.run_until_complete(queue.get()), (MUD_DATA, ("prompt", b">")))
+		self.assertEqual(queue.dropped, {"line": 1})
+
+
+class TestProxyProtocol(unittest.TestCase):
+	def setUp(self):
+		self.loop = asyncio.new_event_loop()
+		self.peer, sock = socket.socketpair()
+		self.peer.settimeout(5.0)
+		transport, self.protocol = self.loop.run_until_complete(
+			self.loop.connect_accepted_socket(lambda: ProxyProtocol(self.loop), sock)
+		)
+
+	def tearDown(self):
+		self.peer.close()
+		self.loop.close()
+
+	def testProxyProtocol(self):
+		manager = Mock()
+		received = self.loop.create_future()
+		manager.parse.side_effect = received.set_result
+		# Data received before a manager is started is held by the connection.
+		self.peer.sendall(b"Hello")
+		self.loop.run_until_complete(asyncio.sleep(0.01))
+		self.assertFalse(received.done())
+		self.protocol.start(manager)
+		self.assertEqual(self.loop.run_until_complete(asyncio.wait_for(received, 5.0)), b"Hello")
+		self.protocol.sendall(b"Hello ")
+		self.protocol.sendmsgall([b"World", b"!"])
+		self.protocol.close()
+		self.loop.run_until_complete(asyncio.wait_for(self.protocol.closed, 5.0))
+		self.assertEqual(self.peer.recv(4096), b"Hello World!")
+		self.assertEqual(self.peer.recv(4096), b"")
+
+
+class TestSelectorLoop(unittest.TestCase):
+	def setUp(self):
+		self.loop = SelectorLoop()
+		self.peer, self.sock = socket.socketpair()
+		self.peer.settimeout(5.0)
+		self.connection = SelectorConnection(self.loop, self.sock)
+		self.loop.add(self.connection)
+
+	def tearDown(self):
+		self.loop.close()
+		self.peer.close()
+		self.sock.close()
+
+	def testSelectorConnection(self):
+		received = []
+		manager = Mock()
+		manager.parse.side_effect = received.append
+		self.connection.start(manager)
+		self.peer.sendall(b"Hello")
+		self.loop.run(lambda: received)
+		self.assertEqual(received, [b"Hello"])
+		# Data is written from other threads while the loop runs.
+		thread = threading.Thread(target=self.loop.run, args=(lambda: self.connection.closed,))
+		thread.start()
+		self.connection.sendall(b"Hello ")
+		self.connection.sendmsgall([b"World", b"!"])
+		data = b""
+		while len(data) < len(b"Hello World!"):
+			data += self.peer.recv(4096)
+		self.assertEqual(data, b"Hello World!")
+		# The connection is closed when peer disconnects.
+		self.peer.shutdown(socket.SHUT_WR)
+		thread.join(5.0)
+		self.assertFalse(thread.is_alive())
+
+	def testSelectorConnectionSendsWhenWritable(self):
+		data = b"x" * 2 ** 22
+		self.connection.sendall(data)
+		self.assertTrue(self.connection.isSending)
+		received = bytearray()
+
+		def read():
+			while len(received) < len(data):
+				received.extend(self.peer.recv(2 ** 16))
+
+		reader = threading.Thread(target=read)
+		reader.start()
+		self.loop.run(lambda: not self.connection.isSending)
+		reader.join()
+		self.assertEqual(received, data)
+
+	def testSelectorConnectionBufferFull(self):
+		self.connection.bufferSize = 2 ** 22
+		self.connection.policy = "drop"
+		data = b"x" * 2 ** 22
+		# The first write is sent until the socket's buffer is full, and the rest is held.
+		self.connection.sendall(data)
+		self.connection.sendall(data)
+		self.assertFalse(self.connection.closed)
+		self.connection.policy = "disconnect"
+		self.connection.sendall(data)
+		self.assertTrue(self.connection.closed)
+		self.assertFalse(self.connection.isSending)
+
+	def testSelectorLoopRefusesConnections(self):
+		listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+		listener.bind(("127.0.0.1", 0))
+		listener.listen(1)
+		self.loop.addListener(listener)
+		client = socket.create_connection(listener.getsockname())
+		client.settimeout(5.0)
+		self.connection.start(Mock())
+		self.peer.close()
+		self.loop.run(lambda: self.connection.closed)
+		self.assertEqual(client.recv(4096), b"")
+		client.close()
+		listener.close()
+
+
+class TestClientFanOut(unittest.TestCase):
+	def setUp(self):
+		self.primary = Mock(spec=["sendall", "sendmsgall"])
+		self.fanOut = ClientFanOut(self.primary)
+
+	def testClientFanOutSend(self):
+		viewer = Mock(isClosed=False)
+		self.assertTrue(self.fanOut.addViewer(viewer, 1))
+		self.fanOut.sendall(b"Hello")
+		self.primary.sendall.assert_called_once_with(b"Hello")
+		viewer.sendmsgall.assert_called_once_with((b"Hello",))
+		self.fanOut.sendmsgall([b"Hello ", b"World!"])
+		self.primary.sendmsgall.assert_called_once_with([b"Hello ", b"World!"])
+		viewer.sendmsgall.assert_called_with([b"Hello ", b"World!"])
+		self.fanOut.close()
+		viewer.close.assert_called_once()
+
+	def testClientFanOutAddViewer(self):
+		viewer = Mock(isClosed=False)
+		self.assertFalse(self.fanOut.addViewer(viewer, 0))
+		self.assertTrue(self.fanOut.addViewer(viewer, 1))
+		self.assertFalse(self.fanOut.addViewer(Mock(isClosed=False), 1))
+		# Closed viewers don't count toward the maximum.
+		viewer.isClosed = True
+		self.assertTrue(self.fanOut.addViewer(Mock(isClosed=False), 1))
+		self.assertEqual(len(self.fanOut.viewers), 1)
+
+
+class TestViewer(unittest.TestCase):
+	def setUp(self):
+		self.peer, self.sock = socket.socketpair()
+		self.peer.settimeout(5.0)
+
+	def tearDown(self):
+		self.peer.close()
+		self.sock.close()
+
+	def read(self):
+		data = b""
+		while True:
+			chunk = self.peer.recv(4096)
+			if not chunk:
+				return data
+			data += chunk
+
+	def testViewer(self):
+		viewer = Viewer(self.sock, "disconnect")
+		viewer.start()
+		viewer.sendmsgall((b"Hello ",))
+		viewer.sendmsgall([b"World", b"!"])
+		viewer.close()
+		self.assertEqual(self.read(), b"Hello World!")
+		viewer.join(5.0)
+		self.assertFalse(viewer.is_alive())
+
+	def testViewerBufferFull(self):
+		# The viewers aren't started, so nothing is sent until the buffer is full.
+		viewer = Viewer(self.sock, "drop", bufferSize=10)
+		viewer.sendmsgall((b"Hello ",))
+		viewer.sendmsgall((b"World!",))
+		viewer.sendmsgall((b"!",))
+		self.assertFalse(viewer.isClosed)
+		viewer.start()
+		viewer.close()
+		self.assertEqual(self.read(), b"Hello !")
+		viewer.join(5.0)
+		peer, sock = socket.socketpair()
+		viewer = Viewer(sock, "disconnect", bufferSize=10)
+		viewer.sendmsgall((b"Hello ",))
+		viewer.sendmsgall((b"World!",))
+		self.assertTrue(viewer.isClosed)
+		peer.settimeout(5.0)
+		self.assertEqual(peer.recv(4096), b"")
+		peer.close()
+		sock.close()
@@ -8,12 +8,19 @@ from __future__ import annotations
 
 # Built-in Modules:
 import socket
+import threading
 import unittest
 from unittest.mock import Mock, call, patch
 
 # Mapper Modules:
-from mapper import MUD_DATA, USER_DATA
+from mapper import MAPPER_DATA, MUD_DATA, USER_DATA
 from mapper.mapper import Mapper
+from mapper.roomdata.distances import buildLabelDistances
+from mapper.roomdata.objects import Exit, Room
+from mapper.world import PathSearch
+
+# Local Modules:
+from .roomdata.test_zones import createGrid
 
 
 class TestMapper(unittest.TestCase):
@@ -100,6 +107,311 @@ class TestMapper(unittest.TestCase):
 			with self.assertRaises(AttributeError):
 				self.mapper.handleUserData(command)
 
+	def testMapper_startSearch(self):
+		callback = Mock()
+		self.mapper.startSearch([], callback)
+		callback.assert_called_once_with([])
+		callback.reset_mock()
+		search = Mock(spec=PathSearch)
+		search.cancelled = threading.Event()
+		self.mapper.startSearch(search, callback)
+		self.assertEqual(
+			self.mapper.queue.get(timeout=1), (MAPPER_DATA, (self.mapper.handleSearchResult, (search, callback)))
+		)
+		search.run.assert_called_once_with()
+		with patch.object(self.mapper, "searchResult", return_value=["north"]) as searchResult:
+			self.mapper.handleSearchResult(search, callback)
+			searchResult.assert_called_once_with(search)
+		callback.assert_called_once_with(["north"])
+		self.assertIsNone(self.mapper.activeSearch)
+
+	def testMapper_startSearch_cancelsPreviousSearch(self):
+		callback = Mock()
+		searches = [Mock(spec=PathSearch), Mock(spec=PathSearch)]
+		for search in searches:
+			search.cancelled = threading.Event()
+			self.mapper.startSearch(search, callback)
+		self.assertTrue(searches[0].cancelled.is_set())
+		self.assertFalse(searches[1].cancelled.is_set())
+		self.assertIs(self.mapper.activeSearch, searches[1])
+		self.mapper.stopRun()
+		self.assertTrue(searches[1].cancelled.is_set())
+		self.assertIsNone(self.mapper.activeSearch)
+		# Results of canceled searches which were already posted are ignored.
+		self.mapper.handleSearchResult(searches[0], callback)
+		callback.assert_not_called()
+
+	def testMapper_handleSearchResult_playerMoved(self):
+		rooms = self.mapper.rooms = createGrid(12, 10)
+		self.mapper._isLabelDistancesLoaded = True
+		self.mapper.labels["target"] = "47"
+		self.mapper.currentRoom = rooms["0"]
+		self.mapper.sendPlayer = Mock()
+		callback = Mock()
+		for prepareSearch in (
+			lambda: self.mapper.pathSearch(destination="target"),
+			lambda: self.mapper.nearestSearch("target"),
+		):
+			self.mapper.startSearch(prepareSearch(), callback)
+			dataType, (function, args) = self.mapper.queue.get(timeout=1)
+			self.mapper.currentRoom = rooms["13"]
+			function(*args)
+			# The search is run again from the room the player moved to.
+			dataType, (function, args) = self.mapper.queue.get(timeout=1)
+			retargeted, callback = args
+			self.assertEqual(retargeted.graph.vnums[retargeted.origin], "13")
+			function(*args)
+			self.assertEqual(
+				callback.mock_calls, [call(self.mapper.pathFind(origin=rooms["13"], destination="47"))]
+			)
+			self.mapper.currentRoom = rooms["0"]
+			callback.reset_mock()
+
+	def testMapper_route(self):
+		rooms = self.mapper.rooms = createGrid(12, 10)
+		self.mapper._isLabelDistancesLoaded = True
+		self.mapper.labels.update({"first": "47", "second": "113", "third": "18"})
+		self.mapper.currentRoom = rooms["0"]
+		self.mapper.sendPlayer = Mock()
+		self.mapper.pathFind = Mock()
+		self.mapper.user_command_route("first second third")
+		# The costs between the stops, and the paths between them, are found on a worker thread.
+		self.mapper.sendPlayer.assert_not_called()
+		dataType, (function, args) = self.mapper.queue.get(timeout=1)
+		self.assertEqual((dataType, function), (MAPPER_DATA, self.mapper.handleRoute))
+		function(*args)
+		result = self.mapper.sendPlayer.call_args.args[0]
+		self.assertTrue(result.startswith("Visiting "))
+		self.mapper.pathFind.assert_not_called()
+		# The costs are cached until the map changes.
+		self.assertEqual(self.mapper.missingPairCosts(["0", "47", "113", "18"])[1], [])
+		self.mapper.sendPlayer.reset_mock()
+		self.mapper.user_command_route("third second first")
+		dataType, (function, args) = self.mapper.queue.get(timeout=1)
+		function(*args)
+		self.mapper.sendPlayer.assert_called_once_with(result)
+		# The route is found again if the player moved while it was being found.
+		self.mapper.sendPlayer.reset_mock()
+		self.mapper.user_command_route("first second third")
+		dataType, (function, args) = self.mapper.queue.get(timeout=1)
+		self.mapper.currentRoom = rooms["1"]
+		function(*args)
+		self.mapper.sendPlayer.assert_not_called()
+		dataType, (function, args) = self.mapper.queue.get(timeout=1)
+		function(*args)
+		self.assertTrue(self.mapper.sendPlayer.call_args.args[0].startswith("Visiting "))
+
+	def testMapper_route_labelTable(self):
+		rooms = self.mapper.rooms = createGrid(12, 10)
+		self.mapper.labels.update({"first": "47", "second": "113", "third": "18"})
+		self.mapper.currentRoom = rooms["0"]
+		self.mapper._isLabelDistancesLoaded = True
+		expected = self.mapper.route("first second third")
+		self.mapper._labelDistances = buildLabelDistances(self.mapper.graph, ["47", "113", "18"], maxWorkers=0)
+		# The legs to labelled rooms are read from the table, and follow the same lowest cost paths.
+		self.assertEqual(self.mapper.route("first second third"), expected)
+
+	def testMapper_walkNextDirection_runWindow(self):
+		self.mapper.sendGame = Mock()
+		self.mapper.sendPlayer = Mock()
+		self.mapper._runWindow = 2
+		self.mapper.autoWalk = True
+		# Directions are popped from the end of the list.
+		self.mapper.autoWalkDirections = ["south", "open door", "east", "north", "north"]
+		self.mapper.walkNextDirection()
+		self.assertEqual(self.mapper.sendGame.mock_calls, [call("n"), call("n")])
+		self.assertEqual(self.mapper.autoWalkPending, ["north", "north"])
+		self.mapper.confirmRunMovement("north")
+		self.mapper.walkNextDirection()
+		self.assertEqual(self.mapper.autoWalkPending, ["north", "east"])
+		# Other commands wait for every movement before them to be confirmed.
+		self.mapper.confirmRunMovement("north")
+		self.mapper.walkNextDirection()
+		self.assertEqual(self.mapper.sendGame.mock_calls[3:], [])
+		self.mapper.confirmRunMovement("east")
+		self.mapper.walkNextDirection()
+		self.assertEqual(self.mapper.sendGame.mock_calls[3:], [call("open door"), call("s")])
+		self.assertFalse(self.mapper.autoWalk)
+		self.mapper.sendPlayer.assert_called_once_with("Arriving at destination.")
+
+	def testMapper_confirmRunMovement_offCourse(self):
+		self.mapper.sendGame = Mock()
+		self.mapper._runWindow = 3
+		self.mapper.autoWalk = True
+		self.mapper.autoWalkDirections = ["west", "west", "north", "north"]
+		self.mapper.walkNextDirection()
+		self.mapper.confirmRunMovement("east")
+		self.assertFalse(self.mapper.autoWalk)
+		self.assertEqual(self.mapper.autoWalkDirections, [])
+		# The movements which were sent after the one off course are still answered by the game.
+		self.assertEqual(self.mapper.autoWalkPending, ["north", "west"])
+
+	def testMapper_run_duringRun(self):
+		self.mapper.rooms = createGrid(4, 3)
+		self.mapper.currentRoom = self.mapper.rooms["0"]
+		self.mapper.isSynced = True
+		self.mapper.sendGame = Mock()
+		self.mapper.sendPlayer = Mock()
+		self.mapper.startSearch = Mock()
+		self.mapper._runWindow = 3
+		self.mapper.autoWalk = True
+		self.mapper.autoWalkDirections = ["north", "east", "east", "east"]
+		self.mapper.walkNextDirection()
+		self.mapper.confirmRunMovement("east")
+		self.mapper.user_command_run("8")
+		self.mapper.startSearch.assert_not_called()
+		self.mapper.sendPlayer.assert_called_once_with("Running once 2 movements are answered.")
+		self.assertFalse(self.mapper.autoWalk)
+		self.assertEqual(self.mapper.autoWalkDirections, [])
+		# The movements of the previous run are not matched with the new one.
+		for vnum in ("2", "3"):
+			self.mapper.currentRoom = self.mapper.rooms[vnum]
+			self.mapper.confirmRunMovement("east")
+			self.mapper.mud_event_prompt("")
+		self.assertEqual(self.mapper.autoWalkPending, [])
+		self.assertIsNone(self.mapper.queuedRun)
+		self.mapper.startSearch.assert_called_once()
+		# The new run starts from the room the previous run ended in.
+		self.assertEqual(self.mapper.startSearch.call_args[0][0].origin, self.mapper.graph.indices["3"])
+
+	def testMapper_interruptRun_pendingMovements(self):
+		self.mapper.rooms = createGrid(4, 3)
+		self.mapper.currentRoom = self.mapper.rooms["0"]
+		self.mapper.isSynced = True
+		self.mapper.autoReplanning = True
+		self.mapper.blockExit = Mock()
+		self.mapper.resumeRun = Mock()
+		self.mapper.sendGame = Mock()
+		self.mapper._runWindow = 3
+		self.mapper.autoWalk = True
+		self.mapper.autoWalkRoute = ("3", frozenset())
+		self.mapper.autoWalkDirections = ["east", "east", "east", "east"]
+		self.mapper.walkNextDirection()
+		self.mapper.confirmRunMovement("east")
+		self.mapper.currentRoom = self.mapper.rooms["1"]
+		self.mapper.interruptRun(isBlocked=True)
+		self.mapper.blockExit.assert_called_once_with(("3", frozenset()), self.mapper.rooms["1"], "east")
+		self.assertTrue(self.mapper.isReplanning)
+		self.assertEqual(self.mapper.autoWalkDirections, [])
+		# The route is replanned once the movement which was sent after the blocked one is answered.
+		self.assertEqual(self.mapper.autoWalkPending, ["east"])
+		self.mapper.mud_event_prompt("")
+		self.mapper.resumeRun.assert_not_called()
+		self.mapper.confirmRunMovement("north")
+		self.assertTrue(self.mapper.isReplanning)
+		self.mapper.mud_event_prompt("")
+		self.mapper.resumeRun.assert_called_once_with()
+
+	def testMapper_desyncRun(self):
+		self.mapper.rooms = createGrid(4, 3)
+		self.mapper.currentRoom = self.mapper.rooms["0"]
+		self.mapper.autoReplanning = True
+		self.mapper.autoWalk = True
+		self.mapper.autoWalkRoute = ("3", frozenset())
+		self.mapper.autoWalkPending = ["east", "east"]
+		self.mapper.movement = "east"
+		self.mapper.mud_event_dynamic("")
+		self.mapper.mud_event_prompt("")
+		self.assertTrue(self.mapper.isReplanning)
+		self.assertEqual(self.mapper.autoWalkPending, [])
+
+	def testMapper_walkNextDirection_runBatching(self):
+		# A line of rooms from west to east, with a door between the third and fourth.
+		rooms = {}
+		for vnum in range(5):
+			roomObj = Room(str(vnum))
+			if vnum:
+				exitObj = Exit()
+				exitObj.direction = "east"
+				exitObj.vnum = str(vnum - 1)
+				exitObj.to = roomObj.vnum
+				rooms[str(vnum - 1)].exits["east"] = exitObj
+			rooms[roomObj.vnum] = roomObj
+		rooms["2"].exits["east"].exitFlags.add("door")
+		self.mapper.rooms = rooms
+		self.mapper.currentRoom = rooms["0"]
+		self.mapper.isSynced = True
+		self.mapper.runBatching = True
+		self.mapper.sendGame = Mock()
+		self.mapper.sendPlayer = Mock()
+		self.mapper.autoWalk = True
+		self.mapper.autoWalkDirections = ["east", "east", "open door east", "east", "east"]
+		self.mapper.walkNextDirection()
+		self.mapper.sendGame.assert_called_once_with("e\r\ne")
+		self.assertEqual(self.mapper.autoWalkPending, ["east", "east"])
+		for vnum in ("1", "2"):
+			self.mapper.currentRoom = rooms[vnum]
+			self.mapper.confirmRunMovement("east")
+			self.mapper.walkNextDirection()
+		self.assertEqual(self.mapper.sendGame.mock_calls[1:], [call("open door east"), call("e")])
+		self.mapper.currentRoom = rooms["3"]
+		self.mapper.confirmRunMovement("east")
+		self.mapper.walkNextDirection()
+		self.assertEqual(self.mapper.sendGame.mock_calls[3:], [call("e")])
+		self.assertFalse(self.mapper.autoWalk)
+
+	@patch("mapper.roomdata.database.dumpRouteUsage")
+	@patch("mapper.roomdata.database.loadRouteUsage", return_value=(None, {"47": 3, "5": 1}))
+	def testMapper_prefetchRoutes(self, loadRouteUsage, dumpRouteUsage):
+		self.mapper.rooms = createGrid(12, 10)
+		self.mapper._isLabelDistancesLoaded = True
+		self.mapper.currentRoom = self.mapper.rooms["0"]
+		self.mapper.isSynced = True
+		self.mapper.sendPlayer = Mock()
+		self.mapper.sendGame = Mock()
+		self.mapper.countRoute("20", frozenset(["city"]))
+		dumpRouteUsage.assert_not_called()
+		self.assertEqual(
+			self.mapper.likelyRoutes(),
+			[("20", frozenset(["city"])), ("47", frozenset()), ("20", frozenset()), ("5", frozenset())],
+		)
+		cancelled = threading.Event()
+		cancelled.set()
+		self.assertTrue(self.mapper.isPrefetchDue)
+		self.assertFalse(self.mapper.prefetchRoutes(cancelled))
+		self.assertTrue(self.mapper.prefetchRoutes())
+		graph = self.mapper.graph
+		self.assertEqual(
+			list(self.mapper._prefetchedRoutes),
+			[(vnum, avoidTerrains, graph.version, "DAY") for vnum, avoidTerrains in self.mapper.likelyRoutes()],
+		)
+		# The next request for a prefetched route uses the finished search.
+		tree = self.mapper._prefetchedRoutes[("47", frozenset(), graph.version, "DAY")]
+		search = self.mapper.pathSearch(destination="47")
+		self.assertIs(search.tree, tree)
+		self.assertNotIn(("47", frozenset(), graph.version, "DAY"), self.mapper._prefetchedRoutes)
+		# Only runs are counted, and the usage is written once the mapper is idle.
+		self.assertEqual(self.mapper.likelyRoutes()[0], ("20", frozenset(["city"])))
+		self.mapper.startRun(self.mapper.searchResult(search.run()))
+		self.assertEqual(self.mapper.likelyRoutes()[0], ("47", frozenset()))
+		self.mapper.prefetchIdle()
+		dumpRouteUsage.assert_called_once_with({"47": 4, "5": 1, "20": 1})
+		self.mapper.saveRouteUsage()
+		dumpRouteUsage.assert_called_once_with({"47": 4, "5": 1, "20": 1})
+
+	def testMapper_exitTarget(self):
+		self.mapper.rooms = createGrid(4, 3)
+		self.mapper.resolveExits()
+		self.mapper.sendPlayer = Mock()
+		self.mapper.GUIRefresh = Mock()
+		rooms = self.mapper.rooms
+		exits = [
+			exitObj for roomObj in rooms.values() for exitObj in roomObj.exits.values() if exitObj.to == "5"
+		]
+		self.assertTrue(exits)
+		for exitObj in exits:
+			self.assertIs(self.mapper.exitTarget(exitObj), rooms["5"])
+		room = rooms["5"]
+		self.mapper.revnum("5 100")
+		for exitObj in exits:
+			self.assertEqual(exitObj.to, "100")
+			self.assertIs(exitObj.target, room)
+		self.mapper.rdelete("100")
+		for exitObj in exits:
+			self.assertEqual(exitObj.to, "undefined")
+			self.assertIsNone(self.mapper.exitTarget(exitObj))
+			self.assertFalse(self.mapper.isBidirectional(exitObj))
+
 
 class TestMapper_handleMudEvent(unittest.TestCase):
 	def setUp(self):
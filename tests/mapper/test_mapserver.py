@@ -0,0 +1,291 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+
+# Future Modules:
+from __future__ import annotations
+
+# Built-in Modules:
+import os.path
+import socket
+import tempfile
+import threading
+import unittest
+from queue import SimpleQueue
+from unittest.mock import Mock, patch
+
+# Mapper Modules:
+from mapper import MAPPER_DATA
+from mapper.mapper import Mapper
+from mapper.mapserver import (
+	MapClient,
+	MapServer,
+	ReadWriteLock,
+	RemoteRooms,
+	WorldView,
+	roomFromDict,
+	roomToDict,
+)
+from mapper.queues import GUIQueue
+from mapper.roomdata.objects import TERRAIN_COSTS
+from mapper.world import DIRECTIONS
+
+# Local Modules:
+from .roomdata.test_zones import createGrid
+
+
+def createServer(address=None):
+	with patch.object(MapServer, "loadRooms"), patch.object(MapServer, "loadLabels"):
+		server = MapServer(address)
+	server.rooms.update(createGrid(6, 6))
+	server.resolveExits()
+	server.labels["corner"] = "35"
+	server.mapChanged()
+	return server
+
+
+class TestReadWriteLock(unittest.TestCase):
+	def testReadersShareTheLock(self):
+		lock = ReadWriteLock()
+		entered = threading.Barrier(2, timeout=1)
+
+		def read():
+			with lock.read():
+				entered.wait()
+
+		reader = threading.Thread(target=read)
+		reader.start()
+		with lock.read():
+			entered.wait()
+		reader.join()
+
+	def testWriterExcludesReaders(self):
+		lock = ReadWriteLock()
+		events = []
+
+		def read():
+			with lock.read():
+				events.append("read")
+
+		with lock.write():
+			reader = threading.Thread(target=read)
+			reader.start()
+			reader.join(0.1)
+			self.assertTrue(reader.is_alive())
+			events.append("written")
+		reader.join(1)
+		self.assertEqual(events, ["written", "read"])
+
+
+class TestWorldView(unittest.TestCase):
+	def setUp(self):
+		self.server = createServer()
+
+	def testSessionState(self):
+		first = WorldView(self.server)
+		second = WorldView(self.server)
+		first.currentRoom = self.server.rooms["0"]
+		second.currentRoom = self.server.rooms["35"]
+		self.assertIsNone(self.server.currentRoom)
+		self.assertIs(first.currentRoom, self.server.rooms["0"])
+		self.assertTrue(first.sync(vnum="corner"))
+		self.assertIs(first.currentRoom, self.server.rooms["35"])
+		self.assertFalse(second.isSynced)
+		self.assertEqual(first._outputLines, ["Synced to room  with vnum 35"])
+		self.assertEqual(second._outputLines, [])
+
+	def testEditsAreShared(self):
+		view = WorldView(self.server)
+		view.currentRoom = self.server.rooms["7"]
+		version = self.server.mapVersion
+		view.rnote("A shared note.")
+		view.mapChanged("7")
+		self.assertEqual(self.server.rooms["7"].note, "A shared note.")
+		self.assertEqual(self.server.mapVersion, version + 1)
+		self.assertNotIn("mapVersion", view.__dict__)
+
+	def testCostPeriod(self):
+		view = WorldView(self.server)
+		self.assertEqual(view.costPeriod(), "DAY")
+		view._costPeriod = "NIGHT"
+		self.assertEqual(view.costPeriod(), "NIGHT")
+		self.assertEqual(self.server.costPeriod(), "DAY")
+
+
+class TestRoomDicts(unittest.TestCase):
+	def testRoundTrip(self):
+		roomObj = createGrid(2, 2)["0"]
+		roomObj.note = "note"
+		roomObj.mobFlags.add("rent")
+		copied = roomFromDict(roomToDict(roomObj))
+		self.assertEqual(roomToDict(copied), roomToDict(roomObj))
+		self.assertEqual(copied.cost, roomObj.cost)
+
+
+class TestRemoteRooms(unittest.TestCase):
+	def setUp(self):
+		self.server = createServer()
+		self.client = Mock()
+		self.client.request.side_effect = lambda command, vnum=None: (
+			[],
+			roomToDict(self.server.rooms[vnum]) if vnum in self.server.rooms else None,
+		)
+		self.rooms = RemoteRooms(self.client, size=2)
+
+	def testFetchesRooms(self):
+		self.assertEqual(self.rooms["1"].vnum, "1")
+		self.assertIs(self.rooms["1"], self.rooms["1"])
+		self.assertNotIn("undefined", self.rooms)
+		self.assertNotIn("undefined", self.rooms)
+		self.assertEqual(self.client.request.call_count, 2)
+
+	def testKeepsRecentRooms(self):
+		first = self.rooms["0"]
+		self.rooms["1"]
+		self.rooms["0"]
+		self.rooms["2"]
+		self.assertEqual(list(self.rooms), ["0", "2"])
+		self.rooms.clear()
+		self.assertEqual(len(self.rooms), 0)
+		self.assertIsNot(self.rooms["0"], first)
+
+
+@unittest.skipUnless(hasattr(socket, "AF_UNIX"), "Unix sockets are not supported.")
+class TestMapServer(unittest.TestCase):
+	def setUp(self):
+		self.directory = tempfile.TemporaryDirectory()
+		self.address = os.path.join(self.directory.name, "mapserver.sock")
+		self.server = createServer(self.address)
+		self.server.output = Mock()
+		self.thread = threading.Thread(target=self.server.serve, args=(self.server.listen(),))
+		self.thread.start()
+		self.changes = SimpleQueue()
+		self.first = MapClient(self.address, onMapChanged=lambda: self.changes.put("first"))
+		self.second = MapClient(self.address, onMapChanged=lambda: self.changes.put("second"))
+
+	def tearDown(self):
+		self.first.close()
+		self.second.close()
+		self.server.close()
+		self.thread.join(2)
+		self.directory.cleanup()
+
+	def testReads(self):
+		output, vnum = self.first.request("syncRoom", None, None, "corner")
+		self.assertEqual(vnum, "35")
+		self.assertEqual(output, ["Synced to room  with vnum 35"])
+		output, roomDict = self.first.request("roomData", vnum="35")
+		self.assertEqual(roomDict, roomToDict(self.server.rooms["35"]))
+		output, (directions, route) = self.second.request("findRoute", "corner", ["noroad"], vnum="0")
+		self.assertTrue(directions)
+		self.assertEqual(route, ["35", ["road"]])
+		output, result = self.second.request("not_a_command")
+		self.assertEqual(output, ["Error: unknown command 'not_a_command'."])
+
+	def testConcurrentReads(self):
+		# Each query uses different edge costs, so the shared caches of derived data keep changing.
+		queries = [
+			(command, argString, period)
+			for terrain in sorted(TERRAIN_COSTS)
+			for period in ("DAY", "DAWN", "NIGHT")
+			for command, argString in (("path", f"corner no{terrain}"), ("route", "corner 14 20"))
+		]
+		expected = [self.first.request(command, args, vnum="0", period=period) for command, args, period in queries]
+		self.assertTrue(all(result for output, result in expected))
+		self.server.mapChanged()
+		clients = [MapClient(self.address) for _ in range(4)]
+		results = [None] * len(clients)
+
+		def request(i):
+			results[i] = [
+				clients[i].request(command, args, vnum="0", period=period) for command, args, period in queries
+			]
+
+		threads = [threading.Thread(target=request, args=(i,)) for i in range(len(clients))]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join(10)
+		for client in clients:
+			client.close()
+		for result in results:
+			self.assertEqual(result, expected)
+
+	def testEditsArePushed(self):
+		# A session is known to the server once its first request is answered.
+		self.second.request("roomData", vnum="14")
+		output, result = self.first.request("rnote", "A note for everyone.", vnum="14")
+		self.assertEqual(output, [])
+		self.assertEqual(result, "Room note now set to 'A note for everyone.'.")
+		self.assertEqual(self.server.rooms["14"].note, "A note for everyone.")
+		self.assertEqual(sorted([self.changes.get(timeout=1), self.changes.get(timeout=1)]), ["first", "second"])
+		output, roomDict = self.second.request("roomData", vnum="14")
+		self.assertEqual(roomDict["note"], "A note for everyone.")
+
+	def testDisconnect(self):
+		self.server.close()
+		self.thread.join(2)
+		self.first.close()
+		self.assertEqual(
+			self.first.request("roomData", vnum="0"), (["Error: not connected to the map server."], None)
+		)
+		self.assertFalse(os.path.exists(self.address))
+
+	def testMapperSession(self):
+		mapper = Mapper(
+			playerSocket=Mock(spec=socket.socket),
+			gameSocket=Mock(spec=socket.socket),
+			outputFormat=None,
+			interface="text",
+			promptTerminator=None,
+			gagPrompts=None,
+			findFormat="{vnum}",
+			isEmulatingOffline=None,
+			mapServer=self.address,
+		)
+		mapper.sendPlayer = Mock()
+		try:
+			self.assertIsInstance(mapper.rooms, RemoteRooms)
+			self.assertEqual(list(mapper.rooms), ["0"])
+			self.assertTrue(mapper.sync(vnum="corner"))
+			self.assertEqual(mapper.currentRoom.vnum, "35")
+			self.assertIsNot(mapper.currentRoom, self.server.rooms["35"])
+			mapper.handleUserData(b"rnote Shared.")
+			self.assertEqual(self.server.rooms["35"].note, "Shared.")
+			mapper.sendPlayer.assert_called_with("Room note now set to 'Shared.'.")
+			dataType, (function, args) = mapper.queue.get(timeout=1)
+			self.assertEqual((dataType, function), (MAPPER_DATA, mapper.handleMapChanged))
+			function(*args)
+			self.assertEqual(mapper.currentRoom.note, "Shared.")
+			mapper.sync(vnum="0")
+			self.assertTrue(mapper.pathFind(destination="corner"))
+			self.assertEqual(mapper.rooms.keys(), {"0", "35"})
+			# The route is known to the session, so that a run can be replanned.
+			self.assertEqual(mapper.lastRoute, ("35", frozenset()))
+			mapper.sendGame = Mock()
+			mapper.handleUserData(b"run corner")
+			self.assertEqual(mapper.autoWalkRoute, ("35", frozenset()))
+			mapper.stopRun()
+			mapper.sync(vnum="14")
+			commands = mapper.pathFind(destination="corner")
+			direction = next(command for command in reversed(commands) if command in DIRECTIONS)
+			mapper.blockExit(mapper.lastRoute, mapper.currentRoom, direction)
+			replanned = mapper.replanSearch(mapper.lastRoute)
+			self.assertNotEqual(next(command for command in reversed(replanned) if command in DIRECTIONS), direction)
+			# Reachable rooms are tinted in the GUI of the session.
+			view = WorldView(self.server)
+			view.currentRoom = self.server.rooms["14"]
+			message, vnums = view.reachableRooms("5")
+			mapper._interface = "hc"
+			mapper._gui_queue = GUIQueue()
+			mapper.handleUserData(b"reach 5")
+			mapper.sendPlayer.assert_called_with(message)
+			self.assertEqual(mapper._gui_queue.get_nowait(), ("on_reach", frozenset(vnums)))
+		finally:
+			mapper.mapClient.close()
+			mapper.proxy.close()
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,117 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+
+# Future Modules:
+from __future__ import annotations
+
+# Built-in Modules:
+import threading
+import unittest
+from queue import Empty
+
+# Mapper Modules:
+from mapper import MAPPER_DATA, MUD_DATA, USER_DATA
+from mapper.mapper import isMapperLine
+from mapper.queues import GUIQueue, ThreadEventQueue, isDroppable
+
+
+LINE = (MUD_DATA, ("line", b"A spammy line."))
+PROMPT = (MUD_DATA, ("prompt", b"*>"))
+
+
+class TestThreadEventQueue(unittest.TestCase):
+	def testIsDroppable(self):
+		self.assertTrue(isDroppable(LINE))
+		self.assertTrue(isDroppable((MUD_DATA, ("terrain", b"city"))))
+		for name in ("prompt", "movement", "name", "description", "dynamic", "exits"):
+			self.assertFalse(isDroppable((MUD_DATA, (name, b""))))
+		self.assertFalse(isDroppable((USER_DATA, b"rinfo")))
+		self.assertFalse(isDroppable((None, None)))
+		self.assertTrue(isDroppable(LINE, isMapperLine))
+		self.assertFalse(isDroppable((MUD_DATA, ("line", b"It seems to be locked.")), isMapperLine))
+		self.assertFalse(isDroppable((MUD_DATA, ("line", b"You are already riding.")), isMapperLine))
+
+	def testOrder(self):
+		queue = ThreadEventQueue()
+		self.assertTrue(queue.empty())
+		queue.put(LINE)
+		queue.put(PROMPT)
+		self.assertEqual(queue.qsize(), 2)
+		self.assertEqual(queue.get(), LINE)
+		self.assertEqual(queue.get(), PROMPT)
+		with self.assertRaises(Empty):
+			queue.get(timeout=0.01)
+
+	def testDropPolicy(self):
+		queue = ThreadEventQueue(maxSize=2, policy="drop")
+		for event in (LINE, LINE, LINE, PROMPT, (USER_DATA, b"rinfo"), LINE, (MAPPER_DATA, (print, ()))):
+			queue.put(event)
+		self.assertEqual(
+			[queue.get() for _ in range(queue.qsize())],
+			[LINE, LINE, PROMPT, (USER_DATA, b"rinfo"), (MAPPER_DATA, (print, ()))],
+		)
+		self.assertEqual(queue.dropped, {"line": 2})
+		self.assertEqual(queue.peak, 5)
+		self.assertEqual(
+			queue.stats(),
+			[
+				"0 of 2 events waiting, at most 5. Policy: drop.",
+				"The game was held back 0 times.",
+				"Dropped 2 events: 2 line.",
+			],
+		)
+
+	def testDropPolicyKeepsMapperLines(self):
+		queue = ThreadEventQueue(maxSize=1, policy="drop", isKeptLine=isMapperLine)
+		blocked = (MUD_DATA, ("line", b"\x1b[0mIt seems to be locked.\x1b[0m"))
+		forced = (MUD_DATA, ("line", b"You are borne along by a strong current."))
+		clock = (MUD_DATA, ("line", b"The current time is 9:12 am."))
+		for event in (LINE, LINE, blocked, LINE, forced, clock):
+			queue.put(event)
+		self.assertEqual([queue.get() for _ in range(queue.qsize())], [LINE, blocked, forced, clock])
+		self.assertEqual(queue.dropped, {"line": 2})
+
+	def testBlockPolicy(self):
+		queue = ThreadEventQueue(maxSize=2, policy="block")
+		queue.put(LINE)
+		queue.put(LINE)
+		# Events which are not from the game are never held back.
+		queue.put((USER_DATA, b"rinfo"))
+		reader = threading.Thread(target=queue.put, args=(PROMPT,))
+		reader.start()
+		reader.join(0.1)
+		self.assertTrue(reader.is_alive())
+		self.assertEqual(queue.get(), LINE)
+		self.assertEqual(queue.get(), LINE)
+		reader.join(1)
+		self.assertFalse(reader.is_alive())
+		self.assertEqual([queue.get(), queue.get()], [(USER_DATA, b"rinfo"), PROMPT])
+		self.assertEqual(queue.waits, 1)
+		self.assertEqual(queue.dropped, {})
+
+	def testInvalidPolicy(self):
+		with self.assertRaises(ValueError):
+			ThreadEventQueue(policy="ignore")
+
+
+class TestGUIQueue(unittest.TestCase):
+	def testCoalescing(self):
+		queue = GUIQueue()
+		queue.put(("on_map_sync", "first room"))
+		queue.put(("on_gui_refresh",))
+		queue.put(("on_map_sync", "second room"))
+		queue.put(None)
+		self.assertEqual(queue.qsize(), 3)
+		self.assertEqual(queue.coalesced, 1)
+		self.assertEqual(queue.get_nowait(), ("on_map_sync", "second room"))
+		self.assertEqual(queue.get_nowait(), ("on_gui_refresh",))
+		self.assertIsNone(queue.get_nowait())
+		self.assertTrue(queue.empty())
+		with self.assertRaises(Empty):
+			queue.get_nowait()
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -202,6 +202,9 @@ class TestUtils(unittest.TestCase):
 		expectedBytes = b"<one&two>three"
 		self.assertEqual(utils.unescapeXML(originalString, False), expectedString)
 		self.assertEqual(utils.unescapeXML(originalBytes, True), expectedBytes)
+		# Escaped entities are only unescaped once.
+		self.assertEqual(utils.unescapeXML("&amp;lt;", False), "&lt;")
+		self.assertEqual(utils.unescapeXML(b"&amp;gt;&amp;amp;", True), b"&gt;&amp;")
 
 	def test_decodeBytes(self):
 		characters = "".join(chr(i) for i in range(256))
@@ -0,0 +1,198 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+
+# Future Modules:
+from __future__ import annotations
+
+# Built-in Modules:
+import unittest
+from unittest.mock import Mock
+
+# Mapper Modules:
+from mapper.queues import GUIQueue
+from mapper.roomdata.objects import Exit, Room
+from mapper.roomdata.distances import buildLabelDistances
+from mapper.world import DIRECTIONS, ZONE_SEARCH_DISTANCE, World, ZoneSearch
+
+# Local Modules:
+from .roomdata.test_zones import createGrid
+
+
+def createRooms(exits):
+	"""Creates rooms with the given exits, as a mapping of vnums to tuples of directions and vnums."""
+	rooms = {vnum: Room(vnum) for vnum in exits}
+	for vnum, roomExits in exits.items():
+		for direction, to in roomExits:
+			exitObj = Exit()
+			exitObj.direction = direction
+			exitObj.vnum = vnum
+			exitObj.to = to
+			rooms[vnum].exits[direction] = exitObj
+	return rooms
+
+
+def firstDirection(commands):
+	# The commands are in reverse order.
+	return next(command for command in reversed(commands) if command in DIRECTIONS)
+
+
+class TestWorld(unittest.TestCase):
+	def setUp(self):
+		self.world = World(rooms=createGrid(12, 10))
+		self.world._isLabelDistancesLoaded = True
+		self.world.output = Mock()
+		self.world.currentRoom = self.world.rooms["0"]
+
+	def testBlockExit(self):
+		world = self.world
+		commands = world.pathFind(destination="47")
+		self.assertTrue(commands)
+		route = world.lastRoute
+		direction = firstDirection(commands)
+		world.blockExit(route, world.currentRoom, direction)
+		key, tree = world._routeTree
+		self.assertTrue(tree.blocked)
+		replanned = world.replan(route)
+		self.assertTrue(replanned)
+		self.assertNotEqual(firstDirection(replanned), direction)
+		# Exits are only blocked for the route they were blocked on.
+		self.assertEqual(world.pathFind(destination="47"), commands)
+
+	def testBlockExitOnZoneRoute(self):
+		world = World(rooms=createGrid(60, 60))
+		world._isLabelDistancesLoaded = True
+		world.output = Mock()
+		world.currentRoom = world.rooms["0"]
+		self.assertGreaterEqual(world.currentRoom.manhattanDistance(world.rooms["3599"]), ZONE_SEARCH_DISTANCE)
+		search = world.pathSearch(destination="3599")
+		self.assertIsInstance(search, ZoneSearch)
+		commands = world.searchResult(search.run())
+		self.assertTrue(commands)
+		self.assertIsNone(world._routeTree)
+		route = world.lastRoute
+		direction = firstDirection(commands)
+		world.blockExit(route, world.currentRoom, direction)
+		key, tree = world._routeTree
+		self.assertTrue(tree.blocked)
+		replanned = world.replan(route)
+		self.assertTrue(replanned)
+		self.assertNotEqual(firstDirection(replanned), direction)
+		# The block is kept while the run is replanned again.
+		self.assertEqual(world.replan(route), replanned)
+
+	def testBlockExitOnLabelTableRoute(self):
+		world = self.world
+		world.labels["target"] = "47"
+		world._labelDistances = buildLabelDistances(world.graph, ["47"], maxWorkers=0)
+		commands = world.pathSearch(destination="target")
+		# The route is read from the label table, so no search is needed.
+		self.assertIsInstance(commands, list)
+		self.assertTrue(commands)
+		self.assertIsNone(world._routeTree)
+		route = world.lastRoute
+		direction = firstDirection(commands)
+		world.blockExit(route, world.currentRoom, direction)
+		key, tree = world._routeTree
+		self.assertTrue(tree.blocked)
+		replanned = world.replan(route)
+		self.assertTrue(replanned)
+		self.assertNotEqual(firstDirection(replanned), direction)
+
+	def testReach(self):
+		world = self.world
+		world._interface = "hc"
+		world._gui_queue = GUIQueue()
+		message = world.reach("10")
+		key, tree = world._nearestTree
+		near = world._gui_queue.get_nowait()[1]
+		self.assertEqual(message, f"{len(near)} rooms reachable within a cost of 10.")
+		self.assertIn("0", near)
+		# A larger budget continues the search which is kept for the current room.
+		message = world.reach("50")
+		self.assertIs(world._nearestTree[1], tree)
+		far = world._gui_queue.get_nowait()[1]
+		self.assertEqual(message, f"{len(far)} rooms reachable within a cost of 50.")
+		self.assertLess(near, far)
+		self.assertEqual(world.reach("10"), f"{len(near)} rooms reachable within a cost of 10.")
+		self.assertEqual(world._gui_queue.get_nowait(), ("on_reach", near))
+		# Avoiding terrains uses another search.
+		world.reach("50 noroad")
+		self.assertIsNot(world._nearestTree[1], tree)
+		self.assertLessEqual(world._gui_queue.get_nowait()[1], far)
+
+	def testReachOff(self):
+		world = self.world
+		world._interface = "hc"
+		world._gui_queue = GUIQueue()
+		world.reach("50")
+		world._gui_queue.get_nowait()
+		self.assertEqual(world.reach("off"), "Reachable rooms cleared.")
+		self.assertEqual(world._gui_queue.get_nowait(), ("on_reach", frozenset()))
+		self.assertEqual(world.reach("lots"), "Usage: reach [cost] [flags] | reach off")
+		self.assertTrue(world._gui_queue.empty())
+
+	def testReachText(self):
+		world = self.world
+		self.assertEqual(world.reach(""), "Usage: reach [cost] [flags] | reach off")
+		message, vnums = world.reachableRooms("50")
+		self.assertEqual(world.reach("50"), message)
+		self.assertFalse(hasattr(world, "_gui_queue"))
+		world.currentRoom = None
+		self.assertEqual(
+			world.reach("50"), "Error! The mapper has no location. Please use the sync command then try again."
+		)
+
+	def testMapstats(self):
+		# Rooms 0 and 1 lead to each other, 1 and 2 lead into the one-way trap of 3 and 4, and 5 is orphaned.
+		world = World(
+			rooms=createRooms(
+				{
+					"0": [("east", "1")],
+					"1": [("west", "0"), ("east", "2"), ("down", "3")],
+					"2": [("down", "4")],
+					"3": [("east", "4")],
+					"4": [("west", "3")],
+					"5": [],
+				}
+			)
+		)
+		world._isLabelDistancesLoaded = True
+		self.assertEqual(
+			world.mapstats(),
+			[
+				"Rooms: 6, exits: 7.",
+				"Strongly connected components: 4, the largest containing 2 rooms.",
+				"One-way traps: 1, containing 2 rooms.",
+				"Orphaned rooms: 1.",
+				"Trap: 3, 4",
+				"Orphans: 5",
+			],
+		)
+
+	def testMapstatsConnected(self):
+		world = World(rooms=createRooms({"0": [("east", "1")], "1": [("west", "0")]}))
+		world._isLabelDistancesLoaded = True
+		self.assertEqual(
+			world.mapstats(),
+			[
+				"Rooms: 2, exits: 2.",
+				"Strongly connected components: 1, the largest containing 2 rooms.",
+				"One-way traps: 0, containing 0 rooms.",
+				"Orphaned rooms: 0.",
+			],
+		)
+
+	def testLightAndAlignChangeNightCosts(self):
+		world = self.world
+		costs = sum(world.graph.edgeCosts(frozenset(), "NIGHT"))
+		world.rlight("dark")
+		darkCosts = sum(world.graph.edgeCosts(frozenset(), "NIGHT"))
+		self.assertGreater(darkCosts, costs)
+		world.ralign("evil")
+		self.assertGreater(sum(world.graph.edgeCosts(frozenset(), "NIGHT")), darkCosts)
+
+
+if __name__ == "__main__":
+	unittest.main()